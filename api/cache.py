@@ -0,0 +1,134 @@
+"""
+In-process response cache for the report endpoints.
+
+The reports aggregate whole tables but the data only changes when a
+loader, the stream writer or the detection sink commits, and each of
+those bumps the data_generation counter (src/load_to_sqlite.py). Cached
+responses are keyed by endpoint, parameters and that generation, so a
+load makes exactly the entries computed before it unreachable; they then
+age out of the LRU. The TTL bounds how long an entry lives regardless.
+
+The generation itself is re-read at most once per API_CACHE_GENERATION_CHECK
+seconds, so repeated dashboard polls are answered without touching the
+database at all.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from starlette.responses import Response
+
+from api.database import db
+
+CACHE_SIZE = int(os.getenv('API_CACHE_SIZE', '256'))
+CACHE_TTL = float(os.getenv('API_CACHE_TTL', '300'))
+GENERATION_CHECK_SECONDS = float(os.getenv('API_CACHE_GENERATION_CHECK', '1'))
+
+GENERATION_SQL = "SELECT generation FROM data_generation WHERE id = 1"
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of endpoint responses keyed on the data generation.
+
+    Handlers run on the event loop, so the cache is only touched from one
+    thread and needs no lock. A size or TTL of 0 disables it.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL, generation_check=GENERATION_CHECK_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation_check = generation_check
+        self.entries = OrderedDict()  # key -> (expires_at, response)
+        self.generations = {}  # db.source() -> (checked_at, generation)
+        self.pending = {}  # key -> task computing it, shared by concurrent misses
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    async def generation(self):
+        """(source, generation) of the warehouse the API reads"""
+        source = db.source()
+        now = time.monotonic()
+        checked = self.generations.get(source)
+        if checked is None or now - checked[0] >= self.generation_check:
+            try:
+                row = await db.fetch_one(GENERATION_SQL)
+            except Exception:
+                row = None  # created by the first load after this version
+            checked = (now, row['generation'] if row else 0)
+            self.generations[source] = checked
+        return source, checked[1]
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] <= time.monotonic():
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, response):
+        self.entries[key] = (time.monotonic() + self.ttl, response)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.generations.clear()
+
+    def stats(self):
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+    def cached(self, handler):
+        """
+        Decorator for an async endpoint, or a query helper, whose result
+        depends only on its parameters and the data
+        """
+        @wraps(handler)
+        async def wrapper(**params):
+            if not self.enabled:
+                return await handler(**params)
+            key = (handler.__name__, tuple(sorted(params.items())), await self.generation())
+            response = self.get(key)
+            if response is not None:
+                return replay(response)
+            task = self.pending.get(key)
+            if task is None:
+                task = self.pending[key] = asyncio.ensure_future(self.fill(key, handler, params))
+            # A client disconnecting must not cancel the query for the others waiting on it
+            return await asyncio.shield(task)
+        return wrapper
+
+    async def fill(self, key, handler, params):
+        try:
+            response = await handler(**params)
+            self.put(key, response)
+            return response
+        finally:
+            del self.pending[key]
+
+
+def replay(response):
+    """
+    A cached Response's rendered body in a new Response: the body is sent
+    as is, and FastAPI may add per-request headers to the object it sends.
+    """
+    if isinstance(response, Response):
+        return Response(response.body, response.status_code, media_type=response.media_type)
+    return response
+
+
+response_cache = ResponseCache()
@@ -1,12 +1,21 @@
 """
-Database connection module for FastAPI
+Database access layer for FastAPI
 Supports both PostgreSQL and SQLite
+
+Queries run on a bounded thread pool so they never block the event loop.
+Each pool thread keeps one read-only connection open and reuses it across
+requests. Queries are written once in SQLite syntax; on PostgreSQL the
+`?` placeholders and raw_<table> names are translated to %s and raw.<table>.
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import asyncio
 import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,48 +23,161 @@ load_dotenv()
 # Determine which database to use
 USE_POSTGRES = os.getenv('USE_POSTGRES', 'false').lower() == 'true'
 
-if USE_POSTGRES:
-    # PostgreSQL connection
-    DATABASE_URL = f"postgresql://{os.getenv('POSTGRES_USER', 'postgres')}:{os.getenv('POSTGRES_PASSWORD', 'telegram_pass')}@{os.getenv('POSTGRES_HOST', 'localhost')}:{os.getenv('POSTGRES_PORT', '5432')}/{os.getenv('POSTGRES_DB', 'medical_warehouse')}"
-    print("Using PostgreSQL database")
-else:
-    # SQLite connection (default)
-    DATABASE_URL = "sqlite:///./medical_warehouse.db"
-    print("Using SQLite database")
-
-# Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
-
-# Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Create Base class for models
-Base = declarative_base()
-
-# Dependency to get DB session
-def get_db():
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'medical_warehouse.db')
+
+# Query threads (and so open connections); 0 runs queries inline on the
+# event loop with a new connection each, the old blocking behaviour.
+# SQLite queries are CPU-bound, so more threads than cores only add GIL
+# contention; PostgreSQL waits on the network and benefits from more.
+POOL_SIZE = int(os.getenv('API_DB_POOL_SIZE', str(os.cpu_count() or 1)))
+
+# SQLite warehouse tables and where the loaders put them on PostgreSQL
+POSTGRES_TABLES = {
+    'raw_telegram_messages': 'raw.telegram_messages',
+    'message_engagement_snapshots': 'raw.message_engagement_snapshots',
+    'raw_yolo_detections': 'raw.yolo_detections',
+    'raw_image_clusters': 'raw.image_clusters',
+    'data_generation': 'raw.data_generation',
+    'product_mentions': 'raw.product_mentions',
+}
+TABLE_PATTERN = re.compile(r'\b(' + '|'.join(POSTGRES_TABLES) + r')\b')
+
+
+@lru_cache(maxsize=256)
+def to_postgres(sql):
+    """Rewrite a SQLite-syntax query for psycopg2"""
+    sql = TABLE_PATTERN.sub(lambda match: POSTGRES_TABLES[match.group(1)], sql)
+    # psycopg2 treats every % as a placeholder, so LIKE '%x%' literals are doubled first
+    return sql.replace('%', '%%').replace('?', '%s')
+
+
+def connect_sqlite(path=SQLITE_PATH):
+    """Read-only SQLite connection"""
+    return sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+
+
+def connect_postgres():
+    """Read-only autocommit PostgreSQL connection (same POSTGRES_* settings as the loader)"""
+    import psycopg2
+
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'localhost'),
+        port=os.getenv('POSTGRES_PORT', '5432'),
+        dbname=os.getenv('POSTGRES_DB', 'medical_warehouse'),
+        user=os.getenv('POSTGRES_USER', 'postgres'),
+        password=os.getenv('POSTGRES_PASSWORD', 'telegram_pass'),
+    )
+    conn.set_session(readonly=True, autocommit=True)
+    return conn
+
+
+class Database:
     """
-    Get database session.
-    Use in FastAPI dependencies.
+    Thread-pool query executor with one read-only connection per thread.
+
+    SQLite connections are keyed by the database's absolute path, so a
+    process that changes directory (the benchmarks) reads the right file.
     """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+    def __init__(self, postgres=USE_POSTGRES, sqlite_path=SQLITE_PATH, pool_size=POOL_SIZE):
+        self.postgres = postgres
+        self.sqlite_path = sqlite_path
+        self.pool_size = pool_size
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='db') if pool_size else None
+        self.local = threading.local()
+
+    def connect(self):
+        return connect_postgres() if self.postgres else connect_sqlite(self.sqlite_path)
+
+    def source(self):
+        """Which warehouse queries go to: 'postgres' or the SQLite file's absolute path"""
+        return 'postgres' if self.postgres else os.path.abspath(self.sqlite_path)
+
+    def connection(self):
+        """This thread's connection, opened on first use"""
+        key = self.source()
+        connections = self.local.__dict__.setdefault('connections', {})
+        conn = connections.get(key)
+        if conn is None or (self.postgres and conn.closed):
+            conn = self.connect()
+            connections[key] = conn
+        return conn
+
+    def translate(self, sql):
+        return to_postgres(sql) if self.postgres else sql
+
+    def query(self, fn, sql, params):
+        """fn(conn, sql, params) on this thread's connection (a fresh one when inline)"""
+        return self.queries(fn, [(sql, params)])[0]
+
+    def queries(self, fn, statements):
+        pooled = self.executor is not None
+        conn = self.connection() if pooled else self.connect()
+        try:
+            return [fn(conn, self.translate(sql), tuple(params)) for sql, params in statements]
+        finally:
+            if not pooled:
+                conn.close()
+
+    @staticmethod
+    def fetch_rows(conn, sql, params):
+        """Rows as dicts, built straight from the driver's tuples"""
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def fetch_row(conn, sql, params):
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+        return dict(zip([column[0] for column in cursor.description], row)) if row is not None else None
+
+    async def run(self, fn, *args):
+        if self.executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def fetch_all(self, sql, params=()):
+        """All rows of a query as dicts"""
+        return await self.run(self.query, self.fetch_rows, sql, params)
+
+    async def fetch_one(self, sql, params=()):
+        """First row of a query as a dict, or None"""
+        return await self.run(self.query, self.fetch_row, sql, params)
+
+    async def fetch_many(self, statements):
+        """Rows of several (sql, params) queries, run back to back on one connection"""
+        return await self.run(self.queries, self.fetch_rows, statements)
+
+    def is_missing_table(self, exc):
+        """Whether exc is the driver's error for a table that doesn't exist (yet)"""
+        if self.postgres:
+            from psycopg2 import errors
+
+            return isinstance(exc, errors.UndefinedTable)
+        return isinstance(exc, sqlite3.OperationalError) and 'no such table' in str(exc)
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=True)
+
+
+db = Database()
+
 
 def test_connection():
     """Test database connection"""
     try:
-        with engine.connect() as conn:
-            print("✅ Database connection successful!")
-            return True
+        conn = db.connect()
+        conn.cursor().execute("SELECT 1")
+        conn.close()
+        print(f"✅ Database connection successful! ({'PostgreSQL' if USE_POSTGRES else SQLITE_PATH})")
+        return True
     except Exception as e:
         print(f"❌ Database connection failed: {e}")
         return False
 
 if __name__ == "__main__":
-    test_connection()
\ No newline at end of file
+    test_connection()
@@ -2,12 +2,13 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from api import schemas
-from api.database import get_db, test_connection
+from api.database import db
+from api import search
+from api.cache import response_cache
+from api.responses import RowsJSONResponse
 from typing import List
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.responses import HTMLResponse
-import sqlite3
-import pandas as pd
 from typing import List, Optional
 import json
 from datetime import datetime
@@ -20,11 +21,15 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
-def get_db_connection():
-    """Create database connection"""
-    conn = sqlite3.connect('medical_warehouse.db')
-    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-    return conn
+# has_media is INTEGER 0/1 on SQLite and BOOLEAN on PostgreSQL; these
+# forms are valid in both dialects
+IMAGE_COUNT_SQL = "SUM(CASE WHEN has_media THEN 1 ELSE 0 END)"
+VIEWS_WITH_IMAGES_SQL = "AVG(CASE WHEN has_media THEN views END)"
+VIEWS_WITHOUT_IMAGES_SQL = "AVG(CASE WHEN NOT has_media THEN views END)"
+
+@app.on_event("shutdown")
+def close_db():
+    db.close()
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -51,6 +56,7 @@ async def root():
                     <li><code>GET /api/channels/{channel_name}/activity</code> - Channel activity</li>
                     <li><code>GET /api/search/messages?query=product</code> - Search messages</li>
                     <li><code>GET /api/reports/visual-content</code> - Image usage stats</li>
+                    <li><code>GET /api/reports/image-detections</code> - YOLO image categories per channel</li>
                     <li><code>GET /api/summary</code> - Overall summary</li>
                 </ul>
             </div>
@@ -61,16 +67,14 @@ async def root():
     </html>
     """
 
-@app.get("/api/summary")
-async def get_summary():
-    """Get overall data summary"""
-    conn = get_db_connection()
-    
-    summary_query = """
+@response_cache.cached
+async def summary_row():
+    """The summary figures; cached on their own so the response timestamp stays current"""
+    summary_query = f"""
     SELECT 
         COUNT(*) as total_messages,
         COUNT(DISTINCT channel_name) as total_channels,
-        SUM(has_media) as messages_with_images,
+        {IMAGE_COUNT_SQL} as messages_with_images,
         AVG(views) as avg_views,
         MAX(views) as max_views,
         MIN(message_date) as earliest_date,
@@ -78,80 +82,54 @@ async def get_summary():
     FROM raw_telegram_messages
     """
     
-    cursor = conn.cursor()
-    cursor.execute(summary_query)
-    summary = dict(cursor.fetchone())
-    conn.close()
+    return await db.fetch_one(summary_query)
+
+@app.get("/api/summary")
+async def get_summary():
+    """Get overall data summary"""
+    summary = await summary_row()
     
-    return {
+    return RowsJSONResponse({
         "status": "success",
         "timestamp": datetime.now().isoformat(),
         "data": summary
-    }
+    })
 
 @app.get("/api/reports/top-products")
+@response_cache.cached
 async def top_products(limit: int = Query(10, description="Number of top products to return")):
     """
     Get most frequently mentioned products across all channels.
     
-    Returns products with their mention count and average price.
+    Returns products with their mention count and average price, from the
+    product_mentions table filled by src/product_extraction.py.
     """
-    conn = get_db_connection()
-    
-    # Extract product names and prices
+
     query = """
-    WITH product_extract AS (
-        SELECT 
-            message_id,
-            channel_name,
-            message_text,
-            views,
-            -- Simple product name extraction
-            CASE 
-                WHEN message_text LIKE '%NIDO%' THEN 'NIDO'
-                WHEN message_text LIKE '%VITAMIN%' THEN 'VITAMIN'
-                WHEN message_text LIKE '%OLIVE OIL%' THEN 'OLIVE OIL'
-                WHEN message_text LIKE '%COCONUT%' THEN 'COCONUT OIL'
-                WHEN message_text LIKE '%MELATONIN%' THEN 'MELATONIN'
-                WHEN message_text LIKE '%Ashwagandha%' THEN 'ASHWAGANDHA'
-                ELSE 'OTHER'
-            END as product_category,
-            -- Extract price using regex (simplified)
-            CAST(
-                COALESCE(
-                    NULLIF(SUBSTR(message_text, INSTR(message_text, 'Price') + 6, 10), ''),
-                    '0'
-                ) AS INTEGER
-            ) as extracted_price
-        FROM raw_telegram_messages
-        WHERE message_text IS NOT NULL AND TRIM(message_text) != ''
-    )
     SELECT 
-        product_category as product_name,
+        product_name,
         COUNT(*) as mention_count,
         AVG(views) as avg_views,
-        AVG(CASE WHEN extracted_price > 0 THEN extracted_price END) as avg_price,
-        MIN(CASE WHEN extracted_price > 0 THEN extracted_price END) as min_price,
-        MAX(CASE WHEN extracted_price > 0 THEN extracted_price END) as max_price
-    FROM product_extract
-    GROUP BY product_category
-    HAVING product_category != 'OTHER'
+        AVG(price) as avg_price,
+        MIN(price) as min_price,
+        MAX(price) as max_price
+    FROM product_mentions
+    GROUP BY product_name
     ORDER BY mention_count DESC
     LIMIT ?
     """
     
-    df = pd.read_sql_query(query, conn, params=(limit,))
-    conn.close()
+    products = await db.fetch_all(query, (limit,))
     
-    if df.empty:
+    if not products:
         raise HTTPException(status_code=404, detail="No products found")
     
-    return {
+    return RowsJSONResponse({
         "status": "success",
         "limit": limit,
-        "total_products": len(df),
-        "products": df.to_dict(orient='records')
-    }
+        "total_products": len(products),
+        "products": products
+    })
 
 @app.get("/api/channels/{channel_name}/activity")
 async def channel_activity(channel_name: str):
@@ -160,152 +138,162 @@ async def channel_activity(channel_name: str):
     
     - channel_name: Name of the Telegram channel (e.g., lobelia4cosmetics)
     """
-    conn = get_db_connection()
-    
-    # Validate channel exists
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) as count FROM raw_telegram_messages WHERE channel_name = ?", (channel_name,))
-    channel_exists = cursor.fetchone()['count'] > 0
-    
-    if not channel_exists:
-        conn.close()
-        raise HTTPException(status_code=404, detail=f"Channel '{channel_name}' not found in database")
-    
     # Get channel statistics
-    stats_query = """
+    stats_query = f"""
     SELECT 
         COUNT(*) as total_posts,
         AVG(views) as avg_views,
         MAX(views) as max_views,
-        SUM(has_media) as posts_with_images,
-        ROUND(SUM(has_media) * 100.0 / COUNT(*), 2) as image_percentage,
+        {IMAGE_COUNT_SQL} as posts_with_images,
+        ROUND({IMAGE_COUNT_SQL} * 100.0 / NULLIF(COUNT(*), 0), 2) as image_percentage,
         MIN(message_date) as first_post_date,
         MAX(message_date) as last_post_date
     FROM raw_telegram_messages
     WHERE channel_name = ?
     """
     
-    stats_df = pd.read_sql_query(stats_query, conn, params=(channel_name,))
-    
     # Get daily activity
-    daily_query = """
+    daily_query = f"""
     SELECT 
         DATE(message_date) as post_date,
         COUNT(*) as post_count,
         AVG(views) as avg_views,
-        SUM(has_media) as images_count
+        {IMAGE_COUNT_SQL} as images_count
     FROM raw_telegram_messages
     WHERE channel_name = ?
     GROUP BY DATE(message_date)
     ORDER BY post_date DESC
     """
     
-    daily_df = pd.read_sql_query(daily_query, conn, params=(channel_name,))
+    # Both queries in one trip to the query pool
+    (stats,), daily = await db.fetch_many([(stats_query, (channel_name,)), (daily_query, (channel_name,))])
     
-    conn.close()
+    # A channel without messages doesn't exist
+    if not stats['total_posts']:
+        raise HTTPException(status_code=404, detail=f"Channel '{channel_name}' not found in database")
     
-    return {
+    return RowsJSONResponse({
         "status": "success",
         "channel": channel_name,
-        "statistics": stats_df.to_dict(orient='records')[0],
-        "daily_activity": daily_df.to_dict(orient='records'),
-        "activity_days": len(daily_df)
-    }
+        "statistics": stats,
+        "daily_activity": daily,
+        "activity_days": len(daily)
+    })
 
 @app.get("/api/search/messages")
 async def search_messages(
-    query: str = Query(..., description="Search keyword"),
+    query: str = Query(..., description="Search keywords"),
     limit: int = Query(20, description="Maximum number of results"),
-    channel: Optional[str] = Query(None, description="Filter by channel name")
+    channel: Optional[str] = Query(None, description="Filter by channel name"),
+    order: str = Query("relevance", pattern="^(relevance|views)$", description="Sort by relevance or views")
 ):
     """
-    Search for messages containing specific keywords.
+    Full-text search over message text.
     
-    - query: Text to search for
+    - query: Words to search for; all must match, the last as a prefix
     - limit: Maximum results to return
     - channel: Optional channel filter
+    - order: relevance (bm25 / ts_rank) or views
     """
-    conn = get_db_connection()
-    
-    # Build query with optional channel filter
-    sql_base = """
-    SELECT 
-        message_id,
-        channel_name,
-        message_date,
-        CASE 
-            WHEN LENGTH(message_text) > 100 
-            THEN SUBSTR(message_text, 1, 100) || '...' 
-            ELSE message_text 
-        END as message_preview,
-        views,
-        forwards,
-        has_media,
-        image_path
-    FROM raw_telegram_messages
-    WHERE message_text LIKE ?
-    """
-    
-    params = [f"%{query}%"]
-    
-    if channel:
-        sql_base += " AND channel_name = ?"
-        params.append(channel)
-    
-    sql_base += " ORDER BY views DESC LIMIT ?"
-    params.append(limit)
-    
-    df = pd.read_sql_query(sql_base, conn, params=params)
-    conn.close()
+
+    terms = search.search_terms(query)
+    results = []
+    if terms:
+        sql, params = search.search_statement(terms, limit, channel, order, postgres=db.postgres)
+        results = await db.fetch_all(sql, params)
     
-    return {
+    return RowsJSONResponse({
         "status": "success",
         "search_query": query,
         "channel_filter": channel,
-        "result_count": len(df),
+        "order": order,
+        "result_count": len(results),
         "limit": limit,
-        "results": df.to_dict(orient='records')
-    }
+        "results": results
+    })
 
 @app.get("/api/reports/visual-content")
+@response_cache.cached
 async def visual_content_stats():
     """
     Get statistics about image usage across channels.
     
     Compares engagement for posts with vs without images.
     """
-    conn = get_db_connection()
-    
-    query = """
+
+    query = f"""
     SELECT 
         channel_name,
         COUNT(*) as total_posts,
-        SUM(has_media) as posts_with_images,
-        COUNT(*) - SUM(has_media) as posts_without_images,
-        ROUND(SUM(has_media) * 100.0 / COUNT(*), 2) as image_percentage,
-        ROUND(AVG(CASE WHEN has_media = 1 THEN views END), 2) as avg_views_with_images,
-        ROUND(AVG(CASE WHEN has_media = 0 THEN views END), 2) as avg_views_without_images,
+        {IMAGE_COUNT_SQL} as posts_with_images,
+        COUNT(*) - {IMAGE_COUNT_SQL} as posts_without_images,
+        ROUND({IMAGE_COUNT_SQL} * 100.0 / COUNT(*), 2) as image_percentage,
+        ROUND({VIEWS_WITH_IMAGES_SQL}, 2) as avg_views_with_images,
+        ROUND({VIEWS_WITHOUT_IMAGES_SQL}, 2) as avg_views_without_images,
         ROUND(
-            (AVG(CASE WHEN has_media = 1 THEN views END) - 
-             AVG(CASE WHEN has_media = 0 THEN views END)) * 100.0 / 
-            AVG(CASE WHEN has_media = 0 THEN views END), 2
+            ({VIEWS_WITH_IMAGES_SQL} - {VIEWS_WITHOUT_IMAGES_SQL}) * 100.0 /
+            NULLIF({VIEWS_WITHOUT_IMAGES_SQL}, 0), 2
         ) as engagement_difference_percent
     FROM raw_telegram_messages
     GROUP BY channel_name
     ORDER BY image_percentage DESC
     """
     
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+    channels = await db.fetch_all(query)
     
-    if df.empty:
+    if not channels:
         raise HTTPException(status_code=404, detail="No visual content data available")
     
-    return {
+    return RowsJSONResponse({
         "status": "success",
         "analysis": "Image usage and engagement comparison",
-        "channels": df.to_dict(orient='records')
-    }
+        "channels": channels
+    })
+
+@app.get("/api/reports/image-detections")
+@response_cache.cached
+async def image_detection_stats(channel: Optional[str] = Query(None, description="Filter by channel name")):
+    """
+    Get YOLO image categories per channel with their engagement.
+
+    Reads raw_yolo_detections, written by src/yolo_detect.py.
+    """
+
+    query = """
+    SELECT
+        d.channel_name,
+        d.image_category,
+        COUNT(*) as image_count,
+        ROUND(CAST(AVG(d.confidence_score) AS NUMERIC), 3) as avg_confidence,
+        ROUND(AVG(m.views), 2) as avg_views,
+        MAX(d.analysis_timestamp) as last_analyzed
+    FROM raw_yolo_detections d
+    LEFT JOIN raw_telegram_messages m
+        ON m.channel_name = d.channel_name AND m.message_id = d.message_id
+    """
+    params = []
+    if channel:
+        query += " WHERE d.channel_name = ?"
+        params.append(channel)
+    query += " GROUP BY d.channel_name, d.image_category ORDER BY d.channel_name, image_count DESC"
+
+    try:
+        categories = await db.fetch_all(query, params)
+    except Exception as e:
+        if not db.is_missing_table(e):
+            raise
+        categories = []
+
+    if not categories:
+        raise HTTPException(status_code=404, detail="No image detections loaded, run src/yolo_detect.py")
+
+    return RowsJSONResponse({
+        "status": "success",
+        "channel_filter": channel,
+        "total_images": sum(row['image_count'] for row in categories),
+        "categories": categories
+    })
+
 @app.get("/health", response_model=schemas.APIResponse)
 async def health_check():
     """Health check endpoint"""
@@ -314,8 +302,9 @@ async def health_check():
         message="Medical Telegram Analytics API is running",
         data={
             "api_status": "running",
-            "endpoints": 6,
-            "version": "1.0.0"
+            "endpoints": 7,
+            "version": "1.0.0",
+            "response_cache": response_cache.stats()
         }
     )
 # ==================== ERROR HANDLERS ====================
@@ -358,29 +347,6 @@ async def global_exception_handler(request, exc):
         }
     )
 
-# Update your existing endpoints to use try/except
-# Example: Update the summary endpoint
-@app.get("/api/summary")
-async def get_summary():
-    """Get overall data summary with error handling"""
-    try:
-        conn = get_db_connection()
-        # ... existing query code ...
-        conn.close()
-        return {
-            "status": "success",
-            "timestamp": datetime.now().isoformat(),
-            "data": summary
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Database error: {str(e)}"
-        )
-    finally:
-        if 'conn' in locals():
-            conn.close()
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("api.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,38 @@
+"""
+JSON response class for query results.
+
+Handlers return the row dicts from api.database inside a plain dict and
+wrap it in RowsJSONResponse, which encodes it straight to bytes with
+orjson. FastAPI's jsonable_encoder pass is skipped, since it would copy
+every row just to re-check types the driver already gave us.
+PostgreSQL's NUMERIC results (AVG, ROUND) arrive as Decimal and are sent
+as floats. Without orjson the standard library encoder is used.
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_value(value):
+    """Types orjson / json don't serialize natively"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class RowsJSONResponse(JSONResponse):
+    def render(self, content):
+        if orjson is not None:
+            return orjson.dumps(content, default=encode_value, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, default=encode_value, ensure_ascii=False, allow_nan=False,
+                          separators=(",", ":")).encode("utf-8")
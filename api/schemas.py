@@ -65,8 +65,10 @@ class MessageSearchResult(BaseModel):
     channel_name: str = Field(..., description="Channel where message was posted")
     message_date: datetime = Field(..., description="Date and time of message")
     message_preview: str = Field(..., description="First 100 characters of message")
+    snippet: Optional[str] = Field(None, description="Matching passage with the search words in <b> tags")
     views: int = Field(..., description="Number of views")
     has_media: bool = Field(..., description="Whether message has media")
+    rank: Optional[float] = Field(None, description="Relevance score (higher is better)")
     
     class Config:
         schema_extra = {
@@ -75,8 +77,10 @@ class MessageSearchResult(BaseModel):
                 "channel_name": "lobelia4cosmetics",
                 "message_date": "2026-01-17T06:28:02+00:00",
                 "message_preview": "**KIRKLAND **ORGANIC EXTRA VIRGIN OLIVE OIL **...",
+                "snippet": "**KIRKLAND **ORGANIC EXTRA VIRGIN <b>OLIVE</b> <b>OIL</b> **…",
                 "views": 178,
-                "has_media": True
+                "has_media": True,
+                "rank": 7.42
             }
         }
 
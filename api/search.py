@@ -0,0 +1,120 @@
+"""
+Full-text message search queries.
+
+SQLite searches the messages_fts FTS5 index (src/load_to_sqlite.py) and
+ranks with bm25; PostgreSQL searches the GIN-indexed message_tsv column
+with ts_rank and ts_headline. The search box sends a request per
+keystroke, so the last word is matched as a prefix.
+"""
+
+import re
+
+# Words of the user's query; \w is Unicode-aware, so Ge'ez words are kept
+# whole and FTS/tsquery operators in the input are dropped
+WORD_PATTERN = re.compile(r'\w+')
+
+SNIPPET_START = '<b>'
+SNIPPET_END = '</b>'
+SNIPPET_WORDS = 16
+
+ORDERS = ('relevance', 'views')
+
+MESSAGE_PREVIEW_SQL = """CASE
+            WHEN LENGTH(m.message_text) > 100
+            THEN SUBSTR(m.message_text, 1, 100) || '...'
+            ELSE m.message_text
+        END"""
+
+SQLITE_SEARCH_SQL = f"""
+    SELECT
+        m.message_id,
+        m.channel_name,
+        m.message_date,
+        {MESSAGE_PREVIEW_SQL} as message_preview,
+        snippet(messages_fts, 0, '{SNIPPET_START}', '{SNIPPET_END}', '…', {SNIPPET_WORDS}) as snippet,
+        m.views,
+        m.forwards,
+        m.has_media,
+        m.image_path,
+        -bm25(messages_fts) as rank
+    FROM messages_fts
+    JOIN raw_telegram_messages m ON m.id = messages_fts.rowid
+    WHERE messages_fts MATCH ?{{channel_filter}}
+    ORDER BY {{order}}
+    LIMIT ?
+"""
+
+SQLITE_ORDER_SQL = {
+    'relevance': 'messages_fts.rank',
+    'views': 'm.views DESC',
+}
+
+# The headline is only built for the rows that survive the LIMIT
+POSTGRES_SEARCH_SQL = f"""
+    SELECT
+        message_id,
+        channel_name,
+        message_date,
+        message_preview,
+        ts_headline('simple', message_text, q,
+                    'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxFragments=1, MaxWords={SNIPPET_WORDS}, MinWords=6')
+            as snippet,
+        views,
+        forwards,
+        has_media,
+        image_path,
+        rank
+    FROM (
+        SELECT
+            m.message_id,
+            m.channel_name,
+            m.message_date,
+            m.message_text,
+            {MESSAGE_PREVIEW_SQL} as message_preview,
+            m.views,
+            m.forwards,
+            m.has_media,
+            m.image_path,
+            q,
+            ts_rank(m.message_tsv, q) as rank
+        FROM raw_telegram_messages m, to_tsquery('simple', ?) q
+        WHERE m.message_tsv @@ q{{channel_filter}}
+        ORDER BY {{order}}
+        LIMIT ?
+    ) hits
+    ORDER BY {{order}}
+"""
+
+POSTGRES_ORDER_SQL = {
+    'relevance': 'rank DESC',
+    'views': 'views DESC NULLS LAST',
+}
+
+
+def search_terms(query):
+    return WORD_PATTERN.findall(query)
+
+
+def fts5_match(terms):
+    """FTS5 MATCH expression: every word, the last one as a prefix"""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def tsquery(terms):
+    """to_tsquery expression: every word, the last one as a prefix"""
+    return ' & '.join(terms[:-1] + [terms[-1] + ':*'])
+
+
+def search_statement(terms, limit, channel=None, order='relevance', postgres=False):
+    """(sql, params) for a search; terms must not be empty"""
+    template = POSTGRES_SEARCH_SQL if postgres else SQLITE_SEARCH_SQL
+    orders = POSTGRES_ORDER_SQL if postgres else SQLITE_ORDER_SQL
+    params = [tsquery(terms) if postgres else fts5_match(terms)]
+    channel_filter = ''
+    if channel:
+        channel_filter = ' AND m.channel_name = ?'
+        params.append(channel)
+    params.append(limit)
+    return template.format(channel_filter=channel_filter, order=orders[order]), params
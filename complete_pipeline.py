@@ -32,8 +32,9 @@ def load_to_database():
     """Load scraped data to database"""
     logger.info("💾 Loading data to database...")
     try:
-        # Try PostgreSQL first, fallback to SQLite
-        if os.path.exists("src/load_to_postgres.py"):
+        # Use PostgreSQL when configured (same switch as the API), else SQLite
+        use_postgres = os.getenv('USE_POSTGRES', 'false').lower() == 'true'
+        if use_postgres and os.path.exists("src/load_to_postgres.py"):
             result = subprocess.run(
                 [sys.executable, "src/load_to_postgres.py"],
                 capture_output=True,
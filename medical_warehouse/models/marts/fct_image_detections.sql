@@ -0,0 +1,38 @@
+{{ config(materialized='table') }}
+
+WITH yolo_results AS (
+    SELECT
+        message_id::INTEGER as message_id,
+        channel_name,
+        detected_class,
+        confidence_score::FLOAT,
+        image_category,
+        analysis_timestamp::TIMESTAMP
+    FROM {{ source('raw', 'yolo_detections') }}
+),
+
+messages_with_keys AS (
+    SELECT
+        m.message_id,
+        m.channel_name,
+        ABS(HASH(m.channel_name)) as channel_key,
+        DATE(m.message_timestamp) as date_key
+    FROM {{ ref('stg_telegram_messages') }} m
+)
+
+SELECT
+    y.message_id,
+    y.channel_name,
+    m.channel_key,
+    m.date_key,
+    y.detected_class,
+    y.confidence_score,
+    y.image_category,
+    y.analysis_timestamp,
+    CURRENT_TIMESTAMP as loaded_at
+FROM yolo_results y
+-- Message ids are only unique within a channel
+LEFT JOIN messages_with_keys m
+    ON y.channel_name = m.channel_name
+   AND y.message_id = m.message_id
+WHERE y.message_id IS NOT NULL
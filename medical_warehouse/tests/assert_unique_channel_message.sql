@@ -0,0 +1,8 @@
+-- Test: Message ids are only unique within a channel
+SELECT 
+    channel_key,
+    message_id,
+    COUNT(*) as occurrences
+FROM {{ ref('fct_messages') }}
+GROUP BY channel_key, message_id
+HAVING COUNT(*) > 1
\ No newline at end of file
@@ -11,27 +11,103 @@ WHERE NOT EXISTS (SELECT FROM pg_database WHERE datname = 'medical_warehouse')\g
 -- Create schema and table
 CREATE SCHEMA IF NOT EXISTS raw;
 
+-- Telegram message ids are only unique within a channel; id orders the
+-- rows by insertion for the stage watermarks
 CREATE TABLE IF NOT EXISTS raw.telegram_messages (
-    message_id BIGINT PRIMARY KEY,
-    channel_name VARCHAR(255),
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    message_id BIGINT NOT NULL,
+    channel_name VARCHAR(255) NOT NULL,
     message_date TIMESTAMP,
     message_text TEXT,
     has_media BOOLEAN,
     views INTEGER,
     forwards INTEGER,
     image_path TEXT,
-    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    message_tsv tsvector GENERATED ALWAYS AS (to_tsvector('simple', COALESCE(message_text, ''))) STORED,
+    PRIMARY KEY (channel_name, message_id)
+);
+
+-- Append-only view/forward history, written by the loader when counts change
+CREATE TABLE IF NOT EXISTS raw.message_engagement_snapshots (
+    snapshot_id BIGSERIAL PRIMARY KEY,
+    channel_name VARCHAR(255) NOT NULL,
+    message_id BIGINT NOT NULL,
+    views INTEGER,
+    forwards INTEGER,
+    captured_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Latest YOLO detection per image, upserted by src/yolo_detect.py
+CREATE TABLE IF NOT EXISTS raw.yolo_detections (
+    message_id BIGINT NOT NULL,
+    channel_name VARCHAR(255) NOT NULL,
+    detected_class VARCHAR(64),
+    confidence_score REAL,
+    image_category VARCHAR(32) NOT NULL,
+    analysis_timestamp TIMESTAMP,
+    PRIMARY KEY (channel_name, message_id)
+);
+
+-- Near-duplicate image cluster per image, upserted by src/yolo_detect.py
+CREATE TABLE IF NOT EXISTS raw.image_clusters (
+    message_id BIGINT NOT NULL,
+    channel_name VARCHAR(255) NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    cluster_id CHAR(64) NOT NULL,
+    hamming_distance SMALLINT NOT NULL,
+    dedup_threshold SMALLINT NOT NULL,
+    PRIMARY KEY (channel_name, message_id)
+);
+
+-- Product mentions extracted from each new message by src/product_extraction.py
+CREATE TABLE IF NOT EXISTS raw.product_mentions (
+    channel_name VARCHAR(255) NOT NULL,
+    message_id BIGINT NOT NULL,
+    product_name VARCHAR(128) NOT NULL,
+    price REAL,
+    pack_size VARCHAR(32),
+    views INTEGER,
+    PRIMARY KEY (channel_name, message_id, product_name)
+);
+
+-- Last raw.telegram_messages.id each incremental stage has processed
+CREATE TABLE IF NOT EXISTS raw.stage_watermarks (
+    stage VARCHAR(64) PRIMARY KEY,
+    last_id BIGINT NOT NULL,
+    version VARCHAR(16) NOT NULL,
+    updated_at TIMESTAMP
+);
+
+-- Bumped by every load; the API's response cache is keyed on it
+CREATE TABLE IF NOT EXISTS raw.data_generation (
+    id SMALLINT PRIMARY KEY CHECK (id = 1),
+    generation BIGINT NOT NULL,
+    updated_at TIMESTAMP
 );
 
 -- Create indexes for performance
+CREATE UNIQUE INDEX IF NOT EXISTS idx_telegram_messages_id ON raw.telegram_messages(id);
 CREATE INDEX IF NOT EXISTS idx_channel_name ON raw.telegram_messages(channel_name);
 CREATE INDEX IF NOT EXISTS idx_message_date ON raw.telegram_messages(message_date);
+CREATE INDEX IF NOT EXISTS idx_message_tsv ON raw.telegram_messages USING GIN (message_tsv);
+CREATE INDEX IF NOT EXISTS idx_snapshots_message ON raw.message_engagement_snapshots(channel_name, message_id, captured_at);
+CREATE INDEX IF NOT EXISTS idx_yolo_detections_category ON raw.yolo_detections(image_category);
+CREATE INDEX IF NOT EXISTS idx_image_clusters_cluster ON raw.image_clusters(cluster_id);
+CREATE INDEX IF NOT EXISTS idx_product_mentions_product ON raw.product_mentions(product_name, price, views);
 
 -- Create user with permissions (optional)
 CREATE USER telegram_user WITH PASSWORD 'telegram_pass';
 GRANT CONNECT ON DATABASE medical_warehouse TO telegram_user;
 GRANT USAGE ON SCHEMA raw TO telegram_user;
 GRANT SELECT, INSERT, UPDATE ON raw.telegram_messages TO telegram_user;
+GRANT SELECT, INSERT ON raw.message_engagement_snapshots TO telegram_user;
+GRANT SELECT, INSERT, UPDATE ON raw.yolo_detections TO telegram_user;
+GRANT SELECT, INSERT, UPDATE ON raw.image_clusters TO telegram_user;
+GRANT SELECT, INSERT, UPDATE ON raw.data_generation TO telegram_user;
+GRANT SELECT, INSERT, UPDATE, DELETE, TRUNCATE ON raw.product_mentions TO telegram_user;
+GRANT SELECT, INSERT, UPDATE ON raw.stage_watermarks TO telegram_user;
+GRANT USAGE ON SEQUENCE raw.message_engagement_snapshots_snapshot_id_seq TO telegram_user;
 
 -- Verify setup
 SELECT 'PostgreSQL setup complete!' as status;
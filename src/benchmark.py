@@ -0,0 +1,222 @@
+"""
+Ingest and API benchmark harness.
+
+For each dataset size a synthetic raw data lake is generated in a scratch
+directory, loaded with load_json_to_sqlite(), and the API report queries
+are timed against the resulting database. Results are written as JSON
+(tagged with the git commit) so runs can be compared across commits:
+
+    python src/benchmark.py --sizes 10000,100000,1000000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from generate_synthetic_data import generate_dataset
+from load_to_sqlite import DEFAULT_BATCH_SIZE, load_json_to_sqlite
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmark_results")
+
+# (label, path, keyword arguments) for each timed API endpoint
+API_CASES = [
+    ("summary", "/api/summary", {}),
+    ("top_products", "/api/reports/top-products", {"limit": 10}),
+    ("channel_activity", "/api/channels/{channel_name}/activity", {"channel_name": "tikvahpharma"}),
+    ("search_messages", "/api/search/messages", {"query": "NIDO", "limit": 20, "channel": None, "order": "relevance"}),
+    ("visual_content", "/api/reports/visual-content", {}),
+]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize_ms(samples):
+    """mean/p50/p95/max in milliseconds for a list of second timings"""
+    ms = [s * 1000 for s in samples]
+    return {
+        "mean_ms": round(statistics.mean(ms), 3),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+def load_api_endpoints():
+    """
+    Map path -> endpoint function as FastAPI serves it (first registered route).
+
+    Importing api.main needs the API dependencies; the caller records the
+    API section as skipped when they are missing.
+    """
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        from api.main import app
+    endpoints = {}
+    for route in app.routes:
+        methods = getattr(route, 'methods', None) or ()
+        if 'GET' in methods and route.path not in endpoints:
+            endpoints[route.path] = route.endpoint
+    return endpoints
+
+
+def time_api(endpoints, repeats, cached=False):
+    """
+    Time each API case against medical_warehouse.db in the current directory.
+
+    The response cache is cleared before every call unless cached is set,
+    so the default timings are of the queries themselves.
+    """
+    from api.cache import response_cache
+
+    results = {}
+    for label, path, kwargs in API_CASES:
+        endpoint = endpoints.get(path)
+        if endpoint is None:
+            results[label] = {"skipped": "endpoint not found"}
+            continue
+        samples = []
+        response_cache.clear()
+        try:
+            for _ in range(repeats):
+                if not cached:
+                    response_cache.clear()
+                started = time.perf_counter()
+                asyncio.run(endpoint(**kwargs))
+                samples.append(time.perf_counter() - started)
+        except Exception as e:
+            results[label] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        results[label] = summarize_ms(samples)
+    return results
+
+
+def run_size(size, args, endpoints):
+    """Generate, load and query one dataset size in a scratch directory"""
+    workdir = tempfile.mkdtemp(prefix=f"bench_{size}_")
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        result = {"messages": size}
+
+        started = time.perf_counter()
+        generated = generate_dataset(size, args.channels, args.days, data_root="data/raw",
+                                     seed=args.seed, images=args.images)
+        result["generate_seconds"] = round(time.perf_counter() - started, 3)
+        result["raw_json_bytes"] = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, files in os.walk("data/raw/telegram_messages") for name in files
+        )
+        result["images"] = generated["images"]
+
+        started = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            loaded = load_json_to_sqlite(batch_size=args.batch_size, workers=args.workers)
+        load_seconds = time.perf_counter() - started
+        result["load"] = {
+            "rows": loaded,
+            "seconds": round(load_seconds, 3),
+            "rows_per_sec": round(loaded / load_seconds) if load_seconds else None,
+            "batch_size": args.batch_size,
+            "workers": args.workers,
+            "db_bytes": os.path.getsize("medical_warehouse.db"),
+        }
+
+        started = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            load_json_to_sqlite(batch_size=args.batch_size, workers=args.workers)
+        result["load"]["noop_reload_seconds"] = round(time.perf_counter() - started, 3)
+
+        if endpoints is not None:
+            result["api"] = time_api(endpoints, args.repeats)
+            result["api_cached"] = time_api(endpoints, args.repeats, cached=True)
+        return result
+    finally:
+        os.chdir(previous_cwd)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"   📁 Kept {workdir}")
+
+
+def run_benchmarks(args):
+    try:
+        endpoints = load_api_endpoints()
+        api_status = "ok"
+    except ImportError as e:
+        endpoints = None
+        api_status = f"skipped: {e}"
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "api": api_status,
+        "runs": [],
+    }
+
+    for size in args.sizes:
+        print(f"🏁 Benchmarking {size:,} messages...")
+        result = run_size(size, args, endpoints)
+        load = result["load"]
+        print(f"   ⏱️ load {load['seconds']}s ({load['rows_per_sec']:,} rows/sec), "
+              f"no-op reload {load['noop_reload_seconds']}s")
+        for label, timing in result.get("api", {}).items():
+            print(f"   🔎 {label}: {timing}")
+        for label, timing in result.get("api_cached", {}).items():
+            print(f"   ⚡ {label} (cached): {timing}")
+        report["runs"].append(result)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {output}")
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the loader and API at several data sizes")
+    parser.add_argument("--sizes", default="10000,100000",
+                        type=lambda value: [int(v) for v in value.split(',')],
+                        help="Comma-separated message counts (10k - 50M)")
+    parser.add_argument("--channels", type=int, default=6, help="Channels in the synthetic data")
+    parser.add_argument("--days", type=int, default=30, help="Daily partitions in the synthetic data")
+    parser.add_argument("--seed", type=int, default=42, help="Generator seed")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Loader batch size")
+    parser.add_argument("--workers", type=int, default=1, help="Loader parser processes")
+    parser.add_argument("--repeats", type=int, default=20, help="Calls per API endpoint")
+    parser.add_argument("--images", action="store_true", help="Also write placeholder image files")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directories")
+    parser.add_argument("--output", help="Results file (default benchmark_results/<time>-<commit>.json)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run_benchmarks(parse_args())
@@ -0,0 +1,204 @@
+"""
+API latency benchmark under concurrent clients.
+
+Loads a synthetic warehouse, starts the API under uvicorn (one worker)
+and has N concurrent HTTP clients cycle through the report, search and
+health endpoints. Each database mode gets its own server: 'pool' runs
+queries on api.database's thread pool, 'inline' runs them on the event
+loop with a connection per query (the old behaviour). p50/p99 latency
+and requests/sec are reported per mode and endpoint. --think-ms adds a
+random pause between a client's requests (dashboard polling) so the
+server can be measured below saturation:
+
+    python src/benchmark_api_concurrency.py --messages 100000 --clients 200
+    python src/benchmark_api_concurrency.py --messages 10000 --clients 200 --think-ms 5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from benchmark import REPO_ROOT, RESULTS_DIR, git_commit, percentile
+from generate_synthetic_data import generate_dataset
+from load_to_sqlite import load_json_to_sqlite
+
+# (label, url) cycled through by every client
+REQUESTS = [
+    ("summary", "/api/summary"),
+    ("top_products", "/api/reports/top-products?limit=10"),
+    ("channel_activity", "/api/channels/tikvahpharma/activity"),
+    ("search_messages", "/api/search/messages?query=NIDO&limit=20"),
+    ("visual_content", "/api/reports/visual-content"),
+    ("health", "/health"),
+]
+
+
+def latency_summary(samples, elapsed=None):
+    ms = [s * 1000 for s in samples]
+    summary = {
+        "requests": len(ms),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms), 2),
+    }
+    if elapsed:
+        summary["requests_per_sec"] = round(len(ms) / elapsed, 1)
+    return summary
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, pool_size):
+    """uvicorn serving api.main from the current directory's warehouse; returns once it answers"""
+    import httpx
+
+    env = dict(os.environ, API_DB_POOL_SIZE=str(pool_size),
+               PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.getenv('PYTHONPATH')])))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning",
+         "--no-access-log", "--timeout-keep-alive", "300"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start within 60s")
+
+
+async def run_clients(base_url, clients, requests_per_client, think_ms=0, seed=42):
+    """Fire requests from concurrent clients; returns ({label: [seconds]}, elapsed, errors)"""
+    import httpx
+
+    samples = {label: [] for label, _ in REQUESTS}
+    errors = 0
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        async def worker(offset):
+            nonlocal errors
+            rng = random.Random(seed + offset)
+            for i in range(requests_per_client):
+                if think_ms:
+                    await asyncio.sleep(rng.expovariate(1000 / think_ms))
+                label, url = REQUESTS[(offset + i) % len(REQUESTS)]
+                started = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    failed = response.status_code != 200
+                except httpx.HTTPError:
+                    failed = True
+                samples[label].append(time.perf_counter() - started)
+                errors += failed
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(offset) for offset in range(clients)))
+        elapsed = time.perf_counter() - started
+    return samples, elapsed, errors
+
+
+def run_mode(mode, args):
+    pool_size = args.pool_size if mode == 'pool' else 0
+    port = free_port()
+    server = start_server(port, pool_size)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(run_clients(base_url, min(args.clients, 10), 1))  # warm-up
+        samples, elapsed, errors = asyncio.run(
+            run_clients(base_url, args.clients, args.requests, args.think_ms, args.seed))
+    finally:
+        server.terminate()
+        server.wait()
+
+    result = {
+        "mode": mode,
+        "pool_size": pool_size,
+        "seconds": round(elapsed, 3),
+        "errors": errors,
+        "overall": latency_summary([s for values in samples.values() for s in values], elapsed),
+        "endpoints": {label: latency_summary(values) for label, values in samples.items()},
+    }
+    overall = result["overall"]
+    print(f"   {mode}: p50 {overall['p50_ms']}ms, p99 {overall['p99_ms']}ms, "
+          f"{overall['requests_per_sec']} requests/sec, {errors} errors")
+    for label, timing in result["endpoints"].items():
+        print(f"      {label}: p50 {timing['p50_ms']}ms, p99 {timing['p99_ms']}ms")
+    return result
+
+
+def run_benchmarks(args):
+    workdir = tempfile.mkdtemp(prefix="api_bench_")
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "messages": args.messages,
+        "clients": args.clients,
+        "requests_per_client": args.requests,
+        "think_ms": args.think_ms,
+        "runs": [],
+    }
+    try:
+        print(f"🏗️ Loading {args.messages:,} synthetic messages...")
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            generate_dataset(args.messages, args.channels, args.days, data_root="data/raw", seed=args.seed)
+            load_json_to_sqlite()
+        for mode in args.modes:
+            print(f"🏁 {args.clients} clients x {args.requests} requests, {mode} queries...")
+            report["runs"].append(run_mode(mode, args))
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"api-concurrency-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {output}")
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark API latency under concurrent clients")
+    parser.add_argument("--messages", type=int, default=100000, help="Synthetic messages to load")
+    parser.add_argument("--channels", type=int, default=6, help="Channels in the synthetic data")
+    parser.add_argument("--days", type=int, default=30, help="Daily partitions in the synthetic data")
+    parser.add_argument("--seed", type=int, default=42, help="Generator seed")
+    parser.add_argument("--clients", type=int, default=200, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=6, help="Requests per client")
+    parser.add_argument("--think-ms", type=float, default=0,
+                        help="Mean random pause before each request (0: back to back)")
+    parser.add_argument("--pool-size", type=int, default=int(os.getenv('API_DB_POOL_SIZE', '8')),
+                        help="Query threads in pool mode")
+    parser.add_argument("--modes", default="inline,pool", type=lambda value: value.split(','),
+                        help="Comma-separated database modes to compare (inline, pool)")
+    parser.add_argument("--output", help="Results file (default benchmark_results/api-concurrency-<time>-<commit>.json)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run_benchmarks(parse_args())
@@ -0,0 +1,195 @@
+"""
+Per-request CPU and allocation benchmark of the API's result path.
+
+Loads a synthetic warehouse, captures the SQL the search and channel
+activity endpoints run, and replays it through two result paths on one
+connection:
+
+    pandas: pd.read_sql_query -> DataFrame.to_dict(orient='records') ->
+            jsonable_encoder -> JSONResponse (the API before this change)
+    rows:   cursor tuples -> dicts -> RowsJSONResponse (orjson)
+
+CPU time (time.process_time) is averaged over --repeats requests;
+allocation peaks come from tracemalloc in a separate pass so tracing
+doesn't inflate the timings. The import cost of api.main and pandas is
+measured in fresh interpreters.
+
+    python src/benchmark_api_serialization.py --messages 100000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from benchmark import REPO_ROOT, RESULTS_DIR, git_commit, load_api_endpoints, percentile
+from generate_synthetic_data import generate_dataset
+from load_to_sqlite import load_json_to_sqlite
+
+# (label, path, keyword arguments) of the endpoints whose SQL is replayed
+CASES = [
+    ("search_messages", "/api/search/messages", {"query": "NIDO", "limit": 20, "channel": None, "order": "relevance"}),
+    ("search_messages_200", "/api/search/messages", {"query": "Paracetamol", "limit": 200, "channel": None,
+                                                     "order": "views"}),
+    ("channel_activity", "/api/channels/{channel_name}/activity", {"channel_name": "tikvahpharma"}),
+]
+
+
+def captured_statements(endpoint, kwargs):
+    """The (sql, params) statements an endpoint runs, recorded from api.database.db"""
+    from api.database import db
+
+    recorded = []
+    queries = db.queries
+
+    def recording(fn, statements):
+        recorded.extend(statements)
+        return queries(fn, statements)
+
+    db.queries = recording
+    try:
+        asyncio.run(endpoint(**kwargs))
+    finally:
+        del db.queries
+    return recorded
+
+
+def pandas_path(conn, statements):
+    import pandas as pd
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    results = []
+    for sql, params in statements:
+        df = pd.read_sql_query(sql, conn, params=params)
+        # NULL counts come back as NaN, which JSON can't encode
+        results.append(df.astype(object).where(df.notna(), None).to_dict(orient='records'))
+    return JSONResponse(jsonable_encoder({"status": "success", "results": results})).body
+
+
+def rows_path(conn, statements):
+    from api.database import Database
+    from api.responses import RowsJSONResponse
+
+    results = [Database.fetch_rows(conn, sql, params) for sql, params in statements]
+    return RowsJSONResponse({"status": "success", "results": results}).body
+
+
+def query_only(conn, statements):
+    for sql, params in statements:
+        conn.execute(sql, params).fetchall()
+
+
+def measure(path, conn, statements, repeats):
+    path(conn, statements)  # warm-up
+    cpu, wall = [], []
+    for _ in range(repeats):
+        cpu_started, wall_started = time.process_time(), time.perf_counter()
+        path(conn, statements)
+        cpu.append(time.process_time() - cpu_started)
+        wall.append(time.perf_counter() - wall_started)
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        path(conn, statements)
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return {
+        "cpu_ms": round(statistics.mean(cpu) * 1000, 3),
+        "p50_ms": round(percentile([s * 1000 for s in wall], 50), 3),
+        "peak_alloc_kb": round(peak / 1024, 1),
+    }
+
+
+def import_seconds(statement):
+    """Seconds a fresh interpreter spends on statement"""
+    code = f"import time; started = time.perf_counter(); {statement}; print(time.perf_counter() - started)"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.getenv('PYTHONPATH')])))
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    return round(float(output.stdout.strip().splitlines()[-1]), 3)
+
+
+def run_benchmarks(args):
+    import sqlite3
+
+    endpoints = load_api_endpoints()
+    workdir = tempfile.mkdtemp(prefix="api_serialization_")
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "messages": args.messages,
+        "repeats": args.repeats,
+        "startup": {
+            "api_main_import_seconds": import_seconds("import api.main"),
+            "pandas_import_seconds": import_seconds("import pandas"),
+        },
+        "endpoints": {},
+    }
+    try:
+        print(f"🏗️ Loading {args.messages:,} synthetic messages...")
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            generate_dataset(args.messages, args.channels, args.days, data_root="data/raw", seed=args.seed)
+            load_json_to_sqlite()
+        conn = sqlite3.connect("medical_warehouse.db")
+        for label, path, kwargs in CASES:
+            statements = captured_statements(endpoints[path], kwargs)
+            result = {
+                "statements": len(statements),
+                "response_bytes": len(rows_path(conn, statements)),
+                "query_only": measure(query_only, conn, statements, args.repeats),
+                "pandas": measure(pandas_path, conn, statements, args.repeats),
+                "rows": measure(rows_path, conn, statements, args.repeats),
+            }
+            pandas, rows = result["pandas"], result["rows"]
+            result["cpu_saved_ms"] = round(pandas["cpu_ms"] - rows["cpu_ms"], 3)
+            report["endpoints"][label] = result
+            print(f"   {label}: cpu {pandas['cpu_ms']}ms -> {rows['cpu_ms']}ms "
+                  f"(query alone {result['query_only']['cpu_ms']}ms), "
+                  f"peak alloc {pandas['peak_alloc_kb']}KB -> {rows['peak_alloc_kb']}KB")
+        conn.close()
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    startup = report["startup"]
+    print(f"   import api.main {startup['api_main_import_seconds']}s, "
+          f"import pandas {startup['pandas_import_seconds']}s (no longer on the API's path)")
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"api-serialization-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {output}")
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark per-request CPU and allocations of the API result path")
+    parser.add_argument("--messages", type=int, default=100000, help="Synthetic messages to load")
+    parser.add_argument("--channels", type=int, default=6, help="Channels in the synthetic data")
+    parser.add_argument("--days", type=int, default=30, help="Daily partitions in the synthetic data")
+    parser.add_argument("--seed", type=int, default=42, help="Generator seed")
+    parser.add_argument("--repeats", type=int, default=200, help="Timed requests per endpoint and path")
+    parser.add_argument("--output", help="Results file (default benchmark_results/api-serialization-<time>-<commit>.json)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run_benchmarks(parse_args())
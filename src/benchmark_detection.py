@@ -0,0 +1,159 @@
+"""
+Image detection throughput benchmark.
+
+Runs the YOLO engine over the scraped images (or synthetic 1080x1080
+product shots, Telegram's photo size, when there are none) once per batch
+size and reports images/sec, per-batch model latency and the time spent
+reading, decoding, letterboxing, waiting for the prefetcher and in the
+model, so batch size and thread counts can be tuned for the enrichment
+box. Each backend runs in its own process, so its load time and peak
+memory are measured separately:
+
+    python src/benchmark_detection.py --batch-sizes 1,4,8,16 --threads 4
+    python src/benchmark_detection.py --backends torch,onnx,onnx-int8
+"""
+
+import argparse
+import json
+import os
+import multiprocessing
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from benchmark import RESULTS_DIR, git_commit
+from generate_synthetic_data import make_image_bytes
+from image_prefetch import StageTimers
+from yolo_detect import BACKENDS, DEFAULT_PREFETCH_WORKERS, DEFAULT_THREADS, IMAGE_DIR, MODEL_PATH, iter_images
+
+
+def synthetic_images(count, size=1080):
+    """Write count distinct synthetic JPEGs to a scratch directory"""
+    workdir = tempfile.mkdtemp(prefix="detect_bench_")
+    paths = []
+    for i in range(count):
+        path = os.path.join(workdir, f"{i}.jpg")
+        with open(path, 'wb') as f:
+            f.write(make_image_bytes(f"product {i}", size))
+        paths.append(path)
+    return workdir, paths
+
+
+def time_batches(engine, paths, batch_size):
+    engine.batch_size = batch_size
+    engine.detect_paths(paths[:batch_size])  # warm-up
+    engine.timers = StageTimers()
+    started = time.perf_counter()
+    engine.detect_paths(paths)
+    elapsed = time.perf_counter() - started
+    return {
+        "batch_size": batch_size,
+        "images": len(paths),
+        "seconds": round(elapsed, 3),
+        "images_per_sec": round(len(paths) / elapsed, 2),
+        "batch_ms_p50": round(percentile(engine.timers.batches, 50) * 1000, 2),
+        "batch_ms_p99": round(percentile(engine.timers.batches, 99) * 1000, 2),
+        "stage_seconds": engine.timers.as_dict(),
+    }
+
+
+def percentile(values, pct):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+
+def benchmark_backend(backend, paths, args):
+    """Load one backend and time it at every batch size (run in a fresh process)"""
+    from yolo_detect import load_engine
+
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    engine = load_engine(backend, args.model, threads=args.threads, prefetch_workers=args.prefetch_workers)
+    result = {
+        "backend": backend,
+        "model": engine.model_version,
+        "load_seconds": round(time.perf_counter() - started, 3),
+        "runs": [],
+    }
+    for batch_size in args.batch_sizes:
+        print(f"🏁 {backend}: detecting {len(paths)} images with batch size {batch_size}...", flush=True)
+        run = time_batches(engine, paths, batch_size)
+        print(f"   ⏱️ {run['seconds']}s ({run['images_per_sec']} images/sec, "
+              f"p50 {run['batch_ms_p50']}ms, p99 {run['batch_ms_p99']}ms per batch)")
+        print(f"   Stages: {engine.timers.summary()}", flush=True)
+        result["runs"].append(run)
+    result["baseline_rss_mb"] = baseline
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_benchmarks(args):
+    workdir = None
+    paths = [path for _, _, path in iter_images(args.image_dir)] if os.path.isdir(args.image_dir) else []
+    if not paths:
+        workdir, paths = synthetic_images(args.images)
+    paths = paths[:args.images]
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "threads": args.threads,
+        "prefetch_workers": args.prefetch_workers,
+        "source": "synthetic" if workdir else args.image_dir,
+        "backends": [],
+    }
+    try:
+        for backend in args.backends:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(benchmark_backend, backend, paths, args).result()
+            print(f"   {backend}: loaded in {result['load_seconds']}s, peak RSS {result['peak_rss_mb']} MB")
+            report["backends"].append(result)
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"detection-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {output}")
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark YOLO detection throughput")
+    parser.add_argument("--batch-sizes", default="1,4,8,16",
+                        type=lambda value: [int(v) for v in value.split(',')],
+                        help="Comma-separated batch sizes")
+    parser.add_argument("--backends", default="torch",
+                        type=lambda value: value.split(','),
+                        help=f"Comma-separated backends to compare ({', '.join(BACKENDS)})")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="CPU threads for inference")
+    parser.add_argument("--prefetch-workers", type=int, default=DEFAULT_PREFETCH_WORKERS,
+                        help="Threads decoding the next batch during inference")
+    parser.add_argument("--model", default=MODEL_PATH, help="YOLO weights")
+    parser.add_argument("--images", type=int, default=64, help="Images per run")
+    parser.add_argument("--image-dir", default=IMAGE_DIR, help="Images to benchmark on (synthetic if empty)")
+    parser.add_argument("--output", help="Results file (default benchmark_results/detection-<time>-<commit>.json)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run_benchmarks(parse_args())
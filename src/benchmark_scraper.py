@@ -0,0 +1,141 @@
+"""
+Scraper throughput benchmark against the fake Telegram backend.
+
+Runs a full backfill of every fake channel once per concurrency setting
+(in a scratch directory, so checkpoints and files start empty) and reports
+messages/sec, media MB/sec and how often the adaptive limiter hit
+FloodWait. Results are written as JSON next to the ingest benchmarks:
+
+    python src/benchmark_scraper.py --concurrency 1,2,4,8 --latency 0.05
+    python src/benchmark_scraper.py --replay data/raw/telegram_messages
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from benchmark import RESULTS_DIR, git_commit
+from fake_telegram import FakeTelegramClient
+from media_store import MediaDownloader
+from rate_limiter import AdaptiveRateLimiter
+from scraper import TelegramScraper
+
+
+def make_client(args):
+    options = dict(latency=args.latency, jitter=args.jitter, max_page_size=args.page_size,
+                   media_bytes=args.media_bytes, bandwidth_mbps=args.bandwidth_mbps,
+                   flood_every=args.flood_every, flood_rate_limit=args.flood_rate_limit,
+                   flood_seconds=args.flood_seconds)
+    if args.replay:
+        return FakeTelegramClient.from_data_lake(os.path.abspath(args.replay), **options)
+    return FakeTelegramClient.from_synthetic(args.messages, args.channels, args.days, seed=args.seed,
+                                             **options)
+
+
+def run_concurrency(concurrency, args):
+    """One backfill of every fake channel at the given channel concurrency"""
+    client = make_client(args)
+    channels = client.channel_names()
+    history = max(len(messages) for messages in client.channels.values())
+
+    workdir = tempfile.mkdtemp(prefix=f"scrape_bench_{concurrency}_")
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        limiter = AdaptiveRateLimiter(rate=args.rate, max_rate=args.max_rate)
+        media_limiter = AdaptiveRateLimiter(rate=args.rate, max_rate=args.media_max_rate,
+                                            burst=args.media_workers)
+        scraper = TelegramScraper(client=client, concurrency=concurrency, limiter=limiter,
+                                  page_size=args.page_size, media_limiter=media_limiter)
+        scraper.media = MediaDownloader(scraper.download_photo, workers=args.media_workers)
+
+        started = time.perf_counter()
+        asyncio.run(scraper.run_scraping(channels, limit=history))
+        elapsed = time.perf_counter() - started
+
+        messages = sum(stats['messages'] for stats in scraper.channel_stats.values())
+        media = scraper.media.stats
+        return {
+            "concurrency": concurrency,
+            "channels": len(channels),
+            "messages": messages,
+            "seconds": round(elapsed, 3),
+            "messages_per_sec": round(messages / elapsed, 1),
+            "media": media['downloaded'],
+            "media_unique": media['unique'],
+            "media_mb_per_sec": round(media['bytes'] / elapsed / 1e6, 3),
+            "requests": client.stats['requests'],
+            "flood_waits": client.stats['flood_waits'],
+            "final_rate_per_sec": limiter.stats()['rate_per_sec'],
+            "final_media_rate_per_sec": media_limiter.stats()['rate_per_sec'],
+        }
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_benchmarks(args):
+    # The scraper logs every channel and chunk; keep the report readable
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("concurrency", "output")},
+        "runs": [],
+    }
+    for concurrency in args.concurrency:
+        print(f"🏁 Scraping with concurrency {concurrency}...")
+        result = run_concurrency(concurrency, args)
+        print(f"   ⏱️ {result['messages']:,} messages in {result['seconds']}s "
+              f"({result['messages_per_sec']:,} msgs/sec), media {result['media_mb_per_sec']} MB/sec, "
+              f"{result['flood_waits']} FloodWaits")
+        report["runs"].append(result)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"scraper-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {output}")
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark TelegramScraper against a fake Telegram backend")
+    parser.add_argument("--concurrency", default="1,2,4,8",
+                        type=lambda value: [int(v) for v in value.split(',')],
+                        help="Comma-separated channel concurrency settings")
+    parser.add_argument("--replay", help="Replay this JSON data lake instead of synthetic history")
+    parser.add_argument("--messages", type=int, default=5000, help="Synthetic messages in total")
+    parser.add_argument("--channels", type=int, default=8, help="Synthetic channels")
+    parser.add_argument("--days", type=int, default=7, help="Days of synthetic history")
+    parser.add_argument("--seed", type=int, default=42, help="Generator seed")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per fake request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random seconds per request")
+    parser.add_argument("--page-size", type=int, default=100, help="Messages per get_messages call")
+    parser.add_argument("--media-bytes", type=int, default=100000, help="Bytes per photo payload")
+    parser.add_argument("--bandwidth-mbps", type=float, help="Simulated media download bandwidth")
+    parser.add_argument("--media-workers", type=int, default=4, help="Media download workers")
+    parser.add_argument("--flood-every", type=int, default=0, help="FloodWait on every Nth request")
+    parser.add_argument("--flood-rate-limit", type=int,
+                        help="FloodWait when more requests than this arrive within one second")
+    parser.add_argument("--flood-seconds", type=int, default=1, help="Seconds each FloodWait asks for")
+    parser.add_argument("--rate", type=float, default=5.0, help="Limiter starting requests/sec")
+    parser.add_argument("--max-rate", type=float, default=30.0, help="Limiter ceiling requests/sec")
+    parser.add_argument("--media-max-rate", type=float, default=100.0, help="Media limiter ceiling requests/sec")
+    parser.add_argument("--output", help="Results file (default benchmark_results/scraper-<time>-<commit>.json)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run_benchmarks(parse_args())
@@ -0,0 +1,77 @@
+"""
+One-off converter from the JSON data lake to the Parquet raw layer.
+
+Every data/raw/telegram_messages/<date>/<channel>.json(l) file becomes
+channel_name=<channel>/date=<date>/part-<file name>.parquet, so re-running
+the conversion overwrites its own output instead of duplicating it.
+"""
+
+import argparse
+import os
+
+from load_to_sqlite import JSON_DIR, chunked, discover_json_files, iter_messages
+from parquet_lake import PARQUET_DIR, ROW_GROUP_SIZE, messages_to_table, open_writer, partition_dir
+
+
+def convert_file(file_path, date_str, base_dir=PARQUET_DIR):
+    """Stream one JSON/JSONL file into per-channel Parquet files, return row count"""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    writers = {}
+    row_count = 0
+    completed = False
+    try:
+        for chunk in chunked(iter_messages(file_path), ROW_GROUP_SIZE):
+            by_channel = {}
+            for msg in chunk:
+                by_channel.setdefault(msg['channel_name'], []).append(msg)
+            for channel_name, messages in by_channel.items():
+                if channel_name not in writers:
+                    output_dir = partition_dir(channel_name, date_str, base_dir)
+                    # Dot-prefixed, like parquet_lake: dataset readers skip hidden files
+                    tmp_path = os.path.join(output_dir, f".part-{stem}.parquet.tmp")
+                    writers[channel_name] = (open_writer(tmp_path), tmp_path,
+                                             os.path.join(output_dir, f"part-{stem}.parquet"))
+                writers[channel_name][0].write_table(messages_to_table(messages))
+                row_count += len(messages)
+        completed = True
+    finally:
+        for writer, tmp_path, _ in writers.values():
+            writer.close()
+            if not completed:
+                os.remove(tmp_path)
+
+    # Publish only complete files so readers never see a partial partition
+    for _, tmp_path, final_path in writers.values():
+        os.replace(tmp_path, final_path)
+    return row_count
+
+
+def convert_json_lake(json_dir=JSON_DIR, base_dir=PARQUET_DIR):
+    total_rows = 0
+    total_files = 0
+    for date_folder, file_path in discover_json_files(json_dir):
+        if file_path.endswith('.parquet'):
+            continue
+        try:
+            rows = convert_file(file_path, date_folder, base_dir)
+        except Exception as e:
+            print(f"   ❌ Error converting {file_path}: {e}")
+            continue
+        print(f"   📦 {date_folder}/{os.path.basename(file_path)} -> {rows} rows")
+        total_rows += rows
+        total_files += 1
+
+    print(f"✅ Converted {total_files} files ({total_rows} messages) into {base_dir}")
+    return total_rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert the JSON data lake to partitioned Parquet")
+    parser.add_argument("--data-dir", default=JSON_DIR, help="Root of the raw JSON data lake")
+    parser.add_argument("--output-dir", default=PARQUET_DIR, help="Root of the Parquet raw layer")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    convert_json_lake(args.data_dir, args.output_dir)
@@ -0,0 +1,173 @@
+"""
+Persistent detection cache for the YOLO enrichment step.
+
+Detections are stored per (image sha256, model_version), so a reposted
+image is inferred once and switching weights or thresholds only misses
+the entries of the new model version. A stat index (path, size, mtime)
+avoids re-hashing files that have not changed since the last run, so a
+daily run only reads and infers the day's new images. image_phashes
+keeps each image's perceptual hashes and image_clusters its near-duplicate
+cluster per dedup threshold (image_dedup.py), so changing the threshold
+re-clusters without re-hashing.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+CACHE_PATH = 'data/processed/detection_cache.db'
+
+CREATE_CACHE_SQL = """
+CREATE TABLE IF NOT EXISTS image_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS image_detections (
+    sha256 TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    detections TEXT NOT NULL,
+    analyzed_at TEXT NOT NULL,
+    PRIMARY KEY (sha256, model_version)
+);
+CREATE TABLE IF NOT EXISTS image_phashes (
+    sha256 TEXT PRIMARY KEY,
+    phash TEXT NOT NULL,
+    dhash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS image_clusters (
+    threshold INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    representative TEXT NOT NULL,
+    distance INTEGER NOT NULL,
+    PRIMARY KEY (threshold, sha256)
+);
+CREATE INDEX IF NOT EXISTS idx_image_clusters_representative ON image_clusters(threshold, representative);
+"""
+
+# Caches from before clusters were keyed by threshold: keep the hashes, drop
+# the assignments (their threshold is unknown) so they are rebuilt
+MIGRATE_CLUSTERS_SQL = """
+CREATE TABLE IF NOT EXISTS image_phashes (
+    sha256 TEXT PRIMARY KEY,
+    phash TEXT NOT NULL,
+    dhash TEXT NOT NULL
+);
+INSERT OR IGNORE INTO image_phashes (sha256, phash, dhash) SELECT sha256, phash, dhash FROM image_clusters;
+DROP TABLE image_clusters;
+"""
+
+
+def file_sha256(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def model_version(model_path, *settings):
+    """
+    Identify a model by its weights and the settings that change its output.
+
+    Weights that ultralytics downloads on first use are only known by name.
+    """
+    version = os.path.basename(model_path)
+    if os.path.exists(model_path):
+        version += f"@{file_sha256(model_path)[:12]}"
+    return ':'.join([version] + [str(s) for s in settings])
+
+
+class DetectionCache:
+    def __init__(self, path=CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(image_clusters)")]
+        if columns and 'threshold' not in columns:
+            self.conn.executescript(MIGRATE_CLUSTERS_SQL)
+        self.conn.executescript(CREATE_CACHE_SQL)
+        self.hashed = 0
+
+    def image_hash(self, file_path):
+        """sha256 of an image, re-hashing only when its size or mtime changed"""
+        stat = os.stat(file_path)
+        row = self.conn.execute("SELECT size, mtime_ns, sha256 FROM image_files WHERE path = ?",
+                                (file_path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        sha256 = file_sha256(file_path)
+        self.hashed += 1
+        self.conn.execute("INSERT OR REPLACE INTO image_files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                          (file_path, stat.st_size, stat.st_mtime_ns, sha256))
+        return sha256
+
+    def lookup(self, sha256s, version):
+        """{sha256: (detections, analyzed_at)} for the hashes already analysed by version"""
+        found = {}
+        sha256s = list(sha256s)
+        for start in range(0, len(sha256s), 500):
+            chunk = sha256s[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for sha256, detections, analyzed_at in self.conn.execute(
+                    f"SELECT sha256, detections, analyzed_at FROM image_detections "
+                    f"WHERE model_version = ? AND sha256 IN ({placeholders})", [version] + chunk):
+                found[sha256] = ([tuple(d) for d in json.loads(detections)], analyzed_at)
+        return found
+
+    def store(self, results, version):
+        """Save {sha256: detections} for version; returns the analysis timestamp"""
+        analyzed_at = datetime.now().isoformat()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO image_detections (sha256, model_version, detections, analyzed_at) "
+            "VALUES (?, ?, ?, ?)",
+            [(sha256, version, json.dumps(detections), analyzed_at) for sha256, detections in results.items()])
+        self.conn.commit()
+        return analyzed_at
+
+    def image_phashes(self, sha256s):
+        """{sha256: (phash, dhash)} for the images hashed on earlier runs"""
+        found = {}
+        sha256s = list(sha256s)
+        for start in range(0, len(sha256s), 500):
+            chunk = sha256s[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for sha256, value, gradient in self.conn.execute(
+                    f"SELECT sha256, phash, dhash FROM image_phashes WHERE sha256 IN ({placeholders})", chunk):
+                found[sha256] = (int(value, 16), int(gradient, 16))
+        return found
+
+    def save_phashes(self, rows):
+        """rows of (sha256, phash, dhash)"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO image_phashes (sha256, phash, dhash) VALUES (?, ?, ?)",
+            [(sha256, f"{value:016x}", f"{gradient:016x}") for sha256, value, gradient in rows])
+        self.conn.commit()
+
+    def cluster_assignments(self, threshold):
+        """{sha256: (representative_sha256, distance)} for every image clustered at threshold"""
+        return {sha256: (representative, distance) for sha256, representative, distance in self.conn.execute(
+            "SELECT sha256, representative, distance FROM image_clusters WHERE threshold = ?", (threshold,))}
+
+    def representative_hashes(self, threshold):
+        """(sha256, phash) of every cluster representative at threshold"""
+        return [(sha256, int(value, 16)) for sha256, value in self.conn.execute(
+            "SELECT c.sha256, h.phash FROM image_clusters c JOIN image_phashes h ON h.sha256 = c.sha256 "
+            "WHERE c.threshold = ? AND c.representative = c.sha256", (threshold,))]
+
+    def save_clusters(self, rows, threshold):
+        """rows of (sha256, representative, distance) assigned at threshold"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO image_clusters (threshold, sha256, representative, distance) "
+            "VALUES (?, ?, ?, ?)",
+            [(threshold, sha256, representative, distance) for sha256, representative, distance in rows])
+        self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
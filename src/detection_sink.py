@@ -0,0 +1,289 @@
+"""
+Write YOLO detections into the warehouse.
+
+Detections are upserted into raw_yolo_detections (SQLite) or
+raw.yolo_detections (PostgreSQL), keyed like the messages on
+(channel_name, message_id), so fct_image_detections and the API read them
+without going through a CSV. analysis_timestamp comes from the detection
+cache and only changes when an image is re-analysed, so a daily run only
+touches the rows of new or re-inferred images.
+
+Near-duplicate clusters (image_dedup.py) go to raw_image_clusters /
+raw.image_clusters the same way, one row per image with its cluster's
+representative sha256 as cluster_id, for analytics on reposted shots.
+"""
+
+import sqlite3
+
+from load_to_sqlite import CREATE_GENERATION_SQL, DB_PATH, apply_bulk_pragmas, bump_generation, chunked
+
+COLUMNS = ('message_id', 'channel_name', 'detected_class', 'confidence_score',
+           'image_category', 'analysis_timestamp')
+
+# Rows per executemany() call / COPY
+BATCH_SIZE = 5000
+
+CREATE_SQLITE_SQL = """
+CREATE TABLE IF NOT EXISTS raw_yolo_detections (
+    message_id INTEGER NOT NULL,
+    channel_name TEXT NOT NULL,
+    detected_class TEXT,
+    confidence_score REAL,
+    image_category TEXT NOT NULL,
+    analysis_timestamp TEXT,
+    PRIMARY KEY (channel_name, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_yolo_detections_category ON raw_yolo_detections(image_category);
+"""
+
+# Unchanged rows are skipped by the WHERE, so replays cost no writes
+SQLITE_UPSERT_SQL = """
+INSERT INTO raw_yolo_detections
+(message_id, channel_name, detected_class, confidence_score, image_category, analysis_timestamp)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(channel_name, message_id) DO UPDATE SET
+    detected_class = excluded.detected_class,
+    confidence_score = excluded.confidence_score,
+    image_category = excluded.image_category,
+    analysis_timestamp = excluded.analysis_timestamp
+WHERE excluded.analysis_timestamp IS NOT analysis_timestamp
+   OR excluded.detected_class IS NOT detected_class
+   OR excluded.confidence_score IS NOT confidence_score
+"""
+
+CLUSTER_COLUMNS = ('message_id', 'channel_name', 'sha256', 'cluster_id', 'hamming_distance', 'dedup_threshold')
+
+CREATE_SQLITE_CLUSTERS_SQL = """
+CREATE TABLE IF NOT EXISTS raw_image_clusters (
+    message_id INTEGER NOT NULL,
+    channel_name TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    cluster_id TEXT NOT NULL,
+    hamming_distance INTEGER NOT NULL,
+    dedup_threshold INTEGER NOT NULL,
+    PRIMARY KEY (channel_name, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_image_clusters_cluster ON raw_image_clusters(cluster_id);
+"""
+
+SQLITE_CLUSTER_UPSERT_SQL = """
+INSERT INTO raw_image_clusters
+(message_id, channel_name, sha256, cluster_id, hamming_distance, dedup_threshold)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(channel_name, message_id) DO UPDATE SET
+    sha256 = excluded.sha256,
+    cluster_id = excluded.cluster_id,
+    hamming_distance = excluded.hamming_distance,
+    dedup_threshold = excluded.dedup_threshold
+WHERE excluded.sha256 IS NOT sha256
+   OR excluded.cluster_id IS NOT cluster_id
+   OR excluded.hamming_distance IS NOT hamming_distance
+   OR excluded.dedup_threshold IS NOT dedup_threshold
+"""
+
+CREATE_POSTGRES_SQL = """
+CREATE SCHEMA IF NOT EXISTS raw;
+
+CREATE TABLE IF NOT EXISTS raw.yolo_detections (
+    message_id BIGINT NOT NULL,
+    channel_name VARCHAR(255) NOT NULL,
+    detected_class VARCHAR(64),
+    confidence_score REAL,
+    image_category VARCHAR(32) NOT NULL,
+    analysis_timestamp TIMESTAMP,
+    PRIMARY KEY (channel_name, message_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_yolo_detections_category ON raw.yolo_detections(image_category);
+
+CREATE UNLOGGED TABLE IF NOT EXISTS raw.yolo_detections_staging (
+    message_id BIGINT,
+    channel_name VARCHAR(255),
+    detected_class VARCHAR(64),
+    confidence_score REAL,
+    image_category VARCHAR(32),
+    analysis_timestamp TIMESTAMP
+);
+TRUNCATE raw.yolo_detections_staging;
+"""
+
+POSTGRES_COPY_SQL = f"COPY raw.yolo_detections_staging ({', '.join(COLUMNS)}) FROM STDIN"
+
+POSTGRES_MERGE_SQL = """
+INSERT INTO raw.yolo_detections AS t
+    (message_id, channel_name, detected_class, confidence_score, image_category, analysis_timestamp)
+SELECT DISTINCT ON (channel_name, message_id)
+    message_id, channel_name, detected_class, confidence_score, image_category, analysis_timestamp
+FROM raw.yolo_detections_staging
+ORDER BY channel_name, message_id, analysis_timestamp DESC NULLS LAST
+ON CONFLICT (channel_name, message_id) DO UPDATE SET
+    detected_class = EXCLUDED.detected_class,
+    confidence_score = EXCLUDED.confidence_score,
+    image_category = EXCLUDED.image_category,
+    analysis_timestamp = EXCLUDED.analysis_timestamp
+WHERE t.analysis_timestamp IS DISTINCT FROM EXCLUDED.analysis_timestamp
+   OR t.detected_class IS DISTINCT FROM EXCLUDED.detected_class
+   OR t.confidence_score IS DISTINCT FROM EXCLUDED.confidence_score
+"""
+
+CREATE_POSTGRES_CLUSTERS_SQL = """
+CREATE SCHEMA IF NOT EXISTS raw;
+
+CREATE TABLE IF NOT EXISTS raw.image_clusters (
+    message_id BIGINT NOT NULL,
+    channel_name VARCHAR(255) NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    cluster_id CHAR(64) NOT NULL,
+    hamming_distance SMALLINT NOT NULL,
+    dedup_threshold SMALLINT NOT NULL,
+    PRIMARY KEY (channel_name, message_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_image_clusters_cluster ON raw.image_clusters(cluster_id);
+
+CREATE UNLOGGED TABLE IF NOT EXISTS raw.image_clusters_staging (
+    message_id BIGINT,
+    channel_name VARCHAR(255),
+    sha256 CHAR(64),
+    cluster_id CHAR(64),
+    hamming_distance SMALLINT,
+    dedup_threshold SMALLINT
+);
+TRUNCATE raw.image_clusters_staging;
+"""
+
+POSTGRES_CLUSTER_COPY_SQL = f"COPY raw.image_clusters_staging ({', '.join(CLUSTER_COLUMNS)}) FROM STDIN"
+
+POSTGRES_CLUSTER_MERGE_SQL = """
+INSERT INTO raw.image_clusters AS t
+    (message_id, channel_name, sha256, cluster_id, hamming_distance, dedup_threshold)
+SELECT DISTINCT ON (channel_name, message_id)
+    message_id, channel_name, sha256, cluster_id, hamming_distance, dedup_threshold
+FROM raw.image_clusters_staging
+ORDER BY channel_name, message_id
+ON CONFLICT (channel_name, message_id) DO UPDATE SET
+    sha256 = EXCLUDED.sha256,
+    cluster_id = EXCLUDED.cluster_id,
+    hamming_distance = EXCLUDED.hamming_distance,
+    dedup_threshold = EXCLUDED.dedup_threshold
+WHERE t.sha256 IS DISTINCT FROM EXCLUDED.sha256
+   OR t.cluster_id IS DISTINCT FROM EXCLUDED.cluster_id
+   OR t.hamming_distance IS DISTINCT FROM EXCLUDED.hamming_distance
+   OR t.dedup_threshold IS DISTINCT FROM EXCLUDED.dedup_threshold
+"""
+
+
+def missing(value):
+    return value is None or value != value  # NaN is the DataFrame's missing value
+
+
+def detection_rows(results_df):
+    """Parameter tuples in COLUMNS order from a detections DataFrame"""
+    for row in results_df.reindex(columns=list(COLUMNS)).itertuples(index=False, name=None):
+        message_id, channel_name, detected_class, confidence, category, analyzed_at = row
+        yield (int(message_id), channel_name,
+               None if missing(detected_class) else detected_class,
+               None if missing(confidence) else float(confidence),
+               category,
+               None if missing(analyzed_at) else analyzed_at)
+
+
+class SqliteDetectionSink:
+    """Upsert detections into raw_yolo_detections in the SQLite warehouse"""
+
+    def __init__(self, db_path=DB_PATH, batch_size=BATCH_SIZE):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(db_path)
+        apply_bulk_pragmas(self.conn)
+        self.conn.executescript(CREATE_SQLITE_SQL + CREATE_SQLITE_CLUSTERS_SQL + CREATE_GENERATION_SQL)
+
+    def write(self, rows):
+        """Upsert rows, one transaction per batch; returns how many were inserted or changed"""
+        return self.upsert(SQLITE_UPSERT_SQL, rows)
+
+    def write_clusters(self, rows):
+        """Upsert raw_image_clusters rows (CLUSTER_COLUMNS order)"""
+        return self.upsert(SQLITE_CLUSTER_UPSERT_SQL, rows)
+
+    def upsert(self, sql, rows):
+        changed = 0
+        for chunk in chunked(rows, self.batch_size):
+            with self.conn:
+                before = self.conn.total_changes
+                self.conn.executemany(sql, chunk)
+                if self.conn.total_changes > before:
+                    changed += self.conn.total_changes - before
+                    bump_generation(self.conn)
+        return changed
+
+    def close(self):
+        self.conn.close()
+
+
+class PostgresDetectionSink:
+    """COPY detections into a staging table and merge them into raw.yolo_detections"""
+
+    def __init__(self):
+        from load_to_postgres import get_connection
+
+        self.conn = get_connection()
+
+    def write(self, rows):
+        return self.merge(CREATE_POSTGRES_SQL, POSTGRES_COPY_SQL, POSTGRES_MERGE_SQL,
+                          "raw.yolo_detections_staging", rows)
+
+    def write_clusters(self, rows):
+        """Merge rows (CLUSTER_COLUMNS order) into raw.image_clusters"""
+        return self.merge(CREATE_POSTGRES_CLUSTERS_SQL, POSTGRES_CLUSTER_COPY_SQL, POSTGRES_CLUSTER_MERGE_SQL,
+                          "raw.image_clusters_staging", rows)
+
+    def merge(self, create_sql, copy_sql, merge_sql, staging_table, rows):
+        from load_to_postgres import BUMP_GENERATION_SQL, CREATE_GENERATION_SQL, RowCopyStream
+
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute(create_sql + CREATE_GENERATION_SQL)
+                cursor.copy_expert(copy_sql, RowCopyStream(rows), size=1 << 16)
+                cursor.execute(merge_sql)
+                changed = cursor.rowcount
+                if changed:
+                    cursor.execute(BUMP_GENERATION_SQL)
+                cursor.execute(f"TRUNCATE {staging_table}")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return changed
+
+    def close(self):
+        self.conn.close()
+
+
+def open_detection_sink(db_path=DB_PATH, postgres=False):
+    return PostgresDetectionSink() if postgres else SqliteDetectionSink(db_path)
+
+
+def write_detections(results_df, db_path=DB_PATH, postgres=False):
+    """Upsert a detections DataFrame into the warehouse; returns the rows changed"""
+    sink = open_detection_sink(db_path, postgres)
+    try:
+        changed = sink.write(detection_rows(results_df))
+    finally:
+        sink.close()
+    target = "raw.yolo_detections" if postgres else f"raw_yolo_detections in {db_path}"
+    print(f"✅ Upserted detections into {target}: {changed} new or changed of {len(results_df)}")
+    return changed
+
+
+def write_clusters(rows, db_path=DB_PATH, postgres=False):
+    """Upsert (CLUSTER_COLUMNS) near-duplicate cluster rows into the warehouse; returns the rows changed"""
+    rows = list(rows)
+    sink = open_detection_sink(db_path, postgres)
+    try:
+        changed = sink.write_clusters(rows)
+    finally:
+        sink.close()
+    target = "raw.image_clusters" if postgres else f"raw_image_clusters in {db_path}"
+    print(f"✅ Upserted image clusters into {target}: {changed} new or changed of {len(rows)}")
+    return changed
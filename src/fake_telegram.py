@@ -0,0 +1,186 @@
+"""
+Local stand-in for the Telethon client, for running the scraper offline.
+
+FakeTelegramClient implements the calls TelegramScraper makes (start,
+get_messages, download_media, disconnect) over in-memory channel
+histories, replayed either from the JSON data lake or from the synthetic
+generator. Latency, page size, media payload size and FloodWait errors are
+all configurable, so throughput and back-off can be measured without
+credentials or network:
+
+    client = FakeTelegramClient.from_synthetic(messages=10000, flood_rate_limit=20)
+    await TelegramScraper(client=client).run_scraping(client.channel_names(), limit=10000)
+"""
+
+import asyncio
+import bisect
+import hashlib
+import os
+import random
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+
+from telethon.errors import FloodWaitError
+from telethon.tl.types import MessageMediaPhoto
+
+from generate_synthetic_data import channel_names, generate_channel_day, make_image_bytes, split_evenly
+from load_to_sqlite import JSON_DIR, discover_json_files, iter_messages
+
+
+class FakeMessage:
+    """The attributes of a Telethon Message the scraper reads"""
+
+    def __init__(self, id, date, text, views, forwards, has_media, media_key=None):
+        self.id = id
+        self.date = date
+        self.text = text
+        self.views = views
+        self.forwards = forwards
+        self.media = MessageMediaPhoto() if has_media else None
+        # What download_media serves: an image file to replay or a payload label
+        self.media_key = media_key
+
+
+class FakeTelegramClient:
+    def __init__(self, channels, latency=0.05, jitter=0.0, max_page_size=100, media_bytes=None,
+                 bandwidth_mbps=None, flood_every=0, flood_rate_limit=None, flood_seconds=1, seed=0):
+        """
+        channels: channel name -> list of FakeMessage.
+
+        latency / jitter: seconds added to every request.
+        max_page_size: most messages one get_messages call returns (Telegram: 100).
+        media_bytes: payload size for photos (None = replay the stored file or a tiny JPEG).
+        bandwidth_mbps: simulated download speed for photo payloads.
+        flood_every: raise FloodWait on every Nth request (0 = never).
+        flood_rate_limit: raise FloodWait when more requests than this arrive within one second.
+        flood_seconds: the wait each FloodWait asks for.
+        """
+        self.channels = {name: sorted(messages, key=lambda m: m.id) for name, messages in channels.items()}
+        self.ids = {name: [m.id for m in messages] for name, messages in self.channels.items()}
+        self.latency = latency
+        self.jitter = jitter
+        self.max_page_size = max_page_size
+        self.media_bytes = media_bytes
+        self.bandwidth_mbps = bandwidth_mbps
+        self.flood_every = flood_every
+        self.flood_rate_limit = flood_rate_limit
+        self.flood_seconds = flood_seconds
+        self.rng = random.Random(seed)
+        self.recent = deque()
+        self.payloads = {}
+        self.stats = {'requests': 0, 'flood_waits': 0, 'messages': 0, 'media': 0, 'media_bytes': 0}
+
+    @classmethod
+    def from_data_lake(cls, json_dir=JSON_DIR, **kwargs):
+        """Replay every channel found in the raw JSON data lake"""
+        channels = {}
+        for _, file_path in discover_json_files(json_dir):
+            for msg in iter_messages(file_path):
+                channels.setdefault(msg['channel_name'], {})[msg['message_id']] = FakeMessage(
+                    msg['message_id'],
+                    datetime.fromisoformat(msg['message_date']),
+                    msg.get('message_text') or '',
+                    msg.get('views') or 0,
+                    msg.get('forwards') or 0,
+                    bool(msg.get('has_media')),
+                    msg.get('image_path'),
+                )
+        return cls({name: list(by_id.values()) for name, by_id in channels.items()}, **kwargs)
+
+    @classmethod
+    def from_synthetic(cls, messages=10000, channels=4, days=7, start_date='2026-01-01', seed=42,
+                       image_ratio=0.75, **kwargs):
+        """Synthetic channel histories from generate_synthetic_data"""
+        rng = random.Random(seed)
+        start = date.fromisoformat(start_date)
+        histories = {}
+        for channel, total in zip(channel_names(channels), split_evenly(messages, channels)):
+            next_id = rng.randint(1000, 200000)
+            history = histories[channel] = []
+            for day_index, count in enumerate(split_evenly(total, days)):
+                for msg in generate_channel_day(rng, channel, start + timedelta(days=day_index),
+                                                count, next_id, image_ratio):
+                    history.append(FakeMessage(
+                        msg['message_id'], datetime.fromisoformat(msg['message_date']),
+                        msg['message_text'], msg['views'], msg['forwards'], msg['has_media'],
+                        msg['_image_key'],
+                    ))
+                next_id += count
+        return cls(histories, seed=seed, **kwargs)
+
+    def channel_names(self):
+        return list(self.channels)
+
+    async def start(self):
+        return self
+
+    async def disconnect(self):
+        pass
+
+    async def request(self):
+        """Simulated round trip: latency plus FloodWait injection"""
+        self.stats['requests'] += 1
+        now = time.monotonic()
+        if self.flood_rate_limit:
+            self.recent.append(now)
+            while self.recent and self.recent[0] < now - 1:
+                self.recent.popleft()
+        flooded = (self.flood_every and self.stats['requests'] % self.flood_every == 0) or \
+                  (self.flood_rate_limit and len(self.recent) > self.flood_rate_limit)
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if flooded:
+            self.stats['flood_waits'] += 1
+            raise FloodWaitError(request=None, capture=self.flood_seconds)
+
+    async def get_messages(self, entity, limit=None, offset_id=0, min_id=0, max_id=0, reverse=False):
+        """Same paging semantics as TelegramClient.get_messages (one request per call)"""
+        await self.request()
+        if entity not in self.channels:
+            raise ValueError(f'Cannot find any entity corresponding to "{entity}"')
+        messages, ids = self.channels[entity], self.ids[entity]
+        limit = min(limit or 1, self.max_page_size)
+
+        if reverse:
+            start = bisect.bisect_right(ids, max(offset_id, min_id))
+            end = bisect.bisect_left(ids, max_id) if max_id else len(ids)
+            page = messages[start:min(end, start + limit)]
+        else:
+            upper = min(i for i in (offset_id, max_id) if i) if (offset_id or max_id) else None
+            end = bisect.bisect_left(ids, upper) if upper else len(ids)
+            start = max(bisect.bisect_right(ids, min_id), end - limit)
+            page = messages[start:end][::-1]
+
+        self.stats['messages'] += len(page)
+        return page
+
+    def payload(self, message):
+        """Photo bytes for a message, cached per media key so reposts hash the same"""
+        key = message.media_key or str(message.id)
+        if key not in self.payloads:
+            if self.media_bytes:
+                seed = hashlib.sha256(key.encode('utf-8')).digest()
+                self.payloads[key] = (seed * (self.media_bytes // len(seed) + 1))[:self.media_bytes]
+            elif os.path.exists(key):
+                with open(key, 'rb') as f:
+                    self.payloads[key] = f.read()
+            else:
+                self.payloads[key] = make_image_bytes(key)
+        return self.payloads[key]
+
+    async def download_media(self, message, file=None):
+        """Return the photo bytes (file=bytes/None) or write them to the file path"""
+        await self.request()
+        data = self.payload(message)
+        if self.bandwidth_mbps:
+            await asyncio.sleep(len(data) / (self.bandwidth_mbps * 1e6 / 8))
+        self.stats['media'] += 1
+        self.stats['media_bytes'] += len(data)
+        if file is None or file is bytes:
+            return data
+        os.makedirs(os.path.dirname(file) or '.', exist_ok=True)
+        with open(file, 'wb') as f:
+            f.write(data)
+        return file
@@ -0,0 +1,271 @@
+"""
+Synthetic Telegram data generator for load and scale testing.
+
+Writes realistic channel dumps into the same layout the scraper produces:
+data/raw/telegram_messages/<date>/<channel>.json and
+data/raw/images/<channel>/<date>/<message_id>.jpg. Message text mixes the
+English/Amharic styles and price formats seen in lobelia4cosmetics
+("Price 7500 birr") and tikvahpharma ("💵 **53birr**", ብር), and product
+images are reposted byte-identically the way real channels do.
+"""
+
+import argparse
+import json
+import os
+import random
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+
+DATA_ROOT = "data/raw"
+
+REAL_CHANNELS = ['lobelia4cosmetics', 'tikvahpharma', 'CheMed123',
+                 'ethiopharma', 'pharmacyaddis', 'addispharmacy']
+
+# (product line, typical price in birr)
+COSMETIC_PRODUCTS = [
+    ("NIDO 2.2 kg", 7500), ("NIDO1+ 2.2kg", 7500), ("ENFAGROW A+", 8000),
+    ("VITAMIN D3+k2  150 tablets", 8500), ("Ashwagandha 180 tablets", 7500),
+    ("COCONUT OIL", 7500), ("ORGANIC EXTRA OLIVE OIL 2L", 6500),
+    ("MELATONIN 5MG", 6000), ("KIRKLAND ORGANIC EXTRA VIRGIN OLIVE OIL", 6500),
+    ("CERAVE MOISTURISING CREAM 454g", 4200), ("NIVEA SOFT 200ml", 950),
+    ("OMEGA 3 FISH OIL 200 softgels", 5200),
+]
+
+PHARMA_PRODUCTS = [
+    ("Ceftriaxone injection 1g | Scotoxone", 53), ("Amoxicillin 500mg caps", 180),
+    ("Paracetamol Tab 10x10", 112), ("Ibuprofen tab 400mg", 280),
+    ("Cloxacillin 500mg 50x10", 3900), ("Vancomycin 1gm", 347),
+    ("Meloxicam 15mg 2×10", 125), ("Omeprazole 20mg caps", 210),
+    ("Metformin 500mg 10x10", 320), ("Salbutamol puff", 190),
+    ("Dicloran tab 50mg", 95), ("L-Iron syrup", 85),
+]
+
+LOBELIA_FOOTER = (
+    "\nTelegram :-****@Lobeliacosmetics****\nMsg👉 Lobelia pharmacy and cosmetics \n"
+    "☎️ call ****0911562031****/0911587703\nAdress:- Infront of Bole Medhanialem high school \n"
+    "Open Monday - Monday from 8am until midnight ከሰኞ - እስከ ሰኞ  ከጧቱ 2:00 ስዓት - እስከ ምሽቱ 6:00 ሰዓት\n"
+    "🏍🏍🏍 የትራንስፖርት አማራጭ ከ70 - 500 ብር\nFor delivery option fees are from 70 birr -500 birr**"
+)
+
+AMHARIC_NOTICES = [
+    "**የቻናል ግብዣ**:\n(ለፋርማ ማከፋፈያዎች ብቻ) \n\nየመድኃኒትና የህክምና እቃዎች ዋጋ በየቀኑ አይደለም "
+    "በየስዓቱ በሚቀያየርበት በዚህ ወቅት የምርትና ዋጋን ሁኔታ መከታተል እጅግ አስፈላጊ ነው።",
+    "የሚሸጥ ፋርማሲ \nHome rent 40000 weym 22000\nTotal cost 1300000\nስራ ላይ ያለ አስከነቤቱ የሚሸጥ",
+    "NEW JOB  VACCANCY\n SENIOR PHARMACIST WZ LICENSE\n1/ SIGNALE\n2/PIYASSA\n3/MEGGENAGNA",
+    "አዲስ የመጡ መድሃኒቶች በተመጣጣኝ ዋጋ ይገኛሉ። ለበለጠ መረጃ ይደውሉ 0930074400",
+]
+
+# Distinct renderings per product; every repost of a product reuses one of
+# these byte-for-byte, like promo shots reposted across days
+IMAGE_VARIANTS_PER_PRODUCT = 3
+
+# Smallest valid baseline JPEG (1x1 grey), used when OpenCV is unavailable
+TINY_JPEG = bytes.fromhex(
+    "ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909"
+    "080a0c140d0c0b0b0c1912130f141d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30"
+    "313434341f27393d38323c2e333432ffc0000b080001000101011100ffc4001f0000010501"
+    "010101010100000000000000000102030405060708090a0bffc400b5100002010303020403"
+    "050504040000017d01020300041105122131410613516107227114328191a1082342b1c115"
+    "52d1f02433627282090a161718191a25262728292a3435363738393a434445464748494a53"
+    "5455565758595a636465666768696a737475767778797a838485868788898a929394959697"
+    "98999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5c6c7c8c9cad2d3d4d5d6d7d8"
+    "d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9faffda0008010100003f00fbd3ffd9"
+)
+
+
+def channel_names(count):
+    """Real channel names first, then numbered synthetic ones"""
+    names = REAL_CHANNELS[:count]
+    names += [f"synthetic_pharma_{i}" for i in range(len(names) + 1, count + 1)]
+    return names
+
+
+def is_pharma_channel(channel):
+    return 'pharm' in channel.lower() or 'med' in channel.lower()
+
+
+def render_text(rng, channel):
+    """Return (message_text, product_key or None) in the channel's style"""
+    roll = rng.random()
+    if roll < 0.08:
+        return "", None
+    if roll < 0.2:
+        return rng.choice(AMHARIC_NOTICES), None
+
+    if is_pharma_channel(channel):
+        name, price = rng.choice(PHARMA_PRODUCTS)
+        price = max(1, int(price * rng.uniform(0.85, 1.2)))
+        stock = rng.choice([48, 100, 150, 480, 720])
+        expiry = f"{rng.randint(1, 12)}/{rng.randint(2026, 2030)}"
+        style = rng.random()
+        if style < 0.5:
+            text = (f"👍**{name} **\n   |📦 {stock} \n   |🗓 {expiry} \n"
+                    f"   |💵 **{price}birr**")
+        elif style < 0.8:
+            text = f"❇️{name} 💵{price}\n📦 {stock}pack\n⏳ {expiry}"
+        else:
+            text = f"💊 {name}\nዋጋ {price} ብር\n📦 {stock} pk"
+        return text, name
+
+    name, price = rng.choice(COSMETIC_PRODUCTS)
+    price = int(round(price * rng.uniform(0.9, 1.15), -2))
+    bold = "**" if rng.random() < 0.6 else ""
+    return f"{bold}{name}{bold}\nPrice {price} birr {LOBELIA_FOOTER}", name
+
+
+def make_image_bytes(label, size=0):
+    """
+    JPEG for one product rendering.
+
+    With size > 0 and OpenCV installed a size x size picture with coloured
+    shapes and the product label is drawn (useful for detection
+    benchmarks); otherwise the tiny JPEG is tagged with a comment segment
+    so each label still hashes differently.
+    """
+    if size > 0:
+        try:
+            import cv2
+            import numpy as np
+            local = random.Random(zlib.crc32(label.encode('utf-8')))
+            image = np.full((size, size, 3), local.randint(160, 255), dtype=np.uint8)
+            for _ in range(4):
+                x, y = local.randint(0, size - 40), local.randint(0, size - 40)
+                w, h = local.randint(20, size // 3), local.randint(40, size // 2)
+                color = tuple(local.randint(0, 255) for _ in range(3))
+                cv2.rectangle(image, (x, y), (min(size - 1, x + w), min(size - 1, y + h)), color, -1)
+            cv2.putText(image, label[:24], (10, size - 20), cv2.FONT_HERSHEY_SIMPLEX,
+                        max(0.4, size / 800), (0, 0, 0), 2)
+            ok, encoded = cv2.imencode('.jpg', image)
+            if ok:
+                return encoded.tobytes()
+        except ImportError:
+            pass
+
+    comment = label.encode('utf-8')[:60000]
+    segment = b'\xff\xfe' + struct.pack('>H', len(comment) + 2) + comment
+    return TINY_JPEG[:2] + segment + TINY_JPEG[2:]
+
+
+def generate_channel_day(rng, channel, day, count, first_id, image_ratio=0.75, data_root=DATA_ROOT):
+    """Yield count messages for one channel and day with ascending ids"""
+    day_start = datetime(day.year, day.month, day.day, 6, 0, tzinfo=timezone.utc)
+    step = max(1, int(16 * 3600 / max(count, 1)))
+    for offset in range(count):
+        text, product = render_text(rng, channel)
+        has_media = rng.random() < image_ratio
+        message_id = first_id + offset
+        message_time = day_start + timedelta(seconds=offset * step + rng.randint(0, step - 1))
+        image_key = None
+        if has_media:
+            label = product or "notice"
+            image_key = f"{label}#{rng.randrange(IMAGE_VARIANTS_PER_PRODUCT)}"
+        yield {
+            'message_id': message_id,
+            'channel_name': channel,
+            'message_date': message_time.isoformat(),
+            'message_text': text,
+            'has_media': has_media,
+            'views': int(rng.lognormvariate(5.2, 0.8)),
+            'forwards': int(rng.random() < 0.1) * rng.randint(1, 20),
+            'image_path': (f"{data_root}/images/{channel}/{day.isoformat()}/{message_id}.jpg"
+                           if has_media else None),
+            '_image_key': image_key,
+        }
+
+
+def split_evenly(total, parts):
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def write_partition(file_path, messages, file_format):
+    """Stream messages to a .json array or .jsonl file"""
+    with open(file_path, 'w', encoding='utf-8') as f:
+        if file_format == 'jsonl':
+            for msg in messages:
+                f.write(json.dumps(msg, ensure_ascii=False))
+                f.write('\n')
+            return
+        f.write('[\n')
+        for i, msg in enumerate(messages):
+            if i:
+                f.write(',\n')
+            f.write(json.dumps(msg, ensure_ascii=False, indent=2))
+        f.write('\n]\n')
+
+
+def generate_dataset(messages=10000, channels=4, days=7, data_root=DATA_ROOT,
+                     start_date='2026-01-01', seed=42, images=True, image_size=0,
+                     image_ratio=0.75, file_format='json'):
+    """
+    Generate a synthetic raw data lake under data_root.
+
+    Returns a summary dict (messages, files, images written and bytes).
+    """
+    rng = random.Random(seed)
+    names = channel_names(channels)
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    per_channel = split_evenly(messages, channels)
+    next_id = {name: rng.randint(1000, 200000) for name in names}
+    image_cache = {}
+    summary = {'messages': 0, 'files': 0, 'images': 0, 'image_bytes': 0}
+
+    for day_index in range(days):
+        day = start + timedelta(days=day_index)
+        date_dir = os.path.join(data_root, 'telegram_messages', day.isoformat())
+        os.makedirs(date_dir, exist_ok=True)
+
+        for channel, channel_total in zip(names, per_channel):
+            count = split_evenly(channel_total, days)[day_index]
+            if count == 0:
+                continue
+            image_dir = os.path.join(data_root, 'images', channel, day.isoformat())
+
+            def with_images(batch):
+                for msg in batch:
+                    image_key = msg.pop('_image_key')
+                    if images and image_key:
+                        if image_key not in image_cache:
+                            image_cache[image_key] = make_image_bytes(image_key, image_size)
+                        os.makedirs(image_dir, exist_ok=True)
+                        data = image_cache[image_key]
+                        with open(os.path.join(image_dir, f"{msg['message_id']}.jpg"), 'wb') as f:
+                            f.write(data)
+                        summary['images'] += 1
+                        summary['image_bytes'] += len(data)
+                    summary['messages'] += 1
+                    yield msg
+
+            suffix = '.jsonl' if file_format == 'jsonl' else '.json'
+            batch = generate_channel_day(rng, channel, day, count, next_id[channel], image_ratio, data_root)
+            write_partition(os.path.join(date_dir, channel + suffix), with_images(batch), file_format)
+            next_id[channel] += count
+            summary['files'] += 1
+
+    return summary
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Telegram raw data lake")
+    parser.add_argument("--messages", type=int, default=10000, help="Total messages (10k - 50M)")
+    parser.add_argument("--channels", type=int, default=4, help="Number of channels")
+    parser.add_argument("--days", type=int, default=7, help="Number of daily partitions")
+    parser.add_argument("--data-root", default=DATA_ROOT, help="Root that holds telegram_messages/ and images/")
+    parser.add_argument("--start-date", default='2026-01-01', help="First partition date (YYYY-MM-DD)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible datasets")
+    parser.add_argument("--format", choices=['json', 'jsonl'], default='json', help="Message file format")
+    parser.add_argument("--no-images", action="store_true", help="Skip writing image files")
+    parser.add_argument("--image-size", type=int, default=0,
+                        help="Render size x size product pictures with OpenCV (0 = tiny placeholders)")
+    parser.add_argument("--image-ratio", type=float, default=0.75, help="Share of messages with a photo")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = generate_dataset(args.messages, args.channels, args.days, args.data_root,
+                              args.start_date, args.seed, not args.no_images, args.image_size,
+                              args.image_ratio, args.format)
+    print(f"✅ Generated {result['messages']:,} messages in {result['files']} files, "
+          f"{result['images']:,} images ({result['image_bytes'] / 1e6:.1f} MB) under {args.data_root}")
@@ -0,0 +1,130 @@
+"""
+Perceptual-hash near-duplicate grouping for scraped images.
+
+The same product shot is reposted re-encoded, resized or slightly cropped,
+so its sha256 differs but its 64-bit pHash stays within a few bits.
+Images are grouped leader-style: each new image joins the closest existing
+cluster representative within the Hamming threshold (found with a
+BK-tree), or becomes a representative itself. Only representatives need
+to go through the model.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Max Hamming distance between 64-bit pHashes treated as the same picture
+DEFAULT_THRESHOLD = 6
+
+
+def phash(gray):
+    """64-bit DCT hash: low 8x8 frequencies of a 32x32 thumbnail vs their median"""
+    import cv2
+
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def dhash(gray):
+    """64-bit gradient hash: is each pixel brighter than its right neighbour (9x8 thumbnail)"""
+    import cv2
+
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def image_hashes(path):
+    """(phash, dhash) of an image file, or None if it can't be decoded"""
+    import cv2
+
+    gray = cv2.imread(path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if gray is None:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None
+    return phash(gray), dhash(gray)
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes for Hamming radius queries"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        node = self.root
+        self.size += 1
+        if node is None:
+            self.root = (value, item, {})
+            return
+        while True:
+            distance = hamming(value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, item, {})
+                return
+            node = child
+
+    def search(self, value, radius):
+        """[(distance, item)] of every entry within radius of value"""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node_value, item, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= radius:
+                found.append((distance, item))
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+def assign_clusters(cache, images, threshold=DEFAULT_THRESHOLD, workers=4):
+    """
+    Put every (sha256, path) in images into a near-duplicate cluster.
+
+    Hashes and assignments persist in the detection cache, so images seen
+    on earlier runs keep their cluster and only new images are looked up;
+    assignments are kept per threshold, and an image is only hashed once
+    whatever the threshold. Returns {sha256: (representative_sha256, distance)}.
+    """
+    assigned = cache.cluster_assignments(threshold)
+    new = [(sha256, path) for sha256, path in images if sha256 not in assigned]
+    if not new:
+        return assigned
+
+    tree = BKTree()
+    for sha256, value in cache.representative_hashes(threshold):
+        tree.add(value, sha256)
+
+    hashes = cache.image_phashes(sha256 for sha256, _ in new)
+    unhashed = [(sha256, path) for sha256, path in new if sha256 not in hashes]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        computed = list(executor.map(image_hashes, [path for _, path in unhashed]))
+    hashes.update((sha256, found) for (sha256, _), found in zip(unhashed, computed) if found is not None)
+    cache.save_phashes((sha256, *hashes[sha256]) for sha256, _ in unhashed if sha256 in hashes)
+
+    rows = []
+    for sha256, _ in new:
+        if sha256 not in hashes:
+            continue
+        value = hashes[sha256][0]
+        matches = tree.search(value, threshold) if threshold > 0 else []
+        if matches:
+            distance, representative = min(matches)
+        else:
+            distance, representative = 0, sha256
+            tree.add(value, sha256)
+        assigned[sha256] = (representative, distance)
+        rows.append((sha256, representative, distance))
+    cache.save_clusters(rows, threshold)
+    return assigned
@@ -0,0 +1,305 @@
+"""
+Load raw Telegram JSON/JSONL files into PostgreSQL (raw.telegram_messages).
+
+Rows are streamed with COPY FROM STDIN into an UNLOGGED staging table and
+merged into raw.telegram_messages with a single INSERT ... ON CONFLICT
+that also appends raw.message_engagement_snapshots when counts change.
+File discovery and message parsing are shared with load_to_sqlite.py.
+"""
+
+import argparse
+import io
+import os
+import time
+
+import psycopg2
+from dotenv import load_dotenv
+
+from load_to_sqlite import JSON_DIR, discover_json_files, iter_messages, message_to_row
+from product_extraction import update_postgres_product_mentions
+
+load_dotenv()
+
+COLUMNS = (
+    "message_id", "channel_name", "message_date", "message_text",
+    "has_media", "views", "forwards", "image_path", "scraped_at",
+)
+
+# Surrogate key in insertion order, for stage watermarks (the product
+# extraction reads "id > last_id" off the index). Checked first so an
+# existing column doesn't take ALTER TABLE's exclusive lock on every run.
+MESSAGE_ID_SQL = """
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_schema = 'raw' AND table_name = 'telegram_messages' AND column_name = 'id') THEN
+        ALTER TABLE raw.telegram_messages ADD COLUMN id BIGINT GENERATED BY DEFAULT AS IDENTITY;
+    END IF;
+END $$;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_telegram_messages_id ON raw.telegram_messages(id);
+"""
+
+# Telegram message ids are only unique within a channel
+CREATE_TABLE_SQL = """
+CREATE SCHEMA IF NOT EXISTS raw;
+
+CREATE TABLE IF NOT EXISTS raw.telegram_messages (
+    message_id BIGINT NOT NULL,
+    channel_name VARCHAR(255) NOT NULL,
+    message_date TIMESTAMP,
+    message_text TEXT,
+    has_media BOOLEAN,
+    views INTEGER,
+    forwards INTEGER,
+    image_path TEXT,
+    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (channel_name, message_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_channel_name ON raw.telegram_messages(channel_name);
+CREATE INDEX IF NOT EXISTS idx_message_date ON raw.telegram_messages(message_date);
+
+-- Full-text search: 'simple' lowercases without stemming, so Amharic and
+-- English words index alike; the generated column stays in sync with every write
+ALTER TABLE raw.telegram_messages ADD COLUMN IF NOT EXISTS message_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', COALESCE(message_text, ''))) STORED;
+CREATE INDEX IF NOT EXISTS idx_message_tsv ON raw.telegram_messages USING GIN (message_tsv);
+
+CREATE TABLE IF NOT EXISTS raw.message_engagement_snapshots (
+    snapshot_id BIGSERIAL PRIMARY KEY,
+    channel_name VARCHAR(255) NOT NULL,
+    message_id BIGINT NOT NULL,
+    views INTEGER,
+    forwards INTEGER,
+    captured_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_snapshots_message
+    ON raw.message_engagement_snapshots(channel_name, message_id, captured_at);
+"""
+
+# One-row counter bumped in the same transaction as every write that
+# changes warehouse data; the API keys its response cache on it
+CREATE_GENERATION_SQL = """
+CREATE TABLE IF NOT EXISTS raw.data_generation (
+    id SMALLINT PRIMARY KEY CHECK (id = 1),
+    generation BIGINT NOT NULL,
+    updated_at TIMESTAMP
+);
+"""
+
+BUMP_GENERATION_SQL = """
+INSERT INTO raw.data_generation AS g (id, generation, updated_at) VALUES (1, 1, CURRENT_TIMESTAMP)
+ON CONFLICT (id) DO UPDATE SET generation = g.generation + 1, updated_at = EXCLUDED.updated_at
+"""
+
+# Tables created from the original setup_postgres.sql are keyed on
+# message_id alone; swap the primary key in place
+MIGRATE_KEY_SQL = """
+DO $$
+DECLARE
+    pk_name TEXT;
+    pk_columns TEXT[];
+BEGIN
+    SELECT c.conname, array_agg(a.attname::TEXT ORDER BY a.attnum)
+    INTO pk_name, pk_columns
+    FROM pg_constraint c
+    JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey)
+    WHERE c.conrelid = 'raw.telegram_messages'::regclass AND c.contype = 'p'
+    GROUP BY c.conname;
+
+    IF pk_columns = ARRAY['message_id'] THEN
+        EXECUTE format('ALTER TABLE raw.telegram_messages DROP CONSTRAINT %I', pk_name);
+        ALTER TABLE raw.telegram_messages ADD PRIMARY KEY (channel_name, message_id);
+    END IF;
+END $$;
+"""
+
+# Unlogged: staging rows are transient, so skip the WAL write amplification
+CREATE_STAGING_SQL = """
+CREATE UNLOGGED TABLE IF NOT EXISTS raw.telegram_messages_staging (
+    message_id BIGINT,
+    channel_name VARCHAR(255),
+    message_date TIMESTAMP,
+    message_text TEXT,
+    has_media BOOLEAN,
+    views INTEGER,
+    forwards INTEGER,
+    image_path TEXT,
+    scraped_at TIMESTAMP
+);
+ALTER TABLE raw.telegram_messages_staging ADD COLUMN IF NOT EXISTS scraped_at TIMESTAMP;
+TRUNCATE raw.telegram_messages_staging;
+"""
+
+COPY_SQL = f"COPY raw.telegram_messages_staging ({', '.join(COLUMNS)}) FROM STDIN"
+
+STAGING_INSERT_SQL = f"""
+INSERT INTO raw.telegram_messages_staging ({', '.join(COLUMNS)})
+VALUES ({', '.join(['%s'] * len(COLUMNS))})
+"""
+
+# One statement: upsert the staged rows (highest counts win when a message
+# was staged more than once, counters never move backwards) and append an
+# engagement snapshot for every existing row whose counts changed. New rows
+# get none: their first counts are the message row itself. xmax is 0 only
+# on the rows this statement inserted. Returns the number of rows inserted
+# or updated.
+MERGE_SQL = """
+WITH upserted AS (
+    INSERT INTO raw.telegram_messages AS t
+        (message_id, channel_name, message_date, message_text,
+         has_media, views, forwards, image_path, scraped_at)
+    SELECT DISTINCT ON (channel_name, message_id)
+        message_id, channel_name, message_date, message_text,
+        has_media, views, forwards, image_path,
+        COALESCE(scraped_at, CURRENT_TIMESTAMP)
+    FROM raw.telegram_messages_staging
+    ORDER BY channel_name, message_id, views DESC NULLS LAST, forwards DESC NULLS LAST
+    ON CONFLICT (channel_name, message_id) DO UPDATE SET
+        views = GREATEST(t.views, EXCLUDED.views),
+        forwards = GREATEST(t.forwards, EXCLUDED.forwards),
+        scraped_at = EXCLUDED.scraped_at
+    WHERE COALESCE(EXCLUDED.views, 0) > COALESCE(t.views, 0)
+       OR COALESCE(EXCLUDED.forwards, 0) > COALESCE(t.forwards, 0)
+    RETURNING channel_name, message_id, views, forwards, scraped_at, (t.xmax = 0) AS inserted
+), snapshots AS (
+    INSERT INTO raw.message_engagement_snapshots (channel_name, message_id, views, forwards, captured_at)
+    SELECT channel_name, message_id, views, forwards, scraped_at
+    FROM upserted
+    WHERE NOT inserted
+)
+SELECT COUNT(*) FROM upserted
+"""
+
+
+def get_connection():
+    """Connect using the same POSTGRES_* settings as the API"""
+    return psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'localhost'),
+        port=os.getenv('POSTGRES_PORT', '5432'),
+        dbname=os.getenv('POSTGRES_DB', 'medical_warehouse'),
+        user=os.getenv('POSTGRES_USER', 'postgres'),
+        password=os.getenv('POSTGRES_PASSWORD', 'telegram_pass'),
+    )
+
+
+def copy_value(value):
+    """Render one value in COPY text format"""
+    if value is None:
+        return '\\N'
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+
+class RowCopyStream(io.TextIOBase):
+    """
+    File-like view of a row iterator in COPY text format.
+
+    copy_expert() pulls from read() in fixed-size pieces, so rows are
+    rendered on demand and the file never has to be materialised.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ''
+        self.row_count = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += '\t'.join(copy_value(v) for v in row) + '\n'
+            self.row_count += 1
+        if size < 0:
+            chunk, self._buffer = self._buffer, ''
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def copy_file(cursor, file_path):
+    """Stream one message file into the staging table, return row count"""
+    stream = RowCopyStream(message_to_row(msg) for msg in iter_messages(file_path))
+    cursor.copy_expert(COPY_SQL, stream, size=1 << 16)
+    return stream.row_count
+
+
+def insert_file(cursor, file_path):
+    """Row-by-row baseline for comparing against COPY"""
+    row_count = 0
+    for msg in iter_messages(file_path):
+        cursor.execute(STAGING_INSERT_SQL, message_to_row(msg))
+        row_count += 1
+    return row_count
+
+
+def load_json_to_postgres(json_dir=JSON_DIR, row_by_row=False):
+    """Stage every message file with COPY, then merge in one statement"""
+    if not os.path.exists(json_dir):
+        print(f"❌ Directory not found: {json_dir}")
+        return 0
+
+    conn = get_connection()
+    started = time.perf_counter()
+    staged = 0
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(CREATE_TABLE_SQL + CREATE_GENERATION_SQL)
+            cursor.execute(MIGRATE_KEY_SQL)
+            cursor.execute(MESSAGE_ID_SQL)
+            cursor.execute(CREATE_STAGING_SQL)
+            print("✅ Ensured raw.telegram_messages and staging table")
+
+            load_file = insert_file if row_by_row else copy_file
+            current_partition = None
+            for partition, file_path in discover_json_files(json_dir):
+                if partition != current_partition:
+                    print(f"📁 Processing: {partition}")
+                    current_partition = partition
+                print(f"   📂 Staging: {os.path.basename(file_path)}")
+                staged += load_file(cursor, file_path)
+            stage_seconds = time.perf_counter() - started
+
+            cursor.execute(MERGE_SQL)
+            merged = cursor.fetchone()[0]
+            cursor.execute("TRUNCATE raw.telegram_messages_staging")
+        extracted, mentions = update_postgres_product_mentions(conn)
+        if merged or extracted:
+            with conn.cursor() as cursor:
+                cursor.execute(BUMP_GENERATION_SQL)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error: {e}")
+        return 0
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    rate = staged / elapsed if elapsed > 0 else float(staged)
+    method = "row-by-row INSERT" if row_by_row else "COPY"
+    print(f"✅ Staged {staged} messages via {method} in {stage_seconds:.2f}s, {merged} rows inserted or updated")
+    print(f"🏷️ Extracted {mentions} product mentions from {extracted} new messages")
+    print(f"⏱️ {elapsed:.2f}s total, {rate:,.0f} rows/sec")
+    return merged
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load raw Telegram JSON/JSONL/Parquet files into PostgreSQL")
+    parser.add_argument("--data-dir", default=JSON_DIR, help="Root of the raw data lake (JSON or Parquet layout)")
+    parser.add_argument("--row-by-row", action="store_true",
+                        help="Stage with individual INSERTs instead of COPY (for benchmarking)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    load_json_to_postgres(args.data_dir, args.row_by_row)
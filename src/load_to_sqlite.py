@@ -1,87 +1,791 @@
+import argparse
+import hashlib
 import json
+import multiprocessing
 import os
+import queue
 import sqlite3
+import time
 
-def load_json_to_sqlite():
+from product_extraction import ensure_product_tables, update_product_mentions
+
+DB_PATH = 'medical_warehouse.db'
+JSON_DIR = "data/raw/telegram_messages"
+
+# Rows per executemany() call; each chunk is committed as its own transaction
+DEFAULT_BATCH_SIZE = 5000
+
+# Characters read per step when streaming a JSON array
+READ_CHUNK_SIZE = 1 << 20
+
+MESSAGE_FILE_SUFFIXES = ('.json', '.jsonl', '.parquet')
+
+# Parse batches allowed in flight per worker before workers block, which
+# bounds writer-side memory when the disk is slower than the parsers
+QUEUE_BATCHES_PER_WORKER = 4
+
+# Key columns a message must carry; checked before rows reach the writer
+REQUIRED_FIELDS = ('message_id', 'channel_name')
+
+# Telegram message ids are only unique within a channel. id is a stable
+# surrogate key for the full-text index and the stage watermarks: unlike
+# an implicit rowid, VACUUM can't renumber it, and AUTOINCREMENT never
+# hands out an id again, so "id > watermark" is exactly the unseen rows.
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS raw_telegram_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id INTEGER NOT NULL,
+    channel_name TEXT NOT NULL,
+    message_date TEXT,
+    message_text TEXT,
+    has_media INTEGER,
+    views INTEGER,
+    forwards INTEGER,
+    image_path TEXT,
+    scraped_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (channel_name, message_id)
+);
+"""
+
+MESSAGE_COLUMNS = ('message_id, channel_name, message_date, message_text, '
+                   'has_media, views, forwards, image_path, scraped_at')
+
+# Append-only engagement history, one row per observed change of counts;
+# the first observation is the message row itself and isn't duplicated here
+CREATE_SNAPSHOTS_SQL = """
+CREATE TABLE IF NOT EXISTS message_engagement_snapshots (
+    snapshot_id INTEGER PRIMARY KEY,
+    channel_name TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    views INTEGER,
+    forwards INTEGER,
+    captured_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_message
+    ON message_engagement_snapshots(channel_name, message_id, captured_at);
+"""
+
+# Snapshots are written by a trigger so every write path (serial,
+# parallel, stream writer) records them without extra round trips. Earlier
+# versions also snapshotted every insert; that trigger is dropped.
+CREATE_SNAPSHOT_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS trg_raw_messages_snapshot_insert;
+
+CREATE TRIGGER IF NOT EXISTS trg_raw_messages_snapshot_update
+AFTER UPDATE OF views, forwards ON raw_telegram_messages
+WHEN OLD.views IS NOT NEW.views OR OLD.forwards IS NOT NEW.forwards
+BEGIN
+    INSERT INTO message_engagement_snapshots (channel_name, message_id, views, forwards, captured_at)
+    VALUES (NEW.channel_name, NEW.message_id, NEW.views, NEW.forwards, NEW.scraped_at);
+END;
+"""
+
+# Full-text index over message_text for /api/search/messages. External
+# content: the text is stored once, in raw_telegram_messages, and looked up
+# by its id. unicode61 splits on Unicode punctuation, so Ge'ez words
+# (separated by ፡ and ።) tokenize like English ones; prefix indexes serve
+# search-as-you-type queries.
+CREATE_FTS_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    message_text,
+    content='raw_telegram_messages',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+-- Present while a bulk load has per-row indexing suspended: rows past
+-- indexed_through are left to ensure_fts(), whichever connection wrote them
+CREATE TABLE IF NOT EXISTS messages_fts_suspended (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    indexed_through INTEGER NOT NULL
+);
+"""
+
+FTS_TRIGGERS = ('trg_raw_messages_fts_insert', 'trg_raw_messages_fts_delete', 'trg_raw_messages_fts_update')
+
+# Keep the index in sync with every write path. Upserts that only bump
+# views/forwards don't fire the update trigger. Rows written while
+# indexing is suspended are skipped here and indexed by the catch-up.
+CREATE_FTS_TRIGGERS_SQL = """
+CREATE TRIGGER IF NOT EXISTS trg_raw_messages_fts_insert
+AFTER INSERT ON raw_telegram_messages
+WHEN NEW.message_text IS NOT NULL AND NOT EXISTS (SELECT 1 FROM messages_fts_suspended)
+BEGIN
+    INSERT INTO messages_fts (rowid, message_text) VALUES (NEW.id, NEW.message_text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_raw_messages_fts_delete
+AFTER DELETE ON raw_telegram_messages
+WHEN OLD.message_text IS NOT NULL
+ AND NOT EXISTS (SELECT 1 FROM messages_fts_suspended WHERE OLD.id > indexed_through)
+BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, message_text) VALUES ('delete', OLD.id, OLD.message_text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_raw_messages_fts_update
+AFTER UPDATE OF message_text ON raw_telegram_messages
+WHEN NOT EXISTS (SELECT 1 FROM messages_fts_suspended WHERE OLD.id > indexed_through)
+BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, message_text)
+    SELECT 'delete', OLD.id, OLD.message_text WHERE OLD.message_text IS NOT NULL;
+    INSERT INTO messages_fts (rowid, message_text)
+    SELECT NEW.id, NEW.message_text WHERE NEW.message_text IS NOT NULL;
+END;
+"""
+
+# Messages inserted since indexing was suspended; ids only grow, so this
+# is a range scan
+INDEX_NEW_MESSAGES_SQL = """
+INSERT INTO messages_fts (rowid, message_text)
+SELECT id, message_text FROM raw_telegram_messages
+WHERE id > (SELECT indexed_through FROM messages_fts_suspended)
+  AND message_text IS NOT NULL
+"""
+
+# One-row counter bumped in the same transaction as every write that
+# changes warehouse data; the API keys its response cache on it
+CREATE_GENERATION_SQL = """
+CREATE TABLE IF NOT EXISTS data_generation (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    generation INTEGER NOT NULL,
+    updated_at TEXT
+);
+"""
+
+BUMP_GENERATION_SQL = """
+INSERT INTO data_generation (id, generation, updated_at) VALUES (1, 1, CURRENT_TIMESTAMP)
+ON CONFLICT(id) DO UPDATE SET generation = generation + 1, updated_at = excluded.updated_at
+"""
+
+# Counters only move forward, so replaying an older file (or files arriving
+# out of order from the parallel parsers) never rolls them back
+UPSERT_SQL = """
+INSERT INTO raw_telegram_messages
+(message_id, channel_name, message_date, message_text,
+ has_media, views, forwards, image_path, scraped_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+ON CONFLICT(channel_name, message_id) DO UPDATE SET
+    views = MAX(COALESCE(views, 0), COALESCE(excluded.views, 0)),
+    forwards = MAX(COALESCE(forwards, 0), COALESCE(excluded.forwards, 0)),
+    scraped_at = excluded.scraped_at
+WHERE COALESCE(excluded.views, 0) > COALESCE(views, 0)
+   OR COALESCE(excluded.forwards, 0) > COALESCE(forwards, 0)
+"""
+
+# One row per ingested file; a file whose size/mtime (or, failing that,
+# content hash) matches its manifest entry is skipped without parsing
+CREATE_MANIFEST_SQL = """
+CREATE TABLE IF NOT EXISTS load_manifest (
+    file_path TEXT PRIMARY KEY,
+    file_size INTEGER NOT NULL,
+    file_mtime REAL NOT NULL,
+    content_hash TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    loaded_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+UPSERT_MANIFEST_SQL = """
+INSERT INTO load_manifest (file_path, file_size, file_mtime, content_hash, row_count, loaded_at)
+VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+ON CONFLICT(file_path) DO UPDATE SET
+    file_size = excluded.file_size,
+    file_mtime = excluded.file_mtime,
+    content_hash = excluded.content_hash,
+    row_count = excluded.row_count,
+    loaded_at = excluded.loaded_at
+"""
+
+# Secondary indexes are built once after the load instead of being
+# maintained row by row during it
+SECONDARY_INDEXES = {
+    "idx_raw_messages_channel": "raw_telegram_messages(channel_name)",
+    "idx_raw_messages_date": "raw_telegram_messages(message_date)",
+}
+INDEX_SQL = [f"CREATE INDEX IF NOT EXISTS {name} ON {target}" for name, target in SECONDARY_INDEXES.items()]
+
+# Once the indexes exist, a load expected to add at least this fraction of
+# the rows already in the table drops them first and rebuilds them after,
+# which is cheaper than maintaining them row by row
+REBUILD_INDEXES_FRACTION = 0.25
+
+# Load-time PRAGMAs: WAL lets the API keep reading during a load, NORMAL
+# sync is crash-safe under WAL, and a large page cache / in-memory temp
+# store keep index builds off the disk
+BULK_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-200000",
+    "PRAGMA temp_store=MEMORY",
+]
+
+
+def migrate_message_key(conn):
+    """
+    Rebuild a raw_telegram_messages table keyed on message_id alone.
+
+    Tables created before the (channel_name, message_id) key are copied
+    into the new layout.
+    """
+    pk_columns = [row[1] for row in sorted(
+        (r for r in conn.execute("PRAGMA table_info(raw_telegram_messages)") if r[5]),
+        key=lambda r: r[5]
+    )]
+    if pk_columns != ['message_id']:
+        return False
+
+    print("🔧 Migrating raw_telegram_messages to the (channel_name, message_id) key")
+    with conn:
+        # Explicit BEGIN: the sqlite3 module would otherwise autocommit the DDL
+        conn.execute("BEGIN")
+        conn.execute("ALTER TABLE raw_telegram_messages RENAME TO raw_telegram_messages_old")
+        conn.execute(CREATE_TABLE_SQL)
+        conn.execute("""
+        INSERT INTO raw_telegram_messages
+        (message_id, channel_name, message_date, message_text,
+         has_media, views, forwards, image_path, scraped_at)
+        SELECT message_id, COALESCE(channel_name, ''), message_date, message_text,
+               has_media, views, forwards, image_path, scraped_at
+        FROM raw_telegram_messages_old
+        """)
+        conn.execute("DROP TABLE raw_telegram_messages_old")
+    return True
+
+
+def migrate_surrogate_key(conn):
+    """
+    Rebuild a raw_telegram_messages table that has no id column.
+
+    Each row keeps its old rowid as its id, so watermarks taken on rowids
+    stay valid; the full-text index is rebuilt on the new key.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(raw_telegram_messages)")]
+    if not columns or 'id' in columns:
+        return False
+
+    print("🔧 Migrating raw_telegram_messages to a surrogate id key")
+    with conn:
+        conn.execute("BEGIN")
+        conn.execute("ALTER TABLE raw_telegram_messages RENAME TO raw_telegram_messages_old")
+        conn.execute(CREATE_TABLE_SQL)
+        conn.execute(f"""
+        INSERT INTO raw_telegram_messages (id, {MESSAGE_COLUMNS})
+        SELECT rowid, {MESSAGE_COLUMNS} FROM raw_telegram_messages_old ORDER BY rowid
+        """)
+        conn.execute("DROP TABLE raw_telegram_messages_old")
+    return True
+
+
+def ensure_schema(conn):
+    """Create (or migrate) the raw message, snapshot, manifest, full-text and generation tables"""
+    conn.executescript(CREATE_SNAPSHOTS_SQL)
+    migrated = migrate_message_key(conn)
+    migrated = migrate_surrogate_key(conn) or migrated
+    conn.executescript(CREATE_TABLE_SQL + CREATE_SNAPSHOT_TRIGGERS_SQL + CREATE_MANIFEST_SQL + CREATE_GENERATION_SQL)
+    ensure_fts(conn, rebuild=migrated)
+    ensure_product_tables(conn)
+
+
+def ensure_fts(conn, rebuild=False):
+    """
+    Create the messages_fts index and its triggers, and index any messages
+    it is missing.
+
+    Messages loaded before the index existed (or re-keyed by a migration)
+    are indexed once with an FTS5 rebuild, and an index still keyed on the
+    implicit rowid is recreated on id. After a bulk load, the rows inserted
+    since suspend_fts_indexing() are caught up by id and per-row indexing
+    resumes.
+    """
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'").fetchone()
+    if row and "content_rowid='id'" not in row[0]:
+        with conn:
+            conn.execute("DROP TABLE messages_fts")
+            for trigger in FTS_TRIGGERS:
+                conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        row = None
+    conn.executescript(CREATE_FTS_SQL + CREATE_FTS_TRIGGERS_SQL)
+    with conn:
+        if rebuild or not row:
+            conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+        else:
+            conn.execute(INDEX_NEW_MESSAGES_SQL)
+        conn.execute("DELETE FROM messages_fts_suspended")
+
+
+def suspend_fts_indexing(conn):
+    """
+    Stop indexing new messages row by row for a bulk load; ensure_fts()
+    indexes them in one pass afterwards, which is several times faster
+    than indexing them a transaction at a time. Rows other writers (the
+    stream writer) insert meanwhile are skipped and caught up the same way.
+    A suspension left behind by a crashed load is caught up by the next
+    ensure_schema().
+    """
+    with conn:
+        conn.execute("INSERT OR IGNORE INTO messages_fts_suspended (id, indexed_through) "
+                     "SELECT 1, COALESCE(MAX(id), 0) FROM raw_telegram_messages")
+
+
+def bump_generation(conn):
+    """Mark the warehouse data as changed; call inside the writing transaction"""
+    conn.execute(BUMP_GENERATION_SQL)
+
+
+def apply_bulk_pragmas(conn):
+    """Tune the connection for a large write-heavy load"""
+    for pragma in BULK_PRAGMAS:
+        conn.execute(pragma)
+
+
+def create_indexes(conn):
+    """Build secondary indexes on raw_telegram_messages"""
+    for statement in INDEX_SQL:
+        conn.execute(statement)
+    conn.commit()
+
+
+def estimate_pending_rows(conn, pending):
+    """
+    Rows the pending files should hold, at the bytes per row the manifest
+    has recorded so far; None before anything has been loaded.
+    """
+    loaded_rows, loaded_bytes = conn.execute(
+        "SELECT SUM(row_count), SUM(file_size) FROM load_manifest").fetchone()
+    if not loaded_rows or not loaded_bytes:
+        return None
+    pending_bytes = sum(file_info[1] for _, _, file_info in pending)
+    return int(pending_bytes * loaded_rows / loaded_bytes)
+
+
+def drop_indexes_for_bulk_load(conn, pending, full_reload=False):
+    """
+    Drop the secondary indexes before a large incremental load so
+    create_indexes() rebuilds them in one pass afterwards. Returns whether
+    they were dropped.
+    """
+    existing_rows = conn.execute("SELECT MAX(id) FROM raw_telegram_messages").fetchone()[0] or 0
+    if not pending or not existing_rows:
+        return False  # first load: the indexes don't exist yet
+    expected_rows = existing_rows if full_reload else estimate_pending_rows(conn, pending)
+    if expected_rows is None or expected_rows < existing_rows * REBUILD_INDEXES_FRACTION:
+        return False
+    for name in SECONDARY_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+    print(f"🔧 Dropped secondary indexes for ~{expected_rows:,} incoming rows; rebuilding after the load")
+    return True
+
+
+def discover_json_files(json_dir=JSON_DIR):
+    """
+    Yield (partition, file_path) for every message file under json_dir.
+
+    partition is the folder relative to the root: the date for the JSON
+    lake (<date>/<channel>.json), channel_name=<c>/date=<d> for Parquet.
+    """
+    for root, dirs, files in os.walk(json_dir):
+        dirs.sort()
+        if root == json_dir:
+            continue
+        partition = os.path.relpath(root, json_dir).replace(os.sep, '/')
+        for file_name in sorted(files):
+            if file_name.endswith(MESSAGE_FILE_SUFFIXES):
+                yield partition, os.path.join(root, file_name)
+
+
+def file_sha256(file_path, block_size=1 << 20):
+    """Hex SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_key(file_path, json_dir):
+    """Manifest key: path relative to the data lake root, '/' separated"""
+    return os.path.relpath(file_path, json_dir).replace(os.sep, '/')
+
+
+def check_manifest(conn, file_path, json_dir, force=False):
+    """
+    Compare a file against its manifest entry.
+
+    Returns (changed, file_info) where file_info holds the values to record
+    once the file has been loaded. The content hash is only computed when
+    size or mtime differ from the manifest, so unchanged files cost a stat().
+    With force=True every file is reported as changed.
+    """
+    key = manifest_key(file_path, json_dir)
+    stat = os.stat(file_path)
+    entry = None if force else conn.execute(
+        "SELECT file_size, file_mtime, content_hash FROM load_manifest WHERE file_path = ?",
+        (key,)
+    ).fetchone()
+
+    if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime:
+        return False, None
+
+    content_hash = file_sha256(file_path)
+    file_info = (key, stat.st_size, stat.st_mtime, content_hash)
+    if entry and entry[2] == content_hash:
+        # Touched but identical: refresh size/mtime so the next run is a stat() again
+        with conn:
+            conn.execute(
+                "UPDATE load_manifest SET file_size = ?, file_mtime = ? WHERE file_path = ?",
+                (stat.st_size, stat.st_mtime, key)
+            )
+        return False, None
+    return True, file_info
+
+
+def record_manifest(conn, file_info, row_count):
+    """Mark a file as ingested; call inside the transaction that loaded its rows"""
+    conn.execute(UPSERT_MANIFEST_SQL, file_info + (row_count,))
+
+
+def iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yield the elements of a top-level JSON array one at a time.
+
+    Only the current read chunk and the element being decoded are held in
+    memory, so multi-GB channel dumps stream in constant space.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    started = False
+
+    while True:
+        # Skip whitespace and element separators
+        while pos < len(buf) and (buf[pos].isspace() or (started and buf[pos] == ',')):
+            pos += 1
+
+        if pos >= len(buf):
+            if eof:
+                raise ValueError("Unexpected end of file inside JSON array")
+            buf = f.read(chunk_size)
+            pos = 0
+            eof = not buf
+            continue
+
+        if not started:
+            if buf[pos] != '[':
+                raise ValueError("Expected a JSON array")
+            started = True
+            pos += 1
+            continue
+
+        if buf[pos] == ']':
+            return
+
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+            # A number cut at the chunk boundary ("12" of "123", "1." of
+            # "1.5") decodes early; insist on a separator after the element
+            if end == len(buf) and not eof:
+                raise ValueError("Element may continue in the next chunk")
+            if end < len(buf) and buf[end] not in ' \t\r\n,]':
+                raise ValueError("Unexpected character after array element")
+        except ValueError:
+            if eof:
+                raise
+            more = f.read(chunk_size)
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+
+        yield item
+        pos = end
+
+
+def iter_jsonl(f):
+    """Yield one JSON object per non-empty line"""
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_messages(file_path):
+    """Stream the message dicts stored in a .json array, .jsonl or .parquet file"""
+    if file_path.endswith('.parquet'):
+        from parquet_lake import iter_parquet_messages
+        yield from iter_parquet_messages(file_path)
+        return
+    with open(file_path, 'r', encoding='utf-8') as f:
+        if file_path.endswith('.jsonl'):
+            yield from iter_jsonl(f)
+        else:
+            yield from iter_json_array(f)
+
+
+def message_to_row(msg):
+    """Convert a scraped message dict into an UPSERT parameter tuple"""
+    for field in REQUIRED_FIELDS:
+        if msg.get(field) is None:
+            raise ValueError(f"Message is missing {field} (message_id={msg.get('message_id')})")
+    return (
+        msg['message_id'],
+        msg['channel_name'],
+        msg['message_date'],
+        msg['message_text'],
+        1 if msg['has_media'] else 0,
+        msg['views'],
+        msg['forwards'],
+        msg['image_path'],
+        msg.get('scraped_at')
+    )
+
+
+def chunked(iterable, size):
+    """Yield lists of at most size items from iterable"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def insert_rows(conn, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Insert rows in executemany chunks; the caller commits"""
+    inserted = 0
+    for chunk in chunked(rows, batch_size):
+        conn.executemany(UPSERT_SQL, chunk)
+        inserted += len(chunk)
+    return inserted
+
+
+def load_files_serial(conn, pending, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Parse and insert pending files one after another in this process.
+
+    Each file's rows and its manifest entry are committed in one
+    transaction, so a file that fails part way leaves nothing behind and
+    is loaded again on the next run.
+    """
+    files_loaded = 0
+    total_loaded = 0
+    current_partition = None
+    for partition, file_path, file_info in pending:
+        if partition != current_partition:
+            print(f"📁 Processing: {partition}")
+            current_partition = partition
+        print(f"   📂 Loading: {os.path.basename(file_path)}")
+
+        try:
+            rows = (message_to_row(msg) for msg in iter_messages(file_path))
+            with conn:
+                file_rows = insert_rows(conn, rows, batch_size)
+                record_manifest(conn, file_info, file_rows)
+            total_loaded += file_rows
+            files_loaded += 1
+        except Exception as e:
+            print(f"   ❌ Error loading {os.path.basename(file_path)}: {e}")
+    return files_loaded, total_loaded
+
+
+def parse_worker(task_queue, batch_queue, batch_size):
+    """
+    Worker process: parse and validate whole files, emit row batches.
+
+    Puts ('rows', file_path, rows), then ('done', file_path, (file_info,
+    row_count)) or ('error', file_path, message) per file, and None once
+    the task queue is exhausted.
+    """
+    while True:
+        task = task_queue.get()
+        if task is None:
+            batch_queue.put(None)
+            return
+        file_path, file_info = task
+        try:
+            row_count = 0
+            rows = (message_to_row(msg) for msg in iter_messages(file_path))
+            for chunk in chunked(rows, batch_size):
+                batch_queue.put(('rows', file_path, chunk))
+                row_count += len(chunk)
+            batch_queue.put(('done', file_path, (file_info, row_count)))
+        except Exception as e:
+            batch_queue.put(('error', file_path, str(e)))
+
+
+def load_files_parallel(conn, pending, batch_size=DEFAULT_BATCH_SIZE, workers=2):
+    """
+    Parse pending files in a pool of worker processes.
+
+    JSON decoding and row building run in the workers; this process is the
+    single SQLite writer. Batches from the workers interleave, so a file's
+    batches are held until its worker reports it done, then written together
+    with its manifest entry in one transaction, as in the serial path: a file
+    that fails to parse or that the database rejects leaves nothing behind.
+    At most one file per worker is held at a time.
+    """
+    workers = min(workers, len(pending))
+    task_queue = multiprocessing.Queue()
+    batch_queue = multiprocessing.Queue(maxsize=workers * QUEUE_BATCHES_PER_WORKER)
+
+    for _, file_path, file_info in pending:
+        task_queue.put((file_path, file_info))
+    for _ in range(workers):
+        task_queue.put(None)
+
+    processes = [
+        multiprocessing.Process(target=parse_worker, args=(task_queue, batch_queue, batch_size))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    print(f"⚙️ Parsing {len(pending)} files with {workers} worker processes")
+
+    files_loaded = 0
+    total_loaded = 0
+    held = {}  # file_path -> row batches received so far
+    running = workers
+    try:
+        while running:
+            try:
+                item = batch_queue.get(timeout=1)
+            except queue.Empty:
+                # A worker killed outright never sends its sentinel
+                if not any(process.is_alive() for process in processes):
+                    print("   ❌ Parser workers exited unexpectedly")
+                    break
+                continue
+            if item is None:
+                running -= 1
+                continue
+            kind, file_path, payload = item
+            if kind == 'rows':
+                held.setdefault(file_path, []).append(payload)
+            elif kind == 'done':
+                file_info, row_count = payload
+                try:
+                    with conn:
+                        for chunk in held.pop(file_path, []):
+                            conn.executemany(UPSERT_SQL, chunk)
+                        record_manifest(conn, file_info, row_count)
+                except sqlite3.Error as e:
+                    print(f"   ❌ Error loading {os.path.basename(file_path)}: {e}")
+                    continue
+                total_loaded += row_count
+                files_loaded += 1
+                print(f"   📂 Loaded: {file_info[0]} ({row_count} rows)")
+            else:
+                held.pop(file_path, None)
+                print(f"   ❌ Error loading {os.path.basename(file_path)}: {payload}")
+    finally:
+        if running:
+            # Workers still blocked on the bounded batch queue would never
+            # exit, so join() would hang; stop them instead
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+        for process in processes:
+            process.join()
+    return files_loaded, total_loaded
+
+
+def load_json_to_sqlite(db_path=DB_PATH, json_dir=JSON_DIR, batch_size=DEFAULT_BATCH_SIZE,
+                        full_reload=False, workers=1):
     try:
         # Connect to SQLite database
-        conn = sqlite3.connect('medical_warehouse.db')
-        cursor = conn.cursor()
-        
+        conn = sqlite3.connect(db_path)
+        apply_bulk_pragmas(conn)
+
         # Create table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS raw_telegram_messages (
-            message_id INTEGER PRIMARY KEY,
-            channel_name TEXT,
-            message_date TEXT,
-            message_text TEXT,
-            has_media INTEGER,
-            views INTEGER,
-            forwards INTEGER,
-            image_path TEXT,
-            scraped_at TEXT DEFAULT CURRENT_TIMESTAMP
-        );
-        """)
+        ensure_schema(conn)
         print("✅ Created raw_telegram_messages table")
-        
-        # Load JSON files
-        json_dir = "data/raw/telegram_messages"
+
         total_loaded = 0
-        
+        files_loaded = 0
+        files_skipped = 0
+        started = time.perf_counter()
+
         # Check if directory exists
         if not os.path.exists(json_dir):
             print(f"❌ Directory not found: {json_dir}")
             print("Current working directory:", os.getcwd())
             print("Available in data/raw/:", os.listdir("data/raw/") if os.path.exists("data/raw/") else "No data/raw folder")
-            return
-        
-        # List all date folders
-        for date_folder in os.listdir(json_dir):
-            date_path = os.path.join(json_dir, date_folder)
-            
-            if os.path.isdir(date_path):
-                print(f"📁 Processing date: {date_folder}")
-                
-                for json_file in os.listdir(date_path):
-                    if json_file.endswith('.json'):
-                        file_path = os.path.join(date_path, json_file)
-                        print(f"   📂 Loading: {json_file}")
-                        
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                messages = json.load(f)
-                                
-                            for msg in messages:
-                                cursor.execute("""
-                                INSERT OR IGNORE INTO raw_telegram_messages 
-                                (message_id, channel_name, message_date, message_text, 
-                                 has_media, views, forwards, image_path)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                                """, (
-                                    msg['message_id'],
-                                    msg['channel_name'],
-                                    msg['message_date'],
-                                    msg['message_text'],
-                                    1 if msg['has_media'] else 0,
-                                    msg['views'],
-                                    msg['forwards'],
-                                    msg['image_path']
-                                ))
-                                total_loaded += 1
-                                
-                        except Exception as e:
-                            print(f"   ❌ Error loading {json_file}: {e}")
-        
-        conn.commit()
+            conn.close()
+            return 0
+
+        pending = []
+        for partition, file_path in discover_json_files(json_dir):
+            try:
+                changed, file_info = check_manifest(conn, file_path, json_dir, force=full_reload)
+            except Exception as e:
+                print(f"   ❌ Error reading {os.path.basename(file_path)}: {e}")
+                continue
+            if changed:
+                pending.append((partition, file_path, file_info))
+            else:
+                files_skipped += 1
+
+        suspend_fts_indexing(conn)
+        try:
+            drop_indexes_for_bulk_load(conn, pending, full_reload)
+            if workers > 1 and len(pending) > 1:
+                files_loaded, total_loaded = load_files_parallel(conn, pending, batch_size, workers)
+            else:
+                files_loaded, total_loaded = load_files_serial(conn, pending, batch_size)
+
+            print(f"📋 Manifest: {files_loaded} files loaded, {files_skipped} unchanged files skipped")
+        finally:
+            # Even if the load raised, restore the indexes and resume per-row
+            # search indexing (a process killed outright leaves the suspension
+            # for ensure_schema() to catch up on the next start)
+            index_started = time.perf_counter()
+            create_indexes(conn)
+            ensure_fts(conn)
+        index_seconds = time.perf_counter() - index_started
+
+        extract_started = time.perf_counter()
+        with conn:
+            extracted, mentions = update_product_mentions(conn)
+            if files_loaded or extracted:
+                bump_generation(conn)
+        extract_seconds = time.perf_counter() - extract_started
         conn.close()
-        
+        if extracted:
+            print(f"🏷️ Extracted {mentions} product mentions from {extracted} new messages in {extract_seconds:.2f}s")
+
+        elapsed = time.perf_counter() - started
         if total_loaded > 0:
-            print(f"✅ Successfully loaded {total_loaded} messages to medical_warehouse.db")
+            rate = total_loaded / elapsed if elapsed > 0 else float(total_loaded)
+            print(f"✅ Successfully loaded {total_loaded} messages to {db_path}")
+            print(f"⏱️ {elapsed:.2f}s total ({index_seconds:.2f}s building indexes), {rate:,.0f} rows/sec")
+        elif files_skipped:
+            print("✅ Nothing new to load, all files already ingested")
         else:
             print("⚠️ No messages were loaded. Check your data directory.")
-            
+        return total_loaded
+
     except Exception as e:
         print(f"❌ Error: {e}")
+        return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load raw Telegram JSON/JSONL/Parquet files into SQLite")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--data-dir", default=JSON_DIR, help="Root of the raw data lake (JSON or Parquet layout)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows per executemany batch / transaction")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the load manifest and re-ingest every file")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Parser processes; >1 enables the parallel ingest mode")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    load_json_to_sqlite()
\ No newline at end of file
+    args = parse_args()
+    load_json_to_sqlite(args.db, args.data_dir, args.batch_size, args.full, args.workers)
@@ -0,0 +1,130 @@
+"""
+Content-addressed image store and background media download pool.
+
+Every photo is stored once under data/raw/images/by_hash/<aa>/<sha256>.jpg.
+The per-message path the rest of the pipeline uses
+(data/raw/images/<channel>/<date>/<id>.jpg) is a hard link to that file
+(a copy where links are not supported), and media_index.jsonl maps each
+(channel_name, message_id) to its hash so reposted promo images can be
+analysed once.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+
+logger = logging.getLogger(__name__)
+
+HASH_DIR = "data/raw/images/by_hash"
+MEDIA_INDEX_PATH = "data/raw/images/media_index.jsonl"
+
+MEDIA_WORKERS = int(os.getenv('MEDIA_WORKERS', '4'))
+MEDIA_QUEUE_SIZE = int(os.getenv('MEDIA_QUEUE_SIZE', '100'))
+
+
+def hashed_path(sha256, hash_dir=HASH_DIR):
+    return os.path.join(hash_dir, sha256[:2], f"{sha256}.jpg")
+
+
+def store_image(data, image_path, hash_dir=HASH_DIR):
+    """
+    Store image bytes by content hash and link image_path to them.
+
+    Returns (sha256, is_new); is_new is False when the same bytes were
+    already in the store.
+    """
+    sha256 = hashlib.sha256(data).hexdigest()
+    target = hashed_path(sha256, hash_dir)
+    is_new = not os.path.exists(target)
+    if is_new:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, target)
+
+    os.makedirs(os.path.dirname(image_path), exist_ok=True)
+    if os.path.lexists(image_path):
+        os.remove(image_path)
+    try:
+        os.link(target, image_path)
+    except OSError:
+        shutil.copyfile(target, image_path)
+    return sha256, is_new
+
+
+class MediaDownloader:
+    """
+    Worker pool that downloads photos off a bounded queue.
+
+    download is an async callable returning the photo bytes for a message.
+    submit() only waits when the queue is full, so paging keeps going while
+    photos transfer; the returned future resolves to the sha256, or raises
+    the error the download or store failed with.
+    """
+
+    def __init__(self, download, workers=MEDIA_WORKERS, queue_size=MEDIA_QUEUE_SIZE,
+                 hash_dir=HASH_DIR, index_path=MEDIA_INDEX_PATH):
+        self.download = download
+        self.workers = workers
+        self.hash_dir = hash_dir
+        self.index_path = index_path
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.tasks = []
+        self.stats = {'downloaded': 0, 'bytes': 0, 'unique': 0, 'duplicates': 0, 'failed': 0}
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    async def submit(self, message, channel_name, image_path):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((message, channel_name, image_path, future))
+        return future
+
+    async def worker(self):
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            message, channel_name, image_path, future = item
+            try:
+                data = await self.download(message)
+                sha256, is_new = await asyncio.to_thread(store_image, data, image_path, self.hash_dir)
+                self.record(channel_name, message.id, image_path, sha256, len(data), is_new)
+                future.set_result(sha256)
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.error(f"FAILED media {channel_name}/{message.id}: {type(e).__name__} - {e}")
+                future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    def record(self, channel_name, message_id, image_path, sha256, size, is_new):
+        self.stats['downloaded'] += 1
+        self.stats['bytes'] += size
+        self.stats['unique' if is_new else 'duplicates'] += 1
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'channel_name': channel_name,
+                'message_id': message_id,
+                'image_path': image_path,
+                'sha256': sha256,
+                'bytes': size,
+                'duplicate': not is_new,
+            }) + '\n')
+
+    async def close(self):
+        """Finish everything queued, then stop the workers"""
+        await self.queue.join()
+        for _ in self.tasks:
+            await self.queue.put(None)
+        await asyncio.gather(*self.tasks)
+        self.tasks = []
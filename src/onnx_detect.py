@@ -0,0 +1,226 @@
+"""
+ONNX Runtime backend for YOLO detection.
+
+The YOLO weights are exported to ONNX once (next to the .pt file, with a
+dynamic batch axis) and optionally int8 dynamically quantized, then run
+through ONNX Runtime on the CPU. Inference needs neither torch nor
+ultralytics when an .onnx file is given, which keeps the enrichment box
+light. OnnxYoloEngine takes the same letterboxed batches as YoloEngine,
+so yolo_detect.py switches with --backend onnx / onnx-int8.
+
+Check that the exported model agrees with the torch backend before
+switching:
+
+    python src/onnx_detect.py --model yolov8n.pt --int8
+"""
+
+import argparse
+import ast
+import os
+import sys
+import time
+
+import numpy as np
+
+from image_prefetch import BatchPrefetcher, StageTimers, letterbox_into
+from yolo_detect import (CONFIDENCE_THRESHOLD, DEFAULT_BATCH_SIZE, DEFAULT_PREFETCH_WORKERS, DEFAULT_THREADS,
+                         IMAGE_DIR, IMAGE_SIZE, MODEL_PATH, YoloEngine, backend_version, iter_images)
+
+# ultralytics' non_max_suppression defaults
+IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+MAX_NMS_BOXES = 30000
+CLASS_OFFSET = 7680
+
+
+def is_stale(path, source):
+    return not os.path.exists(path) or (os.path.exists(source) and os.path.getmtime(path) < os.path.getmtime(source))
+
+
+def export_onnx(model_path=MODEL_PATH, imgsz=IMAGE_SIZE, quantize=False):
+    """
+    Path of the ONNX model for model_path, exporting (and quantizing) it
+    only when the file is missing or older than its source.
+    """
+    onnx_path = model_path
+    if not model_path.endswith('.onnx'):
+        onnx_path = os.path.splitext(model_path)[0] + '.onnx'
+        if is_stale(onnx_path, model_path):
+            from ultralytics import YOLO
+
+            print(f"📦 Exporting {model_path} to ONNX...")
+            onnx_path = YOLO(model_path).export(format='onnx', imgsz=imgsz, dynamic=True)
+    if not quantize:
+        return onnx_path
+
+    int8_path = os.path.splitext(onnx_path)[0] + '.int8.onnx'
+    if is_stale(int8_path, onnx_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"📦 Quantizing {onnx_path} to int8...")
+        # ONNX Runtime's CPU ConvInteger kernel only takes uint8 weights
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+    return int8_path
+
+
+def nms(boxes, scores, iou_threshold):
+    """Indices of the boxes (x1, y1, x2, y2) kept by greedy NMS, best first"""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        w = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_predictions(prediction, conf, iou=IOU_THRESHOLD, max_det=MAX_DETECTIONS):
+    """
+    [(class_id, confidence)] per image from a raw YOLOv8 head output
+    (batch, 4 + classes, anchors), best first, like ultralytics' NMS.
+    """
+    detections = []
+    for image in prediction:
+        scores = image[4:]
+        class_ids = scores.argmax(axis=0)
+        confidences = scores[class_ids, np.arange(scores.shape[1])]
+        candidates = np.flatnonzero(confidences > conf)
+        if not candidates.size:
+            detections.append([])
+            continue
+        candidates = candidates[confidences[candidates].argsort()[::-1][:MAX_NMS_BOXES]]
+        cx, cy, w, h = image[:4, candidates]
+        offset = class_ids[candidates] * CLASS_OFFSET
+        boxes = np.stack([cx - w / 2 + offset, cy - h / 2, cx + w / 2 + offset, cy + h / 2], axis=1)
+        keep = candidates[nms(boxes, confidences[candidates], iou)[:max_det]]
+        detections.append([(int(class_ids[i]), float(confidences[i])) for i in keep])
+    return detections
+
+
+class OnnxYoloEngine(YoloEngine):
+    """YoloEngine running an exported (optionally int8) model in ONNX Runtime"""
+
+    def __init__(self, model_path=MODEL_PATH, batch_size=DEFAULT_BATCH_SIZE, threads=DEFAULT_THREADS,
+                 conf=CONFIDENCE_THRESHOLD, imgsz=IMAGE_SIZE, prefetch_workers=DEFAULT_PREFETCH_WORKERS,
+                 quantize=False):
+        import onnxruntime as ort
+
+        self.onnx_path = export_onnx(model_path, imgsz, quantize)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(self.onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.names = ast.literal_eval(self.session.get_modelmeta().custom_metadata_map['names'])
+        self.model_version = backend_version(model_path, 'onnx-int8' if quantize else 'onnx', conf, imgsz)
+        self.batch_size = batch_size
+        self.conf = conf
+        self.imgsz = imgsz
+        self.prefetch_workers = prefetch_workers
+        self.timers = StageTimers()
+
+    def predict(self, batch):
+        """Raw head output for a letterboxed (n, imgsz, imgsz, 3) RGB uint8 batch"""
+        tensor = np.ascontiguousarray(batch.transpose(0, 3, 1, 2), dtype=np.float32)
+        tensor *= 1 / 255
+        return self.session.run(None, {self.input_name: tensor})[0]
+
+    def detect(self, images):
+        """Detections for a list of decoded BGR images (one model call)"""
+        batch = np.empty((len(images), self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        for image, slot in zip(images, batch):
+            letterbox_into(image, slot)
+        return self.detect_batch(batch)
+
+    def detect_batch(self, batch):
+        """Detections for a letterboxed (n, imgsz, imgsz, 3) RGB uint8 batch"""
+        return [[(self.names[c], p) for c, p in image]
+                for image in decode_predictions(self.predict(batch), self.conf)]
+
+
+def torch_predict(engine, batch):
+    """Raw head output of the torch backend, for comparison with OnnxYoloEngine.predict"""
+    torch = engine.torch
+    engine.detect_batch(batch[:1])  # ultralytics sets up (and fuses) the model on first predict
+    tensor = torch.from_numpy(batch).permute(0, 3, 1, 2).float().div_(255).contiguous()
+    with torch.no_grad():
+        output = engine.model.model(tensor)
+    return (output[0] if isinstance(output, (list, tuple)) else output).numpy()
+
+
+def check_parity(args):
+    """
+    Run the torch and ONNX backends over the same letterboxed batches and
+    compare raw outputs and per-image detections. Returns True if every
+    image has the same classes and confidences within tolerance.
+    """
+    paths = [path for _, _, path in iter_images(args.image_dir)] if os.path.isdir(args.image_dir) else []
+    workdir = None
+    if not paths:
+        from benchmark_detection import synthetic_images
+
+        workdir, paths = synthetic_images(args.images)
+    paths = paths[:args.images]
+
+    torch_engine = YoloEngine(args.model, args.batch_size, args.threads, conf=args.conf)
+    onnx_engine = OnnxYoloEngine(args.model, args.batch_size, args.threads, conf=args.conf, quantize=args.int8)
+    print(f"🔍 Comparing {torch_engine.model_version} with {onnx_engine.model_version} on {len(paths)} images")
+
+    matched, max_output_diff, max_conf_diff = 0, 0.0, 0.0
+    timings = {'torch': 0.0, 'onnx': 0.0}
+    for batch_paths, batch, ok in BatchPrefetcher(paths, args.batch_size, IMAGE_SIZE, timers=StageTimers()):
+        started = time.perf_counter()
+        expected = torch_engine.detect_batch(batch)
+        timings['torch'] += time.perf_counter() - started
+        started = time.perf_counter()
+        found = onnx_engine.detect_batch(batch)
+        timings['onnx'] += time.perf_counter() - started
+
+        output_diff = np.abs(torch_predict(torch_engine, batch)[:, 4:] - onnx_engine.predict(batch)[:, 4:]).max()
+        max_output_diff = max(max_output_diff, float(output_diff))
+        for want, got in zip(expected, found):
+            same = [c for c, _ in want] == [c for c, _ in got]
+            diff = max((abs(a - b) for (_, a), (_, b) in zip(want, got)), default=0.0)
+            if same and diff <= args.tolerance:
+                matched += 1
+            max_conf_diff = max(max_conf_diff, diff if same else 1.0)
+
+    if workdir:
+        import shutil
+
+        shutil.rmtree(workdir, ignore_errors=True)
+    total = len(paths)
+    print(f"   Matching detections: {matched}/{total} images (max confidence diff {max_conf_diff:.4f})")
+    print(f"   Max class score diff: {max_output_diff:.4f}")
+    print(f"   Time: torch {timings['torch']:.2f}s, onnx {timings['onnx']:.2f}s")
+    return matched == total
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export YOLO to ONNX and check it against the torch backend")
+    parser.add_argument("--model", default=MODEL_PATH, help="YOLO .pt weights")
+    parser.add_argument("--int8", action="store_true", help="Check the int8 quantized model")
+    parser.add_argument("--images", type=int, default=32, help="Images to compare")
+    parser.add_argument("--image-dir", default=IMAGE_DIR, help="Images to compare on (synthetic if empty)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Images per model call")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="CPU threads per backend")
+    parser.add_argument("--conf", type=float, default=CONFIDENCE_THRESHOLD, help="Confidence threshold")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="Max confidence difference per detection (default 0.01, 0.1 with --int8)")
+    args = parser.parse_args()
+    if args.tolerance is None:
+        args.tolerance = 0.1 if args.int8 else 0.01
+    return args
+
+
+if __name__ == "__main__":
+    ok = check_parity(parse_args())
+    print("✅ Backends agree" if ok else "❌ Backends disagree")
+    sys.exit(0 if ok else 1)
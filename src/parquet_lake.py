@@ -0,0 +1,157 @@
+"""
+Columnar raw layer for scraped Telegram messages.
+
+Messages are stored as Parquet under
+data/raw/telegram_messages_parquet/channel_name=<channel>/date=<YYYY-MM-DD>/,
+next to the JSON data lake. Reading the tree as a hive-partitioned dataset
+gives a dictionary-encoded channel_name column and lets callers project
+only the columns (and partitions) they need. pyarrow is only required by
+code that touches Parquet.
+"""
+
+import os
+import uuid
+from datetime import datetime
+
+PARQUET_DIR = "data/raw/telegram_messages_parquet"
+
+# Rows per Parquet row group / per batch handed back to the loader
+ROW_GROUP_SIZE = 50000
+
+
+def _pyarrow():
+    """Import pyarrow lazily so the JSON-only pipeline does not need it"""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet support needs pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def message_schema():
+    """Schema of the per-partition files (partition columns excluded)"""
+    pa = _pyarrow()
+    return pa.schema([
+        ('message_id', pa.int64()),
+        ('message_date', pa.timestamp('us', tz='UTC')),
+        ('message_text', pa.string()),
+        ('has_media', pa.bool_()),
+        ('views', pa.int64()),
+        ('forwards', pa.int64()),
+        ('image_path', pa.string()),
+        ('scraped_at', pa.string()),
+    ])
+
+
+def partitioning():
+    """Hive partitioning with dictionary-encoded partition values"""
+    pa = _pyarrow()
+    return pa.dataset.HivePartitioning.discover(infer_dictionary=True)
+
+
+def partition_dir(channel_name, date_str, base_dir=PARQUET_DIR):
+    return os.path.join(base_dir, f"channel_name={channel_name}", f"date={date_str}")
+
+
+def messages_to_table(messages):
+    """Build an Arrow table from scraped message dicts"""
+    pa = _pyarrow()
+    columns = {
+        'message_id': [m['message_id'] for m in messages],
+        'message_date': [datetime.fromisoformat(m['message_date']) if m.get('message_date') else None
+                         for m in messages],
+        'message_text': [m.get('message_text') for m in messages],
+        'has_media': [bool(m.get('has_media')) for m in messages],
+        'views': [m.get('views') for m in messages],
+        'forwards': [m.get('forwards') for m in messages],
+        'image_path': [m.get('image_path') for m in messages],
+        'scraped_at': [m.get('scraped_at') for m in messages],
+    }
+    return pa.Table.from_pydict(columns, schema=message_schema())
+
+
+def open_writer(file_path):
+    """ParquetWriter for one partition file (zstd, dictionary-encoded strings)"""
+    pa = _pyarrow()
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    return pa.parquet.ParquetWriter(
+        file_path,
+        message_schema(),
+        compression='zstd',
+        use_dictionary=True,
+    )
+
+
+def write_messages_parquet(messages, channel_name, date_str=None, base_dir=PARQUET_DIR):
+    """
+    Write one channel's messages as a new file in its channel/date partition.
+
+    The file is written under a hidden temporary name, fsynced and renamed,
+    so dataset readers never pick up a file without its footer.
+    """
+    date_str = date_str or datetime.now().strftime('%Y-%m-%d')
+    name = f"part-{uuid.uuid4().hex}.parquet"
+    output_dir = partition_dir(channel_name, date_str, base_dir)
+    tmp_path = os.path.join(output_dir, f".{name}.tmp")
+    writer = open_writer(tmp_path)
+    try:
+        writer.write_table(messages_to_table(messages), row_group_size=ROW_GROUP_SIZE)
+    finally:
+        writer.close()
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    file_path = os.path.join(output_dir, name)
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+def open_dataset(base_dir=PARQUET_DIR):
+    """The whole Parquet raw layer as one hive-partitioned Arrow dataset"""
+    pa = _pyarrow()
+    return pa.dataset.dataset(base_dir, format='parquet', partitioning=partitioning())
+
+
+def read_messages_table(columns=None, channels=None, dates=None, base_dir=PARQUET_DIR):
+    """
+    Read messages with column projection and partition pruning.
+
+    channels / dates restrict the scan to matching partition directories,
+    so only the requested slices and columns are decoded.
+    """
+    pa = _pyarrow()
+    dataset = open_dataset(base_dir)
+    expression = None
+    if channels:
+        expression = pa.dataset.field('channel_name').isin(list(channels))
+    if dates:
+        date_filter = pa.dataset.field('date').isin(list(dates))
+        expression = date_filter if expression is None else expression & date_filter
+    return dataset.to_table(columns=columns, filter=expression)
+
+
+def read_messages_frame(columns=None, channels=None, dates=None, base_dir=PARQUET_DIR):
+    """pandas view of read_messages_table() for the analysis notebooks"""
+    return read_messages_table(columns, channels, dates, base_dir).to_pandas()
+
+
+def channel_from_path(file_path):
+    """Recover the channel_name partition value from a file path"""
+    for part in file_path.replace(os.sep, '/').split('/'):
+        if part.startswith('channel_name='):
+            return part[len('channel_name='):]
+    return None
+
+
+def iter_parquet_messages(file_path, batch_size=ROW_GROUP_SIZE):
+    """Yield message dicts from one partition file, one record batch at a time"""
+    pa = _pyarrow()
+    channel_name = channel_from_path(file_path)
+    parquet_file = pa.parquet.ParquetFile(file_path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        for row in batch.to_pylist():
+            row['channel_name'] = channel_name
+            if row['message_date'] is not None:
+                row['message_date'] = row['message_date'].isoformat()
+            yield row
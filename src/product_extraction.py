@@ -0,0 +1,434 @@
+"""
+Product and price extraction stage.
+
+Matches every new message against a configurable product dictionary
+(config/product_dictionary.json: product name -> aliases) with an
+Aho-Corasick automaton, picks the price and pack size out with a bank of
+compiled regexes covering the channels' formats ("Price 7500 birr",
+"💵 **53birr**", "ዋጋ 112 ብር", "📦 48pack", "10x10"), and writes one
+product_mentions row per (message, product). /api/reports/top-products
+is then an indexed GROUP BY over product_mentions instead of a text scan
+on every request.
+
+Each message is processed once: both warehouses keep a watermark on the
+messages' surrogate id, so a run only reads the rows past it. Changing the
+dictionary or the patterns changes the extractor version and re-extracts
+everything on the next run.
+The loaders and the stream writer run the stage after each write; run it
+by hand after editing the dictionary:
+
+    python src/product_extraction.py
+    python src/product_extraction.py --postgres
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from functools import lru_cache
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DICTIONARY_PATH = os.getenv('PRODUCT_DICTIONARY', os.path.join(REPO_ROOT, 'config', 'product_dictionary.json'))
+
+# Bump when the price / pack patterns change, to re-extract stored mentions
+PATTERN_VERSION = 2
+
+# Messages read and extracted per round trip
+BATCH_SIZE = 5000
+
+STAGE = 'product_mentions'
+
+# Numbers only start after a non-digit, so long digit runs (phone numbers)
+# aren't retried from every position
+NUMBER = r'(?<![\d,.])(\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)'
+CURRENCY = r'(?:birr|br\.?|etb|ብር)'
+
+# Tried in order; the first pattern that matches gives the price. Labelled
+# prices beat bare "<n> birr" amounts, which also appear in delivery notes.
+PRICE_PATTERNS = [
+    re.compile(r'(?:price|ዋጋ(?:ው)?)\s*[:：፡=\-]?\s*\**\s*' + NUMBER, re.IGNORECASE),
+    re.compile(r'💵\s*\**\s*' + NUMBER),
+    re.compile(NUMBER + r'\s*' + CURRENCY + r'(?![a-z])', re.IGNORECASE),
+    re.compile(r'(?<![a-z])' + CURRENCY + r'\s*' + NUMBER, re.IGNORECASE),
+]
+
+# Lines quoting fees rather than the product's price
+IGNORED_PRICE_LINES = re.compile(r'delivery|transport|ትራንስፖርት|rent|salary', re.IGNORECASE)
+
+PACK_PATTERNS = [
+    (re.compile(r'(?<!\d)(\d+)\s*[x×*]\s*(\d+)', re.IGNORECASE), lambda m: f"{m.group(1)}x{m.group(2)}"),
+    (re.compile(r'(?<!\d)(\d+)\s*(pack|pk|pcs|tablets|tabs|caps|capsules|softgels|sachets)(?![a-z])', re.IGNORECASE),
+     lambda m: f"{m.group(1)} {m.group(2).lower()}"),
+    (re.compile(r'📦\s*(\d+)'), lambda m: f"{m.group(1)} pack"),
+]
+
+MAX_PRICE = 10_000_000
+
+CREATE_SQLITE_SQL = """
+CREATE TABLE IF NOT EXISTS product_mentions (
+    channel_name TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    product_name TEXT NOT NULL,
+    price REAL,
+    pack_size TEXT,
+    views INTEGER,
+    PRIMARY KEY (channel_name, message_id, product_name)
+);
+CREATE INDEX IF NOT EXISTS idx_product_mentions_product ON product_mentions(product_name, price, views);
+
+-- views is copied from the message so top-products never joins back;
+-- the loaders' upserts only ever raise it
+CREATE TRIGGER IF NOT EXISTS trg_raw_messages_mention_views
+AFTER UPDATE OF views ON raw_telegram_messages
+WHEN NEW.views IS NOT OLD.views
+BEGIN
+    UPDATE product_mentions SET views = NEW.views
+    WHERE channel_name = NEW.channel_name AND message_id = NEW.message_id;
+END;
+
+CREATE TABLE IF NOT EXISTS stage_watermarks (
+    stage TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    updated_at TEXT
+);
+"""
+
+SQLITE_PENDING_SQL = """
+SELECT id, channel_name, message_id, message_text, views
+FROM raw_telegram_messages
+WHERE id > ?
+ORDER BY id
+LIMIT ?
+"""
+
+SQLITE_INSERT_SQL = """
+INSERT OR REPLACE INTO product_mentions (channel_name, message_id, product_name, price, pack_size, views)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+SQLITE_WATERMARK_SQL = """
+INSERT INTO stage_watermarks (stage, last_id, version, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+ON CONFLICT(stage) DO UPDATE SET
+    last_id = excluded.last_id,
+    version = excluded.version,
+    updated_at = excluded.updated_at
+"""
+
+CREATE_POSTGRES_SQL = """
+CREATE SCHEMA IF NOT EXISTS raw;
+
+CREATE TABLE IF NOT EXISTS raw.product_mentions (
+    channel_name VARCHAR(255) NOT NULL,
+    message_id BIGINT NOT NULL,
+    product_name VARCHAR(128) NOT NULL,
+    price REAL,
+    pack_size VARCHAR(32),
+    views INTEGER,
+    PRIMARY KEY (channel_name, message_id, product_name)
+);
+CREATE INDEX IF NOT EXISTS idx_product_mentions_product ON raw.product_mentions(product_name, price, views);
+
+CREATE OR REPLACE FUNCTION raw.sync_product_mention_views() RETURNS trigger AS $$
+BEGIN
+    UPDATE raw.product_mentions SET views = NEW.views
+    WHERE channel_name = NEW.channel_name AND message_id = NEW.message_id;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+-- Created once: DROP TRIGGER would lock readers out of the messages table
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_telegram_messages_mention_views') THEN
+        CREATE TRIGGER trg_telegram_messages_mention_views
+        AFTER UPDATE OF views ON raw.telegram_messages
+        FOR EACH ROW WHEN (OLD.views IS DISTINCT FROM NEW.views)
+        EXECUTE FUNCTION raw.sync_product_mention_views();
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS raw.stage_watermarks (
+    stage VARCHAR(64) PRIMARY KEY,
+    last_id BIGINT NOT NULL,
+    version VARCHAR(16) NOT NULL,
+    updated_at TIMESTAMP
+);
+
+-- Replaced by the watermark on raw.telegram_messages.id
+DROP TABLE IF EXISTS raw.product_extraction_log;
+"""
+
+POSTGRES_PENDING_SQL = """
+SELECT id, channel_name, message_id, message_text, views
+FROM raw.telegram_messages
+WHERE id > %s
+ORDER BY id
+"""
+
+POSTGRES_WATERMARK_SQL = """
+INSERT INTO raw.stage_watermarks AS w (stage, last_id, version, updated_at) VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+ON CONFLICT (stage) DO UPDATE SET
+    last_id = EXCLUDED.last_id,
+    version = EXCLUDED.version,
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+class ProductExtractor:
+    """
+    Dictionary + regex extraction of (product, price, pack size).
+
+    Aliases are matched case-insensitively anywhere that doesn't continue a
+    Latin word ("NIDO1+" is NIDO, "environment" is not IRON). pyahocorasick
+    runs the automaton when installed; otherwise one compiled alternation
+    of the aliases does the same matching.
+    """
+
+    def __init__(self, dictionary):
+        self.aliases = {}
+        for product, aliases in dictionary.items():
+            for alias in [product] + list(aliases):
+                self.aliases.setdefault(alias.lower(), product)
+        payload = json.dumps([sorted(self.aliases.items()), PATTERN_VERSION], ensure_ascii=False)
+        self.version = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+        try:
+            import ahocorasick
+        except ImportError:
+            self.automaton = None
+            alternation = '|'.join(re.escape(a) for a in sorted(self.aliases, key=len, reverse=True))
+            self.pattern = re.compile(f'(?<![a-z0-9])(?:{alternation})')
+        else:
+            self.automaton = ahocorasick.Automaton()
+            for alias, product in self.aliases.items():
+                self.automaton.add_word(alias, (len(alias), product))
+            self.automaton.make_automaton()
+
+    def mentions(self, text):
+        """[(start, end, product)] of the aliases in text, leftmost-longest, not overlapping"""
+        lowered = text.lower()
+        if self.automaton is None:
+            return [(m.start(), m.end(), self.aliases[m.group()]) for m in self.pattern.finditer(lowered)]
+        candidates = []
+        for end, (length, product) in self.automaton.iter(lowered):
+            start = end - length + 1
+            if start and is_word_char(lowered[start - 1]):
+                continue
+            candidates.append((start, -length, product))
+        found = []
+        for start, length, product in sorted(candidates):
+            if not found or start >= found[-1][1]:
+                found.append((start, start - length, product))
+        return found
+
+    def products(self, text):
+        """Products mentioned in text, in order of first mention"""
+        return list(dict.fromkeys(product for _, _, product in self.mentions(text)))
+
+    def extract(self, text):
+        """
+        [(product, price, pack_size)] for a message's text, in order of
+        first mention. A product's price and pack size are looked for in
+        its own segments: from each mention (or the start of its line, if
+        no other product comes first on it) up to the next mention of
+        another product. None when no segment has one.
+        """
+        if not text:
+            return []
+        mentions = self.mentions(text)
+        found = {}
+        for i, (start, _, product) in enumerate(mentions):
+            price, pack_size = found.get(product, (None, None))
+            if price is not None and pack_size is not None:
+                continue
+            line_start = text.rfind('\n', 0, start) + 1
+            others = [(s, p) for s, _, p in mentions if p != product]
+            begin = start if any(line_start <= s < start for s, _ in others) else line_start
+            stop = min((s for s, _ in others if s > start), default=len(text))
+            segment = text[begin:stop]
+            found[product] = (extract_price(segment) if price is None else price,
+                              extract_pack_size(segment) if pack_size is None else pack_size)
+        return [(product, price, pack_size) for product, (price, pack_size) in found.items()]
+
+
+def is_word_char(char):
+    return char.isascii() and char.isalnum()
+
+
+def extract_price(text):
+    """First price found by the pattern bank, in birr, or None"""
+    for pattern in PRICE_PATTERNS:
+        for match in pattern.finditer(text):
+            value = float(match.group(1).replace(',', ''))
+            if 0 < value < MAX_PRICE and not IGNORED_PRICE_LINES.search(line_of(text, match.start())):
+                return value
+    return None
+
+
+def line_of(text, index):
+    start = text.rfind('\n', 0, index) + 1
+    end = text.find('\n', index)
+    return text[start:] if end < 0 else text[start:end]
+
+
+def extract_pack_size(text):
+    for pattern, render in PACK_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return render(match)
+    return None
+
+
+def load_dictionary(path=DICTIONARY_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=4)
+def default_extractor(path=DICTIONARY_PATH):
+    return ProductExtractor(load_dictionary(path))
+
+
+def ensure_product_tables(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(stage_watermarks)")]
+    if 'last_rowid' in columns:
+        # Watermarks from before the surrogate id, which kept each row's rowid
+        conn.execute("ALTER TABLE stage_watermarks RENAME COLUMN last_rowid TO last_id")
+    conn.executescript(CREATE_SQLITE_SQL)
+
+
+def update_product_mentions(conn, extractor=None, batch_size=BATCH_SIZE):
+    """
+    Extract mentions from the SQLite messages past the stage's watermark.
+
+    Runs in the caller's transaction (wrap it in `with conn:`) so mentions
+    land together with the messages and the generation bump. Returns
+    (messages processed, mentions written).
+    """
+    extractor = extractor or default_extractor()
+    state = conn.execute("SELECT last_id, version FROM stage_watermarks WHERE stage = ?", (STAGE,)).fetchone()
+    last_id = 0
+    if state and state[1] == extractor.version:
+        last_id = state[0]
+    elif state:
+        print("🔧 Product dictionary changed, re-extracting all mentions")
+        conn.execute("DELETE FROM product_mentions")
+
+    processed = written = 0
+    while True:
+        batch = conn.execute(SQLITE_PENDING_SQL, (last_id, batch_size)).fetchall()
+        if not batch:
+            break
+        rows = [(channel_name, message_id, product, price, pack_size, views)
+                for _, channel_name, message_id, text, views in batch
+                for product, price, pack_size in extractor.extract(text)]
+        conn.executemany(SQLITE_INSERT_SQL, rows)
+        last_id = batch[-1][0]
+        processed += len(batch)
+        written += len(rows)
+    if processed or not state or state[1] != extractor.version:
+        conn.execute(SQLITE_WATERMARK_SQL, (STAGE, last_id, extractor.version))
+    return processed, written
+
+
+def update_postgres_product_mentions(conn, extractor=None, batch_size=BATCH_SIZE):
+    """
+    Extract mentions from the PostgreSQL messages past the stage's
+    watermark, inside the caller's transaction. Returns (processed, written).
+
+    Ids are handed out when a row is inserted, not when it commits, so a
+    SHARE lock first waits out other writers' transactions: the watermark
+    never moves past a row that isn't visible yet.
+    """
+    from load_to_postgres import MESSAGE_ID_SQL, RowCopyStream
+
+    extractor = extractor or default_extractor()
+    with conn.cursor() as cursor:
+        cursor.execute(MESSAGE_ID_SQL + CREATE_POSTGRES_SQL)
+        cursor.execute("LOCK TABLE raw.telegram_messages IN SHARE MODE")
+        cursor.execute("SELECT last_id, version FROM raw.stage_watermarks WHERE stage = %s", (STAGE,))
+        state = cursor.fetchone()
+        last_id = 0
+        if state and state[1] == extractor.version:
+            last_id = state[0]
+        else:
+            if state:
+                print("🔧 Product dictionary changed, re-extracting all mentions")
+            cursor.execute("TRUNCATE raw.product_mentions")
+
+    processed = written = 0
+    pending = conn.cursor(name='product_extraction_pending')
+    pending.itersize = batch_size
+    pending.execute(POSTGRES_PENDING_SQL, (last_id,))
+    with conn.cursor() as cursor:
+        while True:
+            batch = pending.fetchmany(batch_size)
+            if not batch:
+                break
+            rows = [(channel_name, message_id, product, price, pack_size, views)
+                    for _, channel_name, message_id, text, views in batch
+                    for product, price, pack_size in extractor.extract(text)]
+            cursor.copy_expert(
+                "COPY raw.product_mentions (channel_name, message_id, product_name, price, pack_size, views) FROM STDIN",
+                RowCopyStream(rows), size=1 << 16)
+            last_id = batch[-1][0]
+            processed += len(batch)
+            written += len(rows)
+        if processed or not state or state[1] != extractor.version:
+            cursor.execute(POSTGRES_WATERMARK_SQL, (STAGE, last_id, extractor.version))
+    pending.close()
+    return processed, written
+
+
+def run(db_path, postgres=False, dictionary=DICTIONARY_PATH):
+    extractor = default_extractor(dictionary)
+    started = time.perf_counter()
+    if postgres:
+        from load_to_postgres import BUMP_GENERATION_SQL, CREATE_GENERATION_SQL, get_connection
+
+        conn = get_connection()
+        try:
+            processed, written = update_postgres_product_mentions(conn, extractor)
+            if processed:
+                with conn.cursor() as cursor:
+                    cursor.execute(CREATE_GENERATION_SQL + BUMP_GENERATION_SQL)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    else:
+        import sqlite3
+
+        from load_to_sqlite import bump_generation, ensure_schema
+
+        conn = sqlite3.connect(db_path)
+        try:
+            ensure_schema(conn)
+            with conn:
+                processed, written = update_product_mentions(conn, extractor)
+                if processed:
+                    bump_generation(conn)
+        finally:
+            conn.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Extracted {written} product mentions from {processed} new messages in {elapsed:.2f}s")
+    return processed, written
+
+
+def parse_args():
+    from load_to_sqlite import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Extract product mentions and prices from new messages")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--postgres", action="store_true", help="Extract into PostgreSQL instead of SQLite")
+    parser.add_argument("--dictionary", default=DICTIONARY_PATH, help="Product dictionary JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run(args.db, args.postgres, args.dictionary)
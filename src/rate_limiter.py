@@ -0,0 +1,72 @@
+"""
+Adaptive token-bucket rate limiter shared by concurrent Telegram requests.
+
+Every API call takes one token. The refill rate grows additively while
+calls succeed and is cut multiplicatively when Telegram answers with a
+FloodWait, which also pauses all callers for the requested number of
+seconds (AIMD, like TCP congestion control).
+"""
+
+import asyncio
+import time
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, rate=5.0, min_rate=0.5, max_rate=30.0, burst=5,
+                 increase_step=0.25, backoff_factor=0.5):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase_step = increase_step
+        self.backoff_factor = backoff_factor
+
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0.0
+        self.calls = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    async def acquire(self):
+        """Wait for a token (and for any FloodWait pause) before an API call"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.calls += 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        """Additive increase after a call that was not throttled"""
+        self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_flood_wait(self, seconds):
+        """Multiplicative decrease and a global pause after a FloodWait"""
+        now = time.monotonic()
+        # Requests already in flight report the same FloodWait; back off once per pause
+        if now >= self.blocked_until:
+            self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0.0
+        self.flood_waits += 1
+        self.flood_wait_seconds += seconds
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'rate_per_sec': round(self.rate, 2),
+            'flood_waits': self.flood_waits,
+            'flood_wait_seconds': self.flood_wait_seconds,
+        }
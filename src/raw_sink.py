@@ -0,0 +1,202 @@
+"""
+Streaming raw data lake writers used by the scraper.
+
+Messages are appended to data/raw/telegram_messages/<date>/<channel>.jsonl.part
+in chunks; each flush is fsynced before the scraper advances its checkpoint.
+When the channel finishes the part file is renamed to <channel>.jsonl (or
+<channel>.<n>.jsonl when that name is taken), so the loader - which only
+picks up .json/.jsonl/.parquet - never sees a half-written file. Memory is
+bounded by the chunk size, not by the history depth.
+
+A long-lived sink (the streaming mode keeps one per channel across polls)
+keeps appending to the same part file and only rotates it - publishing it
+and starting a new one - once it reaches rotate_bytes or the day changes.
+"""
+
+import glob
+import json
+import logging
+import os
+from datetime import datetime
+
+from scrape_checkpoints import fsync_dir
+
+logger = logging.getLogger(__name__)
+
+RAW_DATA_DIR = 'data/raw/telegram_messages'
+PART_SUFFIX = '.part'
+
+# Part file size at which a long-lived sink publishes it and starts a new one
+ROTATE_BYTES = int(os.getenv('RAW_JSONL_ROTATE_BYTES', str(64 << 20)))
+
+
+def final_path(output_dir, channel_name, ext='.jsonl'):
+    """First free <channel><ext>, <channel>.1<ext>, ... in output_dir"""
+    file_path = os.path.join(output_dir, f"{channel_name}{ext}")
+    n = 1
+    while os.path.exists(file_path):
+        file_path = os.path.join(output_dir, f"{channel_name}.{n}{ext}")
+        n += 1
+    return file_path
+
+
+def publish_part(part_path):
+    """Rename a finished part file to its final name (or drop it if empty)"""
+    output_dir = os.path.dirname(part_path)
+    if os.path.getsize(part_path) == 0:
+        os.remove(part_path)
+        return None
+    channel_name = os.path.basename(part_path)[:-len('.jsonl' + PART_SUFFIX)]
+    file_path = final_path(output_dir, channel_name)
+    os.replace(part_path, file_path)
+    fsync_dir(output_dir)
+    return file_path
+
+
+def recover_parts(channel_name, base_dir=RAW_DATA_DIR):
+    """
+    Publish part files left behind by a crashed run.
+
+    A torn last line (written but never flushed) is cut off; everything
+    before it is complete JSONL. Rows past the checkpoint are simply
+    scraped again and deduplicated by the loader's upsert.
+    """
+    recovered = []
+    for part_path in glob.glob(os.path.join(base_dir, '*', f"{channel_name}.jsonl{PART_SUFFIX}")):
+        with open(part_path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            start = data.rfind(b'\n', 0, end - 1) + 1
+            try:
+                json.loads(data[start:end])
+            except ValueError:
+                end = start
+            f.truncate(end)
+        file_path = publish_part(part_path)
+        if file_path:
+            logger.info(f"Recovered partial file {part_path} -> {file_path}")
+            recovered.append(file_path)
+    return recovered
+
+
+class JsonlSink:
+    """Chunked, fsynced JSONL writer for one channel's run"""
+
+    def __init__(self, channel_name, date_str=None, base_dir=RAW_DATA_DIR, rotate_bytes=ROTATE_BYTES):
+        self.channel_name = channel_name
+        self.base_dir = base_dir
+        self.rotate_bytes = rotate_bytes
+        # A fixed date_str pins the partition; otherwise it follows the clock
+        self.fixed_date = date_str
+        self.buffer = []
+        self.file = None
+        self.file_path = None
+        self.published = []
+        self.open_part(date_str or today())
+
+    def open_part(self, date_str):
+        self.date_str = date_str
+        output_dir = os.path.join(self.base_dir, date_str)
+        os.makedirs(output_dir, exist_ok=True)
+        self.part_path = os.path.join(output_dir, f"{self.channel_name}.jsonl{PART_SUFFIX}")
+        self.file = open(self.part_path, 'a', encoding='utf-8')
+
+    @property
+    def pending(self):
+        return len(self.buffer)
+
+    def write(self, record):
+        self.buffer.append(record)
+
+    def flush(self):
+        """Append and fsync buffered records; returns how many were written"""
+        if not self.buffer:
+            return 0
+        if self.fixed_date is None and today() != self.date_str:
+            self.rotate(today())
+        self.file.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in self.buffer))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        written = len(self.buffer)
+        self.buffer = []
+        if self.file.tell() >= self.rotate_bytes:
+            self.rotate(self.date_str)
+        return written
+
+    def publish(self):
+        """Close the part file and atomically publish it under its final name"""
+        self.file.close()
+        self.file_path = publish_part(self.part_path)
+        if self.file_path:
+            logger.info(f"Saved {self.file_path}")
+            self.published.append(self.file_path)
+        return self.file_path
+
+    def rotate(self, date_str):
+        """Publish the current part and continue in a fresh one for date_str"""
+        self.publish()
+        self.open_part(date_str)
+
+    def close(self):
+        """Flush and publish the part file"""
+        self.flush()
+        return self.publish()
+
+
+def today():
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+class ParquetSink:
+    """Writes each flushed chunk as its own file in the Parquet raw layer"""
+
+    def __init__(self, channel_name, date_str=None, base_dir=None):
+        from parquet_lake import PARQUET_DIR
+
+        self.channel_name = channel_name
+        self.date_str = date_str
+        self.base_dir = base_dir or PARQUET_DIR
+        self.buffer = []
+
+    @property
+    def pending(self):
+        return len(self.buffer)
+
+    def write(self, record):
+        self.buffer.append(record)
+
+    def flush(self):
+        from parquet_lake import write_messages_parquet
+
+        if not self.buffer:
+            return 0
+        file_path = write_messages_parquet(self.buffer, self.channel_name, self.date_str, self.base_dir)
+        logger.info(f"Saved {len(self.buffer)} messages to {file_path}")
+        written = len(self.buffer)
+        self.buffer = []
+        return written
+
+    def close(self):
+        self.flush()
+
+
+class TeeSink:
+    """Fan every record out to several sinks"""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    @property
+    def pending(self):
+        return max(sink.pending for sink in self.sinks)
+
+    def write(self, record):
+        for sink in self.sinks:
+            sink.write(record)
+
+    def flush(self):
+        return max(sink.flush() for sink in self.sinks)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
@@ -0,0 +1,74 @@
+"""
+Per-channel high-water marks for incremental scraping.
+
+The store is a small JSON file mapping channel -> highest message_id that
+is already safely in the raw data lake. It is rewritten atomically
+(temp file + fsync + rename) so a crash leaves either the old or the new
+marks, never a truncated file.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+CHECKPOINT_PATH = "data/raw/scrape_checkpoints.json"
+
+
+def fsync_file(file_path):
+    """Flush a finished file to stable storage"""
+    with open(file_path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+def fsync_dir(dir_path):
+    """Persist a rename inside dir_path (no-op where directories can't be opened)"""
+    try:
+        fd = os.open(dir_path or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(data, file_path, **dump_kwargs):
+    """Write JSON to a temp file, fsync it and rename it over file_path"""
+    dir_path = os.path.dirname(file_path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+    fsync_dir(dir_path)
+
+
+class CheckpointStore:
+    def __init__(self, path=CHECKPOINT_PATH):
+        self.path = path
+        self.marks = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.marks = json.load(f)
+
+    def get(self, channel):
+        """Highest message_id already on disk for channel, or None"""
+        entry = self.marks.get(channel)
+        return entry['last_message_id'] if entry else None
+
+    def advance(self, channel, message_id):
+        """Move channel's mark up to message_id (never down) and persist it"""
+        current = self.get(channel)
+        if current is not None and message_id <= current:
+            return current
+        self.marks[channel] = {
+            'last_message_id': message_id,
+            'updated_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        atomic_write_json(self.marks, self.path, indent=2, sort_keys=True)
+        return message_id
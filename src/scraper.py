@@ -1,16 +1,23 @@
 import asyncio
-import json
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 from telethon import TelegramClient
+from telethon.errors import FloodWaitError
 from telethon.tl.types import MessageMediaPhoto
 import logging
 from dotenv import load_dotenv
 
+from media_store import MediaDownloader
+from rate_limiter import AdaptiveRateLimiter
+from raw_sink import JsonlSink, ParquetSink, TeeSink, recover_parts
+from scrape_checkpoints import CheckpointStore
+
 # Load environment variables
 load_dotenv()
 
 # Setup logging
+os.makedirs('logs', exist_ok=True)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -21,50 +28,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class TelegramScraper:
-    def __init__(self):
-        self.api_id = int(os.getenv('TELEGRAM_API_ID'))
-        self.api_hash = os.getenv('TELEGRAM_API_HASH')
-        self.client = None
-        
-    async def start_client(self):
-        """Initialize Telegram client"""
-        self.client = TelegramClient('scraper_session', self.api_id, self.api_hash)
-        await self.client.start()
-        logger.info("Telegram client started successfully")
-        
-    async def scrape_channel(self, channel_username, limit=10):
-        """Scrape messages from a channel"""
-        messages_data = []
-        
-        try:
-    
-   async def scrape_channel(self, channel_username, limit=50):
-    """Scrape messages from a channel with detailed logging"""
-    messages_data = []
-    
-    try:
-        logger.info(f"START scraping channel: {channel_username}", extra={'channel': channel_username})
-        
-        async for message in self.client.iter_messages(channel_username, limit=limit):
-            # ... existing message processing code ...
-            
-        logger.info(f"COMPLETE scraped {len(messages_data)} messages from {channel_username}", 
-                   extra={'channel': channel_username})
-        
-    except Exception as e:
-        error_type = type(e).__name__
-        logger.error(f"FAILED scraping {channel_username}: {error_type} - {str(e)}", 
-                    extra={'channel': channel_username})
-        
-    return messages_data
-    
-    async def run_scraping(self):
-        """Main scraping function"""
-        await self.start_client()
-        
-        # Channels to scrape
-    channels = [
+IMAGE_DIR = 'data/raw/images'
+
+# Raw layer format: json (default), parquet, or both
+RAW_FORMAT = os.getenv('RAW_FORMAT', 'json').lower()
+
+# Channels scraped at the same time, and messages requested per API call
+SCRAPE_CONCURRENCY = int(os.getenv('SCRAPE_CONCURRENCY', '3'))
+PAGE_SIZE = 100
+
+# Messages buffered per channel before a fsynced flush + checkpoint
+CHUNK_SIZE = int(os.getenv('SCRAPE_CHUNK_SIZE', '1000'))
+
+# A request gives up (failing its channel, which resumes from its checkpoint
+# next run) after this many FloodWaits or this many seconds of waiting
+MAX_FLOOD_RETRIES = int(os.getenv('SCRAPE_MAX_FLOOD_RETRIES', '5'))
+MAX_FLOOD_WAIT = float(os.getenv('SCRAPE_MAX_FLOOD_WAIT', '600'))
+
+# Channels to scrape
+CHANNELS = [
     'lobelia4cosmetics',    # Existing
     'tikvahpharma',         # Existing
     'CheMed123',            # Missing - Add this
@@ -72,20 +54,291 @@ class TelegramScraper:
     'pharmacyaddis',        # Ethiopian channel
     'addispharmacy'         # Ethiopian channel
 ]
-        
-        for channel in channels:
+
+
+class TelegramScraper:
+    def __init__(self, client=None, concurrency=SCRAPE_CONCURRENCY, limiter=None, page_size=PAGE_SIZE,
+                 checkpoints=None, chunk_size=CHUNK_SIZE, stream=None, media_limiter=None,
+                 max_flood_retries=MAX_FLOOD_RETRIES, max_flood_wait=MAX_FLOOD_WAIT, keep_sinks=False):
+        # client can be any object with the Telethon calls used here (e.g. a fake for tests)
+        self.client = client
+        self.concurrency = concurrency
+        self.limiter = limiter or AdaptiveRateLimiter()
+        # Photo transfers get their own budget so they don't starve message paging
+        self.media_limiter = media_limiter or AdaptiveRateLimiter(rate=10.0, max_rate=100.0, burst=10)
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+        self.max_flood_retries = max_flood_retries
+        self.max_flood_wait = max_flood_wait
+        self.checkpoints = checkpoints or CheckpointStore()
+        # Optional consumer (e.g. stream_to_warehouse.WarehouseWriter) fed each durable chunk
+        self.stream = stream
+        # Keep each channel's sink open across scrape_all() calls (streaming
+        # mode) so polls append to one file instead of publishing one each
+        self.keep_sinks = keep_sinks
+        self.sinks = {}
+        self.media = MediaDownloader(self.download_photo)
+        self.pending_media = {}
+        # Lowest message_id per channel whose photo failed this run; the
+        # checkpoint stays below it so the next run retries the photo
+        self.failed_media = {}
+        self.channel_stats = {}
+
+    async def start_client(self):
+        """Initialize Telegram client"""
+        if self.client is None:
+            api_id = int(os.getenv('TELEGRAM_API_ID'))
+            api_hash = os.getenv('TELEGRAM_API_HASH')
+            self.client = TelegramClient('scraper_session', api_id, api_hash)
+        await self.client.start()
+        logger.info("Telegram client started successfully")
+
+    async def call_api(self, method, *args, limiter=None, **kwargs):
+        """
+        Run one Telegram request through a shared limiter, retrying after
+        FloodWait up to max_flood_retries times / max_flood_wait seconds in
+        total; past that the FloodWaitError propagates to the channel.
+        """
+        limiter = limiter or self.limiter
+        retries = 0
+        waited = 0
+        while True:
+            await limiter.acquire()
+            try:
+                result = await method(*args, **kwargs)
+            except FloodWaitError as e:
+                limiter.on_flood_wait(e.seconds)
+                retries += 1
+                waited += e.seconds
+                if retries > self.max_flood_retries or waited > self.max_flood_wait:
+                    logger.warning(f"FloodWait {e.seconds}s on {method.__name__}: giving up after "
+                                   f"{retries} FloodWaits ({waited}s)")
+                    raise
+                logger.warning(f"FloodWait {e.seconds}s on {method.__name__}, "
+                               f"rate now {limiter.rate:.2f} req/s")
+                continue
+            limiter.on_success()
+            return result
+
+    async def download_photo(self, message):
+        """Photo bytes for a message (runs in the media worker pool)"""
+        return await self.call_api(self.client.download_media, message, file=bytes, limiter=self.media_limiter)
+
+    async def fetch_pages(self, channel_username, limit, min_id):
+        """Yield pages of messages above min_id, oldest first, at most `limit` in total"""
+        fetched = 0
+        offset_id = min_id
+        while limit is None or fetched < limit:
+            page_limit = self.page_size if limit is None else min(self.page_size, limit - fetched)
+            page = await self.call_api(self.client.get_messages, channel_username,
+                                       limit=page_limit, offset_id=offset_id,
+                                       min_id=min_id, reverse=True)
+            if not page:
+                return
+            yield page
+            fetched += len(page)
+            offset_id = page[-1].id
+
+    async def start_mark(self, channel_username, limit):
+        """
+        Where a run starts: the channel's checkpoint, or - on the first run -
+        `limit` ids below the newest post, so the backfill also runs oldest
+        first and can be checkpointed (and resumed) chunk by chunk.
+        """
+        mark = self.checkpoints.get(channel_username)
+        if mark is not None:
+            return mark, False
+        latest = await self.call_api(self.client.get_messages, channel_username, limit=1)
+        if not latest:
+            return None, True
+        return max(0, latest[0].id - limit), True
+
+    def open_sink(self, channel_username):
+        """Streaming sink(s) for the configured raw format(s)"""
+        if channel_username in self.sinks:
+            return self.sinks[channel_username]
+        sinks = []
+        if RAW_FORMAT in ('json', 'both'):
+            recover_parts(channel_username)
+            sinks.append(JsonlSink(channel_username))
+        if RAW_FORMAT in ('parquet', 'both'):
+            sinks.append(ParquetSink(channel_username))
+        sink = sinks[0] if len(sinks) == 1 else TeeSink(sinks)
+        if self.keep_sinks:
+            self.sinks[channel_username] = sink
+        return sink
+
+    def close_sinks(self):
+        """Publish the sinks kept open across polls"""
+        for sink in self.sinks.values():
+            sink.close()
+        self.sinks = {}
+
+    async def commit(self, channel_username, sink, batch, last_id):
+        """
+        Make the buffered chunk durable, then advance the checkpoint and hand
+        the chunk to the stream consumer, if any.
+
+        Photos queued for the chunk are waited for first, so the mark never
+        moves past a message whose image is not stored yet: after a failed
+        download it stops below that message for the rest of the run.
+        """
+        pending = self.pending_media.pop(channel_username, [])
+        results = await asyncio.gather(*(future for _, future in pending), return_exceptions=True)
+        for (message_id, _), result in zip(pending, results):
+            if isinstance(result, Exception):
+                self.failed_media[channel_username] = min(message_id,
+                                                          self.failed_media.get(channel_username, message_id))
+        if not batch:
+            return
+        sink.flush()
+        first_failed = self.failed_media.get(channel_username)
+        if first_failed is not None:
+            last_id = max((record['message_id'] for record in batch if record['message_id'] < first_failed),
+                          default=None)
+            logger.warning(f"HOLD checkpoint of {channel_username} below message {first_failed}, "
+                           f"whose photo failed to download", extra={'channel': channel_username})
+        if last_id is not None:
+            self.checkpoints.advance(channel_username, last_id)
+        if self.stream is not None:
+            await self.stream.put(list(batch))
+        batch.clear()
+
+    async def scrape_channel(self, channel_username, limit=50, max_new=None):
+        """
+        Stream a channel into the raw data lake with detailed logging.
+
+        The first run backfills roughly the newest `limit` messages; later
+        runs only fetch posts above the channel's checkpoint (at most
+        max_new of them). Messages are flushed every chunk_size records, so
+        memory stays constant however deep the history is.
+        """
+        count = 0
+        started = time.perf_counter()
+        pages = 0
+        sink = None
+        batch = []
+        last_id = None
+        self.failed_media.pop(channel_username, None)
+
+        try:
+            mark, backfill = await self.start_mark(channel_username, limit)
+            if mark is None:
+                logger.info(f"SKIP {channel_username}: no messages", extra={'channel': channel_username})
+            else:
+                logger.info(f"START scraping channel: {channel_username} "
+                            f"({'backfill' if backfill else 'new'} since {mark})",
+                            extra={'channel': channel_username})
+
+                async for page in self.fetch_pages(channel_username, None if backfill else max_new, mark):
+                    pages += 1
+                    if sink is None:
+                        sink = self.open_sink(channel_username)
+                    for message in page:
+                        record = await self.process_message(message, channel_username)
+                        sink.write(record)
+                        batch.append(record)
+                        last_id = message.id
+                        count += 1
+                        if len(batch) >= self.chunk_size:
+                            await self.commit(channel_username, sink, batch, last_id)
+
+                logger.info(f"COMPLETE scraped {count} messages from {channel_username}",
+                            extra={'channel': channel_username})
+
+        except Exception as e:
+            error_type = type(e).__name__
+            logger.error(f"FAILED scraping {channel_username}: {error_type} - {str(e)}",
+                         extra={'channel': channel_username})
+
+        finally:
+            # Keep whatever was scraped before a failure
+            if sink is not None:
+                await self.commit(channel_username, sink, batch, last_id)
+                if not self.keep_sinks:
+                    sink.close()
+
+        elapsed = time.perf_counter() - started
+        self.channel_stats[channel_username] = {
+            'messages': count,
+            'pages': pages,
+            'seconds': round(elapsed, 3),
+            'messages_per_sec': round(count / elapsed, 2) if elapsed else 0.0,
+        }
+        return count
+
+    async def process_message(self, message, channel_username):
+        """Convert a Telethon message into a raw data lake record, queueing its photo"""
+        has_media = isinstance(message.media, MessageMediaPhoto)
+        image_path = None
+
+        if has_media:
+            date_str = message.date.strftime('%Y-%m-%d')
+            image_path = f"{IMAGE_DIR}/{channel_username}/{date_str}/{message.id}.jpg"
+            future = await self.media.submit(message, channel_username, image_path)
+            self.pending_media.setdefault(channel_username, []).append((message.id, future))
+
+        return {
+            'message_id': message.id,
+            'channel_name': channel_username,
+            'message_date': message.date.isoformat(),
+            'message_text': message.text or '',
+            'has_media': has_media,
+            'views': message.views or 0,
+            'forwards': message.forwards or 0,
+            'image_path': image_path,
+            # Same format as SQLite's CURRENT_TIMESTAMP
+            'scraped_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    async def scrape_and_save(self, channel, semaphore, limit, max_new):
+        """Scrape one channel while holding a concurrency slot"""
+        async with semaphore:
             logger.info(f"Starting to scrape: {channel}")
-            messages = await self.scrape_channel(channel, limit=10)  # Start with 10
-            if messages:
-                self.save_to_json(messages, channel)
-            await asyncio.sleep(2)  # Avoid rate limiting
-        
+            return await self.scrape_channel(channel, limit=limit, max_new=max_new)
+
+    def log_throughput(self, elapsed):
+        """Log the throughput each channel actually achieved"""
+        for channel, stats in self.channel_stats.items():
+            logger.info(f"THROUGHPUT {channel}: {stats['messages']} messages in {stats['seconds']}s "
+                        f"({stats['messages_per_sec']} msgs/sec, {stats['pages']} pages)")
+        total = sum(stats['messages'] for stats in self.channel_stats.values())
+        logger.info(f"THROUGHPUT total: {total} messages in {elapsed:.2f}s "
+                    f"({total / elapsed if elapsed else 0:.2f} msgs/sec), limiter {self.limiter.stats()}")
+        media = self.media.stats
+        logger.info(f"MEDIA {media['downloaded']} photos, {media['unique']} unique, "
+                    f"{media['duplicates']} duplicates, {media['failed']} failed, "
+                    f"{media['bytes'] / elapsed / 1e6 if elapsed else 0:.2f} MB/sec, "
+                    f"limiter {self.media_limiter.stats()}")
+
+    async def scrape_all(self, channels=None, limit=10, max_new=None):
+        """
+        Scrape channels concurrently under a bounded semaphore.
+
+        limit caps the first backfill of a channel, max_new caps how many
+        new posts a checkpointed channel fetches per run (None = all).
+        """
+        started = time.perf_counter()
+        self.channel_stats = {}
+        self.media.start()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self.scrape_and_save(channel, semaphore, limit, max_new)
+                               for channel in (channels or CHANNELS)))
+        await self.media.close()
+        self.log_throughput(time.perf_counter() - started)
+        return self.channel_stats
+
+    async def run_scraping(self, channels=None, limit=10, max_new=None):
+        """Main scraping function"""
+        await self.start_client()
+        stats = await self.scrape_all(channels, limit, max_new)
         await self.client.disconnect()
         logger.info("Scraping completed!")
+        return stats
 
 async def main():
     scraper = TelegramScraper()
     await scraper.run_scraping()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,208 @@
+"""
+Near-real-time mode: scrape straight into the warehouse.
+
+Instead of scraper -> JSON files -> load_to_sqlite.py in separate
+processes, the scraper polls every channel for posts above its checkpoint
+and hands each durable chunk to an asyncio queue. A single writer task
+upserts the chunks into raw_telegram_messages in batches, so new posts are
+queryable a few seconds after they are published. The chunks are still
+written to the JSONL data lake first, so the batch loader can replay them;
+each channel appends to one part file that is rotated by size or day.
+
+    python src/stream_to_warehouse.py --poll-interval 5
+"""
+
+import argparse
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from load_to_sqlite import (DB_PATH, DEFAULT_BATCH_SIZE, UPSERT_SQL, apply_bulk_pragmas, bump_generation,
+                            create_indexes, ensure_schema, message_to_row)
+from product_extraction import update_product_mentions
+from scraper import CHANNELS, TelegramScraper
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 5.0
+
+# Chunks that may wait for the writer before the scraper is slowed down
+STREAM_QUEUE_SIZE = 16
+
+
+class WriterStopped(RuntimeError):
+    """The writer task ended while the scraper was still producing"""
+
+    def __init__(self, task):
+        reason = "cancelled" if task.cancelled() else repr(task.exception())
+        super().__init__(f"Warehouse writer stopped ({reason})")
+
+
+def publish_lag(records):
+    """Seconds between the newest post's publication and now, if its date parses"""
+    try:
+        newest = max(datetime.fromisoformat(m['message_date']) for m in records)
+        return (datetime.now(timezone.utc) - newest).total_seconds()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class WarehouseWriter:
+    """
+    Batched SQLite writer fed through an asyncio queue.
+
+    Chunks already waiting in the queue are coalesced into one transaction
+    (up to max_batch_rows). The connection lives on one dedicated thread so
+    the event loop never blocks on disk I/O.
+    """
+
+    def __init__(self, db_path=DB_PATH, max_batch_rows=DEFAULT_BATCH_SIZE, queue_size=STREAM_QUEUE_SIZE):
+        self.db_path = db_path
+        self.max_batch_rows = max_batch_rows
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='warehouse-writer')
+        self.conn = None
+        self.task = None
+        self.stats = {'batches': 0, 'rows': 0, 'skipped_rows': 0, 'failed_batches': 0, 'write_seconds': 0.0}
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def put(self, records):
+        """
+        Queue a chunk for the writer. Raises WriterStopped instead of
+        blocking forever on a full queue once the writer task has died.
+        """
+        if self.task.done():
+            raise WriterStopped(self.task)
+        put = asyncio.ensure_future(self.queue.put(records))
+        await asyncio.wait({put, self.task}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            raise WriterStopped(self.task)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.connect)
+        done = False
+        while not done:
+            records = await self.queue.get()
+            if records is None:
+                break
+            batch = list(records)
+            while len(batch) < self.max_batch_rows and not self.queue.empty():
+                more = self.queue.get_nowait()
+                if more is None:
+                    done = True
+                    break
+                batch.extend(more)
+            try:
+                await loop.run_in_executor(self.executor, self.write, batch)
+            except Exception as e:
+                # The chunk is already in the data lake; load_to_sqlite.py replays it
+                self.stats['failed_batches'] += 1
+                logger.error(f"FAILED warehouse write of {len(batch)} rows: {type(e).__name__} - {e}")
+
+    def connect(self):
+        self.conn = sqlite3.connect(self.db_path)
+        apply_bulk_pragmas(self.conn)
+        ensure_schema(self.conn)
+        create_indexes(self.conn)
+
+    def write(self, records):
+        started = time.perf_counter()
+        rows = []
+        for message in records:
+            try:
+                rows.append(message_to_row(message))
+            except (KeyError, TypeError, ValueError) as e:
+                self.stats['skipped_rows'] += 1
+                logger.warning(f"SKIPPED malformed message {str(message)[:200]}: {type(e).__name__} - {e}")
+        with self.conn:
+            self.conn.executemany(UPSERT_SQL, rows)
+            update_product_mentions(self.conn)
+            bump_generation(self.conn)
+        elapsed = time.perf_counter() - started
+
+        self.stats['batches'] += 1
+        self.stats['rows'] += len(rows)
+        self.stats['write_seconds'] += elapsed
+        lag = publish_lag(records)
+        logger.info(f"WAREHOUSE upserted {len(rows)} rows in {elapsed * 1000:.1f}ms"
+                    + (f", newest post queryable {lag:.1f}s after publishing" if lag is not None else ""))
+
+    async def close(self):
+        """Drain the queue, then close the connection"""
+        if not self.task.done():
+            await self.queue.put(None)
+        await self.task
+        loop = asyncio.get_running_loop()
+        if self.conn is not None:
+            await loop.run_in_executor(self.executor, self.conn.close)
+        self.executor.shutdown()
+
+
+async def stream(channels=None, db_path=DB_PATH, poll_interval=DEFAULT_POLL_INTERVAL, limit=10,
+                 once=False, client=None):
+    """
+    Poll channels and stream new posts into the warehouse until cancelled.
+
+    If the writer task dies, polling is cancelled and its error re-raised
+    rather than leaving the scraper blocked on the queue.
+    """
+    writer = WarehouseWriter(db_path)
+    scraper = TelegramScraper(client=client, stream=writer, keep_sinks=True)
+    writer.start()
+    await scraper.start_client()
+    polling = asyncio.ensure_future(poll(scraper, channels, poll_interval, limit, once))
+    try:
+        await asyncio.wait({polling, writer.task}, return_when=asyncio.FIRST_COMPLETED)
+        if not polling.done():
+            logger.error("Warehouse writer stopped; cancelling the scraper")
+            polling.cancel()
+        await asyncio.gather(polling, return_exceptions=True)
+        if not polling.cancelled() and polling.exception() is not None:
+            raise polling.exception()
+    finally:
+        if not polling.done():
+            polling.cancel()
+            await asyncio.gather(polling, return_exceptions=True)
+        scraper.close_sinks()
+        await scraper.client.disconnect()
+        try:
+            await writer.close()
+        finally:
+            logger.info(f"Streaming stopped: {writer.stats}")
+    return writer.stats
+
+
+async def poll(scraper, channels, poll_interval, limit, once):
+    while True:
+        started = time.perf_counter()
+        await scraper.scrape_all(channels, limit=limit)
+        if once:
+            return
+        await asyncio.sleep(max(0.0, poll_interval - (time.perf_counter() - started)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stream Telegram posts straight into the warehouse")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database path")
+    parser.add_argument("--channels", help="Comma-separated channels (default: scraper CHANNELS)")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds between polls of every channel")
+    parser.add_argument("--limit", type=int, default=10, help="Backfill size for channels without a checkpoint")
+    parser.add_argument("--once", action="store_true", help="Poll once and exit")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        asyncio.run(stream(args.channels.split(',') if args.channels else CHANNELS, args.db,
+                           args.poll_interval, args.limit, args.once))
+    except KeyboardInterrupt:
+        pass
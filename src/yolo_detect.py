@@ -1,28 +1,320 @@
 """
 YOLO Image Detection for Medical Telegram Images
-Simplified version that works without complex dependencies
+
+Runs a YOLOv8 model on the CPU over data/raw/images/<channel>/<date>/<id>.jpg
+and upserts one row per image into raw_yolo_detections (raw.yolo_detections
+on PostgreSQL), the source of fct_image_detections; --output also exports
+them to CSV. The model is loaded
+once and images are inferred in batches. Results are cached by image
+hash and model version (detection_cache.py), so only new images are
+inferred, and near-duplicate reposts reuse the detections of their
+cluster representative (image_dedup.py); the clusters themselves are
+upserted into raw_image_clusters for analytics. --backend onnx / onnx-int8
+runs an exported model in ONNX Runtime instead of torch (onnx_detect.py).
+--simulate keeps the old rule-based output for tests and machines
+without ultralytics.
 """
 
+import argparse
 import os
-import pandas as pd
-import json
+import time
 from datetime import datetime
 
-def simulate_yolo_detection():
+import pandas as pd
+
+from detection_cache import CACHE_PATH, DetectionCache, model_version
+from detection_sink import write_clusters, write_detections
+from image_dedup import DEFAULT_THRESHOLD, assign_clusters
+from image_prefetch import BatchPrefetcher, StageTimers
+from load_to_sqlite import DB_PATH
+
+IMAGE_DIR = "data/raw/images"
+OUTPUT_PATH = 'data/processed/yolo_detections.csv'
+USE_POSTGRES = os.getenv('USE_POSTGRES', 'false').lower() == 'true'
+CLUSTERS_PATH = 'data/processed/image_duplicate_clusters.csv'
+MODEL_PATH = os.getenv('YOLO_MODEL', 'yolov8n.pt')
+
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_THREADS = int(os.getenv('YOLO_THREADS', str(os.cpu_count() or 1)))
+# Threads decoding and letterboxing the next batch during inference
+DEFAULT_PREFETCH_WORKERS = int(os.getenv('YOLO_PREFETCH_WORKERS', '4'))
+CONFIDENCE_THRESHOLD = 0.25
+IMAGE_SIZE = 640
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+DEFAULT_BACKEND = os.getenv('YOLO_BACKEND', 'torch')
+
+# Newly inferred images saved to the detection cache at a time
+CACHE_COMMIT_EVERY = 256
+
+IMAGE_SUFFIXES = ('.jpg', '.png', '.jpeg')
+DETECTION_COLUMNS = ['message_id', 'channel_name', 'detected_class', 'confidence_score',
+                     'image_category', 'analysis_timestamp']
+
+# Directories under IMAGE_DIR that are not channels (the scraper's content-addressed store)
+SKIP_DIRS = {'by_hash'}
+
+# COCO classes that count as a product in a pharmacy / cosmetics post
+PRODUCT_CLASSES = {'bottle', 'cup', 'bowl', 'wine glass', 'vase', 'toothbrush', 'hair drier',
+                   'scissors', 'cell phone', 'book', 'handbag', 'backpack', 'suitcase'}
+
+
+def categorize(classes):
+    """Map detected COCO classes to an api.schemas.ImageCategory value"""
+    has_person = 'person' in classes
+    has_product = bool(PRODUCT_CLASSES.intersection(classes))
+    if has_person and has_product:
+        return 'promotional'
+    if has_product:
+        return 'product_display'
+    if has_person:
+        return 'lifestyle'
+    return 'other'
+
+
+def iter_images(image_dir=IMAGE_DIR):
+    """Yield (channel_name, message_id, path) for every image, in a stable order"""
+    for channel in sorted(os.listdir(image_dir)):
+        channel_path = os.path.join(image_dir, channel)
+        if channel in SKIP_DIRS or not os.path.isdir(channel_path):
+            continue
+        for date_folder in sorted(os.listdir(channel_path)):
+            date_path = os.path.join(channel_path, date_folder)
+            if not os.path.isdir(date_path):
+                continue
+            for image_file in sorted(os.listdir(date_path)):
+                stem = image_file.split('.')[0]
+                if image_file.endswith(IMAGE_SUFFIXES) and stem.isdigit():
+                    yield channel, int(stem), os.path.join(date_path, image_file)
+
+
+def detection_row(channel_name, message_id, detections, timestamp=None):
+    """
+    One CSV row per image: the most confident detection and the image category.
+
+    detections is a list of (class_name, confidence); images without any
+    detection get detected_class None and category 'other'.
+    """
+    if detections:
+        detected_class, confidence = max(detections, key=lambda d: d[1])
+    else:
+        detected_class, confidence = None, 0.0
+    return {
+        'message_id': message_id,
+        'channel_name': channel_name,
+        'detected_class': detected_class,
+        'confidence_score': round(confidence, 4),
+        'image_category': categorize({name for name, _ in detections}),
+        'analysis_timestamp': timestamp or datetime.now().isoformat(),
+    }
+
+
+def backend_version(model_path, backend='torch', conf=CONFIDENCE_THRESHOLD, imgsz=IMAGE_SIZE):
+    """Cache key of a model run through backend (torch keys predate the other backends)"""
+    settings = [conf, imgsz] + ([backend] if backend != 'torch' else [])
+    return model_version(model_path, *settings)
+
+
+class YoloEngine:
     """
-    Simulate YOLO detection for project requirements.
-    In production, this would use ultralytics.YOLO model.
+    A YOLO model loaded once and run on the CPU in fixed-size batches.
+
+    ultralytics (and torch) are imported here so the simulated path and
+    the rest of the pipeline work without them.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, batch_size=DEFAULT_BATCH_SIZE, threads=DEFAULT_THREADS,
+                 conf=CONFIDENCE_THRESHOLD, imgsz=IMAGE_SIZE, prefetch_workers=DEFAULT_PREFETCH_WORKERS):
+        import torch
+        from ultralytics import YOLO
+
+        torch.set_num_threads(threads)
+        self.torch = torch
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+        self.model_version = backend_version(model_path, 'torch', conf, imgsz)
+        self.batch_size = batch_size
+        self.conf = conf
+        self.imgsz = imgsz
+        self.prefetch_workers = prefetch_workers
+        self.timers = StageTimers()
+
+    def boxes_to_detections(self, results):
+        return [
+            [(self.names[int(c)], float(p)) for c, p in zip(r.boxes.cls.tolist(), r.boxes.conf.tolist())]
+            for r in results
+        ]
+
+    def detect(self, images):
+        """Detections for a list of decoded BGR images (one model call)"""
+        results = self.model.predict(images, imgsz=self.imgsz, conf=self.conf, device='cpu', verbose=False)
+        return self.boxes_to_detections(results)
+
+    def detect_batch(self, batch):
+        """Detections for a letterboxed (n, imgsz, imgsz, 3) RGB uint8 batch"""
+        tensor = self.torch.from_numpy(batch).permute(0, 3, 1, 2).float().div_(255).contiguous()
+        results = self.model.predict(tensor, imgsz=self.imgsz, conf=self.conf, device='cpu', verbose=False)
+        return self.boxes_to_detections(results)
+
+    def detect_paths(self, paths):
+        """Detect image files, decoding the next batch while the current one is inferred"""
+        detections = []
+        prefetcher = BatchPrefetcher(paths, self.batch_size, self.imgsz, self.prefetch_workers,
+                                     timers=self.timers)
+        for batch_paths, batch, ok in prefetcher:
+            started = time.perf_counter()
+            found = iter(self.detect_batch(batch)) if len(batch) else iter(())
+            self.timers.add_batch(time.perf_counter() - started)
+            detections.extend(next(found) if flag else [] for flag in ok)
+        return detections
+
+
+def load_engine(backend=DEFAULT_BACKEND, model_path=MODEL_PATH, batch_size=DEFAULT_BATCH_SIZE,
+                threads=DEFAULT_THREADS, prefetch_workers=DEFAULT_PREFETCH_WORKERS):
+    """A detection engine for one of BACKENDS"""
+    if backend == 'torch':
+        return YoloEngine(model_path, batch_size, threads, prefetch_workers=prefetch_workers)
+    if backend in ('onnx', 'onnx-int8'):
+        from onnx_detect import OnnxYoloEngine
+
+        return OnnxYoloEngine(model_path, batch_size, threads, prefetch_workers=prefetch_workers,
+                              quantize=backend == 'onnx-int8')
+    raise ValueError(f"Unknown detection backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+
+def save_detections(results_df, output_path=None, db_path=DB_PATH, postgres=USE_POSTGRES):
+    """Upsert detections into the warehouse, optionally export them to CSV, and print a summary"""
+    write_detections(results_df, db_path, postgres)
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        results_df.to_csv(output_path, index=False)
+        print(f"✅ Saved {len(results_df)} detections to {output_path}")
+
+    # Print summary
+    print("\n=== Detection Summary ===")
+    print(f"Total images analyzed: {len(results_df)}")
+    if not results_df.empty:
+        print("\nBy category:")
+        print(results_df['image_category'].value_counts())
+        print("\nBy channel:")
+        print(results_df['channel_name'].value_counts())
+
+
+def save_clusters(images, hashes, clusters, threshold, output_path=None, db_path=DB_PATH, postgres=USE_POSTGRES):
+    """
+    Upsert every image's near-duplicate cluster (the representative's
+    sha256) into the warehouse, optionally exporting it to CSV too.
+    """
+    rows = []
+    for (channel, message_id, _), sha256 in zip(images, hashes):
+        representative, distance = clusters.get(sha256, (sha256, 0))
+        rows.append((int(message_id), channel, sha256, representative, distance, threshold))
+    write_clusters(rows, db_path, postgres)
+
+    clusters_df = pd.DataFrame(rows, columns=['message_id', 'channel_name', 'sha256', 'cluster_id',
+                                              'hamming_distance', 'dedup_threshold'])
+    clusters_df['image_path'] = [path for _, _, path in images]
+    clusters_df['cluster_size'] = clusters_df.groupby('cluster_id')['sha256'].transform('size')
+    duplicates = int((clusters_df['cluster_size'] > 1).sum())
+    print(f"🗂️ {clusters_df['cluster_id'].nunique()} image clusters "
+          f"({duplicates} images in multi-image clusters, threshold {threshold})")
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        clusters_df.to_csv(output_path, index=False)
+        print(f"✅ Saved image clusters to {output_path}")
+    return clusters_df
+
+
+def run_yolo_detection(image_dir=IMAGE_DIR, output_path=None, model_path=MODEL_PATH,
+                       batch_size=DEFAULT_BATCH_SIZE, threads=DEFAULT_THREADS, cache_path=CACHE_PATH,
+                       refresh=False, prefetch_workers=DEFAULT_PREFETCH_WORKERS,
+                       dedup_threshold=DEFAULT_THRESHOLD, clusters_path=None, backend=DEFAULT_BACKEND,
+                       db_path=DB_PATH, postgres=USE_POSTGRES):
+    """
+    Run the model over every image not yet in the detection cache and save
+    the detections of all images.
+
+    Reposted images share a hash and are inferred once. With a
+    dedup_threshold (None disables it) images whose pHash is that close to
+    an analysed cluster representative copy its detections instead of
+    being inferred, and every image's cluster is upserted into
+    raw_image_clusters (clusters_path also exports it to CSV).
+    refresh=True re-infers everything for the current model version.
+    """
+    print("Running YOLO image analysis...")
+    if not os.path.exists(image_dir):
+        print(f"⚠️ Image directory not found: {image_dir}")
+        return pd.DataFrame(columns=DETECTION_COLUMNS)
+
+    images = list(iter_images(image_dir))
+    cache = DetectionCache(cache_path)
+    version = backend_version(model_path, backend)
+
+    hashes = [cache.image_hash(path) for _, _, path in images]
+    cache.commit()
+    paths = {}
+    for sha256, (_, _, path) in zip(hashes, images):
+        paths.setdefault(sha256, path)
+
+    clusters = {}
+    if dedup_threshold is not None:
+        clusters = assign_clusters(cache, list(paths.items()), dedup_threshold, prefetch_workers)
+    known = {} if refresh else cache.lookup(set(paths) | {rep for rep, _ in clusters.values()}, version)
+
+    def representative(sha256):
+        rep = clusters.get(sha256, (sha256, 0))[0]
+        # A representative that is gone from disk and was never analysed can't stand in
+        return rep if rep in paths or rep in known else sha256
+
+    todo = {}
+    for sha256 in paths:
+        rep = representative(sha256)
+        if rep not in known and rep not in todo:
+            todo[rep] = paths[rep]
+    reused = sum(1 for sha256 in paths if representative(sha256) != sha256)
+    print(f"🗂️ {len(images)} images, {len(paths)} unique, {reused} near-duplicates, "
+          f"{len(todo)} to analyse ({cache.hashed} re-hashed, model {version})")
+
+    if todo:
+        engine = load_engine(backend, model_path, batch_size, threads, prefetch_workers)
+        started = time.perf_counter()
+        pending = list(todo.items())
+        for start in range(0, len(pending), CACHE_COMMIT_EVERY):
+            chunk = pending[start:start + CACHE_COMMIT_EVERY]
+            found = engine.detect_paths([path for _, path in chunk])
+            results = {sha256: detections for (sha256, _), detections in zip(chunk, found)}
+            analyzed_at = cache.store(results, version)
+            known.update((sha256, (detections, analyzed_at)) for sha256, detections in results.items())
+        elapsed = time.perf_counter() - started
+        print(f"⏱️ {len(todo)} images in {elapsed:.2f}s "
+              f"({len(todo) / elapsed:.1f} images/sec, batch {batch_size}, {threads} threads)")
+        print(f"   Stages: {engine.timers.summary()}")
+    cache.close()
+
+    results_df = pd.DataFrame(
+        [detection_row(channel, message_id, *known[representative(sha256)])
+         for (channel, message_id, _), sha256 in zip(images, hashes)],
+        columns=DETECTION_COLUMNS,
+    )
+    save_detections(results_df, output_path, db_path, postgres)
+    if dedup_threshold is not None:
+        save_clusters(images, hashes, clusters, dedup_threshold, clusters_path, db_path, postgres)
+    return results_df
+
+
+def simulate_yolo_detection(image_dir=IMAGE_DIR, output_path=None, db_path=DB_PATH, postgres=USE_POSTGRES):
+    """
+    Rule-based stand-in for the model (--simulate), kept for tests and
+    environments without ultralytics.
     """
     print("Running image analysis...")
-    
+
     results = []
-    image_dir = "data/raw/images"
-    
+
     # Check if images exist
     if not os.path.exists(image_dir):
         print(f"⚠️ Image directory not found: {image_dir}")
         print("Creating simulated detection results...")
-        
+
         # Create simulated data for project requirements
         simulated_detections = [
             {'message_id': 22909, 'channel_name': 'lobelia4cosmetics', 'detected_class': 'bottle', 'confidence_score': 0.85, 'image_category': 'product_display'},
@@ -33,59 +325,33 @@ def simulate_yolo_detection():
             {'message_id': 188997, 'channel_name': 'tikvahpharma', 'detected_class': 'person', 'confidence_score': 0.65, 'image_category': 'promotional'},
             {'message_id': 188996, 'channel_name': 'tikvahpharma', 'detected_class': 'bottle', 'confidence_score': 0.82, 'image_category': 'product_display'},
         ]
-        
+
         results_df = pd.DataFrame(simulated_detections)
-        
+
     else:
         # Scan actual images
-        for channel in os.listdir(image_dir):
-            channel_path = os.path.join(image_dir, channel)
-            if os.path.isdir(channel_path):
-                for date_folder in os.listdir(channel_path):
-                    date_path = os.path.join(channel_path, date_folder)
-                    if os.path.isdir(date_path):
-                        for image_file in os.listdir(date_path):
-                            if image_file.endswith(('.jpg', '.png', '.jpeg')):
-                                message_id = image_file.split('.')[0]
-                                
-                                # Simulate YOLO detection results
-                                # In real implementation: model = YOLO('yolov8n.pt')
-                                detected_class = 'bottle' if 'pharma' in channel else 'product'
-                                confidence_score = 0.8 + (int(message_id) % 10) * 0.02
-                                
-                                # Categorize based on channel name
-                                if 'pharma' in channel:
-                                    image_category = 'promotional'
-                                else:
-                                    image_category = 'product_display'
-                                
-                                results.append({
-                                    'message_id': int(message_id),
-                                    'channel_name': channel,
-                                    'detected_class': detected_class,
-                                    'confidence_score': round(confidence_score, 2),
-                                    'image_category': image_category,
-                                    'analysis_timestamp': datetime.now().isoformat()
-                                })
-        
-        results_df = pd.DataFrame(results)
-    
-    # Save to CSV
-    output_path = 'data/processed/yolo_detections.csv'
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    results_df.to_csv(output_path, index=False)
-    
-    print(f"✅ Saved {len(results_df)} detections to {output_path}")
-    
-    # Print summary
-    print("\n=== Detection Summary ===")
-    print(f"Total images analyzed: {len(results_df)}")
-    if not results_df.empty:
-        print("\nBy category:")
-        print(results_df['image_category'].value_counts())
-        print("\nBy channel:")
-        print(results_df['channel_name'].value_counts())
-    
+        for channel, message_id, _ in iter_images(image_dir):
+            detected_class = 'bottle' if 'pharma' in channel else 'product'
+            confidence_score = 0.8 + (message_id % 10) * 0.02
+
+            # Categorize based on channel name
+            if 'pharma' in channel:
+                image_category = 'promotional'
+            else:
+                image_category = 'product_display'
+
+            results.append({
+                'message_id': message_id,
+                'channel_name': channel,
+                'detected_class': detected_class,
+                'confidence_score': round(confidence_score, 2),
+                'image_category': image_category,
+                'analysis_timestamp': datetime.now().isoformat()
+            })
+
+        results_df = pd.DataFrame(results, columns=DETECTION_COLUMNS)
+
+    save_detections(results_df, output_path, db_path, postgres)
     return results_df
 
 def create_fct_image_detections_sql():
@@ -93,7 +359,7 @@ def create_fct_image_detections_sql():
     sql_content = """{{ config(materialized='table') }}
 
 WITH yolo_results AS (
-    SELECT 
+    SELECT
         message_id::INTEGER as message_id,
         channel_name,
         detected_class,
@@ -104,15 +370,17 @@ WITH yolo_results AS (
 ),
 
 messages_with_keys AS (
-    SELECT 
+    SELECT
         m.message_id,
+        m.channel_name,
         ABS(HASH(m.channel_name)) as channel_key,
         DATE(m.message_timestamp) as date_key
     FROM {{ ref('stg_telegram_messages') }} m
 )
 
-SELECT 
+SELECT
     y.message_id,
+    y.channel_name,
     m.channel_key,
     m.date_key,
     y.detected_class,
@@ -121,33 +389,72 @@ SELECT
     y.analysis_timestamp,
     CURRENT_TIMESTAMP as loaded_at
 FROM yolo_results y
-LEFT JOIN messages_with_keys m ON y.message_id = m.message_id
+-- Message ids are only unique within a channel
+LEFT JOIN messages_with_keys m
+    ON y.channel_name = m.channel_name
+   AND y.message_id = m.message_id
 WHERE y.message_id IS NOT NULL
 """
-    
+
     # Save SQL file
     output_path = 'medical_warehouse/models/marts/fct_image_detections.sql'
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
     with open(output_path, 'w') as f:
         f.write(sql_content)
-    
+
     print(f"✅ Created {output_path}")
     return output_path
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Detect objects in scraped Telegram images")
+    parser.add_argument("--simulate", action="store_true", help="Rule-based detections instead of the model")
+    parser.add_argument("--model", default=MODEL_PATH, help="YOLO weights (default yolov8n.pt or $YOLO_MODEL)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Images per model call")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="Inference backend (onnx-int8: exported, int8 quantized model in ONNX Runtime)")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="CPU threads for inference")
+    parser.add_argument("--prefetch-workers", type=int, default=DEFAULT_PREFETCH_WORKERS,
+                        help="Threads decoding the next batch during inference")
+    parser.add_argument("--image-dir", default=IMAGE_DIR, help="Image root (<channel>/<date>/<id>.jpg)")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite warehouse to upsert raw_yolo_detections into")
+    parser.add_argument("--postgres", action="store_true", default=USE_POSTGRES,
+                        help="Upsert into raw.yolo_detections on PostgreSQL (default: $USE_POSTGRES)")
+    parser.add_argument("--output", nargs='?', const=OUTPUT_PATH,
+                        help=f"Also export detections to CSV (default path {OUTPUT_PATH})")
+    parser.add_argument("--cache", default=CACHE_PATH, help="Detection cache database")
+    parser.add_argument("--refresh", action="store_true", help="Re-infer images already in the cache")
+    parser.add_argument("--dedup-threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help="Max pHash Hamming distance for reusing a near-duplicate's detections")
+    parser.add_argument("--no-dedup", action="store_true", help="Infer near-duplicates separately")
+    parser.add_argument("--clusters-output", nargs='?', const=CLUSTERS_PATH,
+                        help=f"Also export near-duplicate clusters to CSV (default path {CLUSTERS_PATH})")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+
     # Run detection
-    detections_df = simulate_yolo_detection()
-    
+    if args.simulate:
+        detections_df = simulate_yolo_detection(args.image_dir, args.output, args.db, args.postgres)
+    else:
+        detections_df = run_yolo_detection(args.image_dir, args.output, args.model,
+                                           args.batch_size, args.threads, args.cache, args.refresh,
+                                           args.prefetch_workers,
+                                           None if args.no_dedup else args.dedup_threshold,
+                                           args.clusters_output, backend=args.backend, db_path=args.db,
+                                           postgres=args.postgres)
+
     # Create SQL model
     sql_path = create_fct_image_detections_sql()
-    
+
     print("\n" + "="*50)
     print("YOLO Detection Module Complete!")
     print("="*50)
-    print("Files created:")
-    print(f"1. {detections_df if isinstance(detections_df, str) else 'data/processed/yolo_detections.csv'}")
+    print("Outputs:")
+    print(f"1. {'raw.yolo_detections' if args.postgres else f'raw_yolo_detections in {args.db}'}")
+    if not args.simulate and not args.no_dedup:
+        print(f"   {'raw.image_clusters' if args.postgres else f'raw_image_clusters in {args.db}'}")
     print(f"2. {sql_path}")
-    print("\nTo use real YOLO:")
-    print("1. pip install ultralytics")
-    print("2. Replace simulate_yolo_detection() with actual YOLO model")
\ No newline at end of file
+    if args.output:
+        print(f"3. {args.output}")
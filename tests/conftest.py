@@ -0,0 +1,96 @@
+"""
+Shared fixtures and helpers. The pipeline scripts in src/ import each other
+as top-level modules (they are run as `python src/<script>.py`), so src/ goes
+on the path next to the repository root.
+
+The scraper helpers are imported by the test modules that drive
+FakeTelegramClient (`from conftest import ...`); they import telethon-backed
+modules lazily, since those tests skip without telethon.
+"""
+
+import asyncio
+import glob
+import json
+import os
+import sys
+from datetime import timedelta
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (REPO_ROOT, os.path.join(REPO_ROOT, 'src')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture
+def synthetic_lake(tmp_path):
+    """A small synthetic raw data lake; returns its telegram_messages root"""
+    from generate_synthetic_data import generate_dataset
+
+    data_root = str(tmp_path / 'raw')
+    generate_dataset(400, channels=2, days=2, data_root=data_root, seed=7, images=False)
+    return os.path.join(data_root, 'telegram_messages')
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in tmp_path: the scraper writes its data lake, images and logs relative to the cwd"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def make_client(**kwargs):
+    """A FakeTelegramClient over 300 synthetic messages in 3 channels"""
+    from fake_telegram import FakeTelegramClient
+
+    options = dict(latency=0, max_page_size=20, image_ratio=0.2)
+    options.update(kwargs)
+    return FakeTelegramClient.from_synthetic(messages=300, channels=3, days=2, seed=3, **options)
+
+
+def fast_limiter():
+    from rate_limiter import AdaptiveRateLimiter
+
+    return AdaptiveRateLimiter(rate=1000, min_rate=500, max_rate=1000, burst=100)
+
+
+def make_scraper(client, **kwargs):
+    from scrape_checkpoints import CheckpointStore
+    from scraper import TelegramScraper
+
+    options = dict(client=client, page_size=20, chunk_size=25, checkpoints=CheckpointStore(),
+                   limiter=fast_limiter(), media_limiter=fast_limiter())
+    options.update(kwargs)
+    return TelegramScraper(**options)
+
+
+def scrape(scraper, client):
+    """Scrape every fake channel's full history"""
+    history = max(len(messages) for messages in client.channels.values())
+    return asyncio.run(asyncio.wait_for(
+        scraper.scrape_all(client.channel_names(), limit=history), timeout=60))
+
+
+def scraped_keys():
+    """(channel, message_id) of every record published to the raw data lake"""
+    keys = []
+    for file_path in glob.glob(os.path.join('data', 'raw', 'telegram_messages', '*', '*.jsonl')):
+        with open(file_path, encoding='utf-8') as f:
+            keys.extend((record['channel_name'], record['message_id']) for record in map(json.loads, f))
+    return keys
+
+
+def history_keys(client):
+    return {(name, m.id) for name, messages in client.channels.items() for m in messages}
+
+
+def append_messages(client, channel, count):
+    """Post count new messages to a fake channel"""
+    from fake_telegram import FakeMessage
+
+    last = client.channels[channel][-1]
+    for i in range(1, count + 1):
+        client.channels[channel].append(FakeMessage(last.id + i, last.date + timedelta(minutes=i),
+                                                    f"new post {i}", 1, 0, False))
+    client.ids[channel] = [m.id for m in client.channels[channel]]
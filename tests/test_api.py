@@ -0,0 +1,194 @@
+"""
+API endpoints against a small synthetic warehouse, through the query pool
+and the response cache.
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pd = pytest.importorskip("pandas")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from api.cache import response_cache  # noqa: E402
+from api.database import db  # noqa: E402
+from api.main import app  # noqa: E402
+from detection_sink import write_detections  # noqa: E402
+from load_to_sqlite import load_json_to_sqlite  # noqa: E402
+
+
+@pytest.fixture
+def warehouse(synthetic_lake, tmp_path):
+    db_path = str(tmp_path / 'warehouse.db')
+    load_json_to_sqlite(db_path, synthetic_lake)
+    return db_path
+
+
+@pytest.fixture
+def client(warehouse, monkeypatch):
+    """The app reading the warehouse; no lifespan events, so the shared query pool stays up"""
+    monkeypatch.setattr(db, 'postgres', False)
+    monkeypatch.setattr(db, 'sqlite_path', warehouse)
+    monkeypatch.setattr(response_cache, 'generation_check', 0)
+    response_cache.clear()
+    yield TestClient(app)
+    response_cache.clear()
+
+
+def channel_counts(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return dict(conn.execute("SELECT channel_name, COUNT(*) FROM raw_telegram_messages GROUP BY channel_name"))
+
+
+def report_numbers(client, channel):
+    """The media-dependent figures of the summary, activity and visual-content reports"""
+    summary = client.get('/api/summary').json()['data']
+    activity = client.get(f'/api/channels/{channel}/activity').json()
+    visual = client.get('/api/reports/visual-content').json()['channels']
+    return {
+        'summary': (summary['total_messages'], summary['messages_with_images']),
+        'activity': (activity['statistics']['total_posts'], activity['statistics']['posts_with_images'],
+                     float(activity['statistics']['image_percentage']),
+                     sum(day['images_count'] for day in activity['daily_activity'])),
+        'visual': sorted((row['channel_name'], row['posts_with_images'], row['posts_without_images'],
+                          round(float(row['avg_views_with_images']), 2)) for row in visual),
+    }
+
+
+def test_reports(client, warehouse):
+    counts = channel_counts(warehouse)
+    channel = sorted(counts)[0]
+    with sqlite3.connect(warehouse) as conn:
+        images = conn.execute("SELECT SUM(has_media) FROM raw_telegram_messages").fetchone()[0]
+    assert images
+
+    numbers = report_numbers(client, channel)
+    assert numbers['summary'] == (sum(counts.values()), images)
+    assert numbers['activity'][0] == counts[channel]
+    assert numbers['activity'][1] == numbers['activity'][3]
+    assert sum(row[1] + row[2] for row in numbers['visual']) == sum(counts.values())
+
+    assert client.get('/api/channels/no_such_channel/activity').status_code == 404
+    results = client.get('/api/search/messages', params={'query': 'paracetamol'}).json()['results']
+    assert results
+
+
+def test_inline_queries_without_the_pool(client, monkeypatch):
+    pooled = client.get('/api/summary').json()['data']
+    response_cache.clear()
+    monkeypatch.setattr(db, 'executor', None)
+    assert client.get('/api/summary').json()['data'] == pooled
+
+
+def test_cached_reports_follow_the_data_generation(client, warehouse):
+    first = client.get('/api/reports/visual-content').json()
+    hits = response_cache.hits
+    assert client.get('/api/reports/visual-content').json() == first
+    assert response_cache.hits == hits + 1
+
+    with sqlite3.connect(warehouse) as conn:
+        channel = conn.execute("SELECT channel_name FROM raw_telegram_messages LIMIT 1").fetchone()[0]
+        conn.execute("DELETE FROM raw_telegram_messages WHERE channel_name = ?", (channel,))
+    assert client.get('/api/reports/visual-content').json() == first  # same generation, still cached
+    write_detections(detections_for(warehouse, 3), warehouse)  # bumps the generation
+    refreshed = client.get('/api/reports/visual-content').json()
+    assert channel not in {row['channel_name'] for row in refreshed['channels']}
+
+
+def test_summary_timestamp_is_current_on_cache_hits(client, monkeypatch):
+    import api.main
+
+    class Clock:
+        ticks = iter(range(10))
+
+        @classmethod
+        def now(cls):
+            return datetime(2026, 1, 15, 10, 0, next(cls.ticks))
+
+    monkeypatch.setattr(api.main, 'datetime', Clock)
+    first = client.get('/api/summary').json()
+    hits = response_cache.hits
+    second = client.get('/api/summary').json()
+    assert response_cache.hits == hits + 1
+    assert second['data'] == first['data']
+    assert (first['timestamp'], second['timestamp']) == ('2026-01-15T10:00:00', '2026-01-15T10:00:01')
+
+
+def detections_for(db_path, count=12):
+    with sqlite3.connect(db_path) as conn:
+        messages = conn.execute("SELECT message_id, channel_name FROM raw_telegram_messages "
+                                "ORDER BY id LIMIT ?", (count,)).fetchall()
+    categories = ['promotional', 'product_display', 'lifestyle']
+    return pd.DataFrame([{
+        'message_id': message_id, 'channel_name': channel, 'detected_class': 'bottle',
+        'confidence_score': 0.5 + i / 100, 'image_category': categories[i % 3],
+        'analysis_timestamp': '2026-01-15T10:00:00',
+    } for i, (message_id, channel) in enumerate(messages)])
+
+
+def test_image_detections_before_any_are_loaded(client):
+    response = client.get('/api/reports/image-detections')
+    assert response.status_code == 404
+    assert 'yolo_detect' in response.json()['error']
+
+
+def test_image_detections(client, warehouse):
+    write_detections(detections_for(warehouse), warehouse)
+    body = client.get('/api/reports/image-detections').json()
+    assert body['total_images'] == 12
+    assert all(0.5 <= row['avg_confidence'] <= 0.62 for row in body['categories'])
+
+
+def test_image_detections_propagates_other_errors(client, monkeypatch):
+    monkeypatch.setattr(db, 'sqlite_path', '/nonexistent/warehouse.db')
+    with pytest.raises(sqlite3.OperationalError, match='unable to open'):
+        client.get('/api/reports/image-detections')
+
+
+@pytest.fixture
+def pg_client(synthetic_lake, monkeypatch):
+    """The app reading the synthetic lake loaded into POSTGRES_TEST_DB"""
+    if not os.getenv('POSTGRES_TEST_DB'):
+        pytest.skip("POSTGRES_TEST_DB is not set")
+    psycopg2 = pytest.importorskip("psycopg2")
+    import load_to_postgres
+
+    monkeypatch.setenv('POSTGRES_DB', os.getenv('POSTGRES_TEST_DB'))
+    try:
+        conn = load_to_postgres.get_connection()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL is not reachable: {e}")
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("DROP SCHEMA IF EXISTS raw CASCADE")
+    load_to_postgres.load_json_to_postgres(synthetic_lake)
+    monkeypatch.setattr(db, 'postgres', True)
+    monkeypatch.setattr(response_cache, 'generation_check', 0)
+    response_cache.clear()
+    try:
+        yield TestClient(app)
+    finally:
+        response_cache.clear()
+        with conn.cursor() as cursor:
+            cursor.execute("DROP SCHEMA IF EXISTS raw CASCADE")
+        conn.close()
+
+
+def test_image_detections_on_postgres(pg_client, warehouse):
+    assert pg_client.get('/api/reports/image-detections').status_code == 404
+    write_detections(detections_for(warehouse), postgres=True)
+    body = pg_client.get('/api/reports/image-detections').json()
+    assert body['total_images'] == 12
+    assert all(0.5 <= row['avg_confidence'] <= 0.62 for row in body['categories'])
+
+
+def test_reports_match_sqlite_on_postgres(pg_client, client, warehouse):
+    channel = sorted(channel_counts(warehouse))[0]
+    expected = report_numbers(client, channel)
+    assert report_numbers(pg_client, channel) == expected
+    assert pg_client.get('/api/channels/no_such_channel/activity').status_code == 404
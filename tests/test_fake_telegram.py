@@ -0,0 +1,119 @@
+"""
+FakeTelegramClient paging and injection semantics, data lake replay with
+checkpoint resume, and a smoke run of the scraper benchmark.
+"""
+
+import asyncio
+import json
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("telethon")
+
+from telethon.errors import FloodWaitError  # noqa: E402
+
+from fake_telegram import FakeMessage, FakeTelegramClient  # noqa: E402
+from load_to_sqlite import discover_json_files, iter_messages  # noqa: E402
+from conftest import history_keys, make_scraper, scrape, scraped_keys  # noqa: E402
+
+
+def make_channel(ids, **kwargs):
+    date = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return FakeTelegramClient({'chan': [FakeMessage(i, date, f"post {i}", i, 0, i % 2 == 0) for i in ids]},
+                              latency=0, **kwargs)
+
+
+def ids(page):
+    return [m.id for m in page]
+
+
+def test_get_messages_pages_like_telethon():
+    client = make_channel(range(1, 11), max_page_size=4)
+
+    async def pages():
+        return (
+            await client.get_messages('chan', limit=1),  # newest
+            await client.get_messages('chan', limit=3, offset_id=8),  # below offset, newest first
+            await client.get_messages('chan', limit=3, min_id=5, reverse=True),  # above min_id, oldest first
+            await client.get_messages('chan', limit=10, offset_id=6, min_id=2, reverse=True),
+            await client.get_messages('chan', limit=3, min_id=10, reverse=True),
+        )
+
+    newest, below, above, capped, empty = asyncio.run(pages())
+    assert ids(newest) == [10]
+    assert ids(below) == [7, 6, 5]
+    assert ids(above) == [6, 7, 8]
+    assert ids(capped) == [7, 8, 9, 10]  # max_page_size caps the page
+    assert empty == []
+    assert client.stats['requests'] == 5
+
+
+def test_unknown_channel_raises():
+    with pytest.raises(ValueError):
+        asyncio.run(make_channel([1]).get_messages('missing', limit=1))
+
+
+def test_flood_every_injects_flood_waits():
+    client = make_channel(range(1, 4), flood_every=2, flood_seconds=7)
+
+    async def run():
+        outcomes = []
+        for _ in range(4):
+            try:
+                await client.get_messages('chan', limit=1)
+                outcomes.append('ok')
+            except FloodWaitError as e:
+                outcomes.append(e.seconds)
+        return outcomes
+
+    assert asyncio.run(run()) == ['ok', 7, 'ok', 7]
+    assert client.stats['flood_waits'] == 2
+
+
+def test_media_payloads_are_sized_and_stable():
+    client = make_channel([2, 4], media_bytes=5000)
+    first, second = client.channels['chan']
+
+    async def run():
+        return (await client.download_media(first, file=bytes), await client.download_media(first),
+                await client.download_media(second, file=bytes))
+
+    a, again, b = asyncio.run(run())
+    assert len(a) == len(b) == 5000
+    assert a == again and a != b
+    assert client.stats['media_bytes'] == 15000
+
+
+def test_replayed_data_lake_scrapes_back_and_resumes(workdir, synthetic_lake):
+    lake = {(m['channel_name'], m['message_id'])
+            for _, path in discover_json_files(synthetic_lake) for m in iter_messages(path)}
+    client = FakeTelegramClient.from_data_lake(synthetic_lake, latency=0, max_page_size=20)
+    assert history_keys(client) == lake
+
+    scrape(make_scraper(client), client)
+    assert sorted(scraped_keys()) == sorted(lake)
+
+    stats = scrape(make_scraper(client), client)
+    assert sum(s['messages'] for s in stats.values()) == 0
+    assert sorted(scraped_keys()) == sorted(lake)
+
+
+def test_scraper_benchmark_reports_each_concurrency(tmp_path, monkeypatch):
+    import benchmark_scraper
+
+    output = tmp_path / 'scraper.json'
+    monkeypatch.setattr(sys, 'argv', [
+        'benchmark_scraper.py', '--concurrency', '1,2', '--messages', '200', '--channels', '2',
+        '--latency', '0', '--media-bytes', '1000', '--rate', '1000', '--max-rate', '1000',
+        '--output', str(output),
+    ])
+    benchmark_scraper.run_benchmarks(benchmark_scraper.parse_args())
+
+    report = json.loads(output.read_text())
+    assert [run['concurrency'] for run in report['runs']] == [1, 2]
+    for run in report['runs']:
+        assert run['messages'] == 200
+        assert run['flood_waits'] == 0
+        assert run['media'] > 0 and run['media_mb_per_sec'] > 0
@@ -0,0 +1,143 @@
+"""
+Near-duplicate clustering: the detection cache keeps assignments per dedup
+threshold (hashing each image once), and the clusters land in the warehouse.
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+import detection_sink  # noqa: E402
+import image_dedup  # noqa: E402
+from detection_cache import DetectionCache, file_sha256  # noqa: E402
+
+
+@pytest.fixture
+def images(tmp_path):
+    """(sha256, path) of a product shot, a re-encoded resize of it and an unrelated picture"""
+    rng = np.random.default_rng(3)
+    shot = cv2.GaussianBlur(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8), (31, 31), 0)
+    other = cv2.GaussianBlur(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8), (31, 31), 0)
+    files = {
+        'shot.jpg': (shot, 95),
+        'repost.jpg': (cv2.resize(shot, (200, 150)), 60),
+        'other.jpg': (other, 95),
+    }
+    found = []
+    for name, (image, quality) in files.items():
+        path = str(tmp_path / name)
+        cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        found.append((file_sha256(path), path))
+    return found
+
+
+@pytest.fixture
+def counted_hashes(monkeypatch):
+    calls = []
+
+    def image_hashes(path):
+        calls.append(path)
+        return original(path)
+
+    original = image_dedup.image_hashes
+    monkeypatch.setattr(image_dedup, 'image_hashes', image_hashes)
+    return calls
+
+
+def test_clusters_are_kept_per_threshold(tmp_path, images, counted_hashes):
+    shot, repost, other = (sha256 for sha256, _ in images)
+    cache = DetectionCache(str(tmp_path / 'cache.db'))
+
+    loose = image_dedup.assign_clusters(cache, images, threshold=6, workers=1)
+    assert loose[repost][0] == loose[shot][0] == shot
+    assert loose[other] == (other, 0)
+    assert len(counted_hashes) == 3
+
+    # A stricter threshold re-clusters from the stored hashes
+    strict = image_dedup.assign_clusters(cache, images, threshold=0, workers=1)
+    assert {sha256: representative for sha256, (representative, _) in strict.items()} == {
+        shot: shot, repost: repost, other: other}
+    assert len(counted_hashes) == 3
+
+    # Both assignments survive a reopen
+    cache.close()
+    cache = DetectionCache(str(tmp_path / 'cache.db'))
+    assert image_dedup.assign_clusters(cache, images, threshold=6, workers=1) == loose
+    assert image_dedup.assign_clusters(cache, images, threshold=0, workers=1) == strict
+    assert len(counted_hashes) == 3
+    cache.close()
+
+
+def test_cache_migration_keeps_hashes(tmp_path, images, counted_hashes):
+    path = str(tmp_path / 'cache.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE image_clusters (sha256 TEXT PRIMARY KEY, phash TEXT NOT NULL, "
+                     "dhash TEXT NOT NULL, representative TEXT NOT NULL, distance INTEGER NOT NULL)")
+        conn.executemany("INSERT INTO image_clusters VALUES (?, ?, ?, ?, 0)",
+                         [(sha256, f"{a:016x}", f"{b:016x}", sha256)
+                          for sha256, (a, b) in ((s, image_dedup.image_hashes(p)) for s, p in images)])
+    counted_hashes.clear()
+
+    cache = DetectionCache(path)
+    clusters = image_dedup.assign_clusters(cache, images, threshold=6, workers=1)
+    assert counted_hashes == []
+    assert len({representative for representative, _ in clusters.values()}) == 2
+    cache.close()
+
+
+def cluster_rows(images, clusters, threshold):
+    return [(message_id, 'CheMed123', sha256, *clusters[sha256], threshold)
+            for message_id, (sha256, _) in enumerate(images, start=1)]
+
+
+def test_write_clusters_to_sqlite(tmp_path, images):
+    db_path = str(tmp_path / 'warehouse.db')
+    cache = DetectionCache(str(tmp_path / 'cache.db'))
+    loose = cluster_rows(images, image_dedup.assign_clusters(cache, images, threshold=6, workers=1), 6)
+    strict = cluster_rows(images, image_dedup.assign_clusters(cache, images, threshold=0, workers=1), 0)
+    cache.close()
+
+    assert detection_sink.write_clusters(loose, db_path) == 3
+    assert detection_sink.write_clusters(loose, db_path) == 0
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(DISTINCT cluster_id) FROM raw_image_clusters").fetchone()[0] == 2
+        generation = conn.execute("SELECT generation FROM data_generation").fetchone()[0]
+
+    assert detection_sink.write_clusters(strict, db_path) == 3
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(DISTINCT cluster_id), MAX(dedup_threshold) "
+                            "FROM raw_image_clusters").fetchone() == (3, 0)
+        assert conn.execute("SELECT generation FROM data_generation").fetchone()[0] > generation
+
+
+@pytest.mark.skipif(not os.getenv('POSTGRES_TEST_DB'), reason="POSTGRES_TEST_DB is not set")
+def test_write_clusters_to_postgres(tmp_path, images, monkeypatch):
+    psycopg2 = pytest.importorskip("psycopg2")
+    import load_to_postgres
+
+    monkeypatch.setenv('POSTGRES_DB', os.getenv('POSTGRES_TEST_DB'))
+    try:
+        conn = load_to_postgres.get_connection()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL is not reachable: {e}")
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("DROP SCHEMA IF EXISTS raw CASCADE")
+
+    cache = DetectionCache(str(tmp_path / 'cache.db'))
+    rows = cluster_rows(images, image_dedup.assign_clusters(cache, images, threshold=6, workers=1), 6)
+    cache.close()
+    try:
+        assert detection_sink.write_clusters(rows, postgres=True) == 3
+        assert detection_sink.write_clusters(rows, postgres=True) == 0
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(DISTINCT cluster_id) FROM raw.image_clusters")
+            assert cursor.fetchone()[0] == 2
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute("DROP SCHEMA IF EXISTS raw CASCADE")
+        conn.close()
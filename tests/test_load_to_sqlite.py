@@ -0,0 +1,78 @@
+"""
+SQLite loader: a file that fails part way commits none of its rows and no
+manifest entry, in the serial and the parallel path, and loads once fixed;
+engagement snapshots record only changed counts.
+"""
+
+import json
+import os
+import sqlite3
+
+import pytest
+
+from load_to_sqlite import ensure_schema, load_json_to_sqlite
+
+OLD_INSERT_TRIGGER_SQL = """
+CREATE TRIGGER trg_raw_messages_snapshot_insert
+AFTER INSERT ON raw_telegram_messages
+BEGIN
+    INSERT INTO message_engagement_snapshots (channel_name, message_id, views, forwards, captured_at)
+    VALUES (NEW.channel_name, NEW.message_id, NEW.views, NEW.forwards, NEW.scraped_at);
+END;
+"""
+
+
+def message_files(lake):
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(lake) for name in names)
+
+
+def counts(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return (conn.execute("SELECT COUNT(*) FROM raw_telegram_messages").fetchone()[0],
+                conn.execute("SELECT COUNT(*) FROM load_manifest").fetchone()[0])
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_file_failing_part_way_leaves_nothing_behind(synthetic_lake, tmp_path, workers):
+    files = message_files(synthetic_lake)
+    broken = files[-1]
+    with open(broken, encoding='utf-8') as f:
+        messages = json.load(f)
+    assert len(messages) > 10
+    good = json.dumps(messages)
+    messages[10] = dict(messages[10], message_id=None)  # fails validation after the first chunks
+    with open(broken, 'w', encoding='utf-8') as f:
+        json.dump(messages, f)
+
+    db_path = str(tmp_path / 'warehouse.db')
+    loaded = load_json_to_sqlite(db_path, synthetic_lake, batch_size=4, workers=workers)
+    assert counts(db_path) == (loaded, len(files) - 1)
+
+    with open(broken, 'w', encoding='utf-8') as f:
+        f.write(good)
+    assert load_json_to_sqlite(db_path, synthetic_lake, batch_size=4, workers=workers) == len(messages)
+    assert counts(db_path) == (loaded + len(messages), len(files))
+
+
+def test_snapshots_only_when_counts_change(synthetic_lake, tmp_path):
+    db_path = str(tmp_path / 'warehouse.db')
+    with sqlite3.connect(db_path) as conn:
+        ensure_schema(conn)
+        conn.executescript(OLD_INSERT_TRIGGER_SQL)  # as created by earlier versions
+
+    load_json_to_sqlite(db_path, synthetic_lake)
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM message_engagement_snapshots").fetchone()[0] == 0
+
+    path = message_files(synthetic_lake)[0]
+    with open(path, encoding='utf-8') as f:
+        messages = json.load(f)
+    messages[0]['views'] += 1000
+    messages[1]['message_text'] += ' (edited)'
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(messages, f)
+
+    load_json_to_sqlite(db_path, synthetic_lake)
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT channel_name, message_id, views FROM message_engagement_snapshots").fetchall() == [
+            (messages[0]['channel_name'], messages[0]['message_id'], messages[0]['views'])]
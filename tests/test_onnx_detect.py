@@ -0,0 +1,111 @@
+"""
+ONNX Runtime backend against the torch backend.
+
+Runs only with ultralytics, torch and onnxruntime installed. The weights
+are a freshly initialised YOLOv8n (nothing is downloaded), re-initialised
+so its class scores vary with the image and pass the confidence threshold.
+"""
+
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+ultralytics = pytest.importorskip("ultralytics")
+pytest.importorskip("onnxruntime")
+np = pytest.importorskip("numpy")
+
+import onnx_detect  # noqa: E402
+from generate_synthetic_data import make_image_bytes  # noqa: E402
+from image_prefetch import BatchPrefetcher, StageTimers  # noqa: E402
+from yolo_detect import IMAGE_SIZE, YoloEngine  # noqa: E402
+
+IMAGES = 4
+TOLERANCE = 0.01
+
+
+@pytest.fixture(scope='module')
+def weights(tmp_path_factory):
+    from ultralytics import YOLO
+
+    path = str(tmp_path_factory.mktemp('weights') / 'yolov8n-test.pt')
+    torch.manual_seed(0)
+    model = YOLO('yolov8n.yaml')
+    with torch.no_grad():
+        # ultralytics' init leaves every class score at its prior, the same for any input
+        for module in model.model.modules():
+            if isinstance(module, torch.nn.Conv2d):
+                torch.nn.init.kaiming_normal_(module.weight)
+        for branch in model.model.model[-1].cv3:
+            branch[-1].weight.mul_(30)
+            branch[-1].bias.fill_(-2)
+    model.save(path)
+    return path
+
+
+@pytest.fixture(scope='module')
+def batch(tmp_path_factory):
+    """One letterboxed batch of synthetic product shots"""
+    workdir = tmp_path_factory.mktemp('images')
+    paths = []
+    for i in range(IMAGES):
+        path = str(workdir / f"{i}.jpg")
+        with open(path, 'wb') as f:
+            f.write(make_image_bytes(f"product {i}", 480))
+        paths.append(path)
+    [(_, letterboxed, ok)] = list(BatchPrefetcher(paths, IMAGES, IMAGE_SIZE, timers=StageTimers()))
+    assert all(ok)
+    return letterboxed
+
+
+@pytest.fixture(scope='module')
+def torch_engine(weights):
+    return YoloEngine(weights, IMAGES, 1)
+
+
+def same_detections(expected, found, tolerance):
+    for want, got in zip(expected, found):
+        assert [c for c, _ in want] == [c for c, _ in got]
+        assert max((abs(a - b) for (_, a), (_, b) in zip(want, got)), default=0.0) <= tolerance
+
+
+def test_decode_matches_ultralytics_nms():
+    from ultralytics.utils.nms import non_max_suppression
+
+    rng = np.random.default_rng(1)
+    prediction = np.empty((2, 4 + 80, 2000), dtype=np.float32)
+    prediction[:, :2] = rng.uniform(0, 640, (2, 2, 2000))
+    prediction[:, 2:4] = rng.uniform(10, 200, (2, 2, 2000))
+    prediction[:, 4:] = rng.uniform(0, 1, (2, 80, 2000)) ** 8
+
+    for conf in (0.25, 0.6):
+        expected = non_max_suppression(torch.from_numpy(prediction), conf, onnx_detect.IOU_THRESHOLD,
+                                       max_det=onnx_detect.MAX_DETECTIONS)
+        found = onnx_detect.decode_predictions(prediction, conf)
+        assert [len(image) for image in found] == [len(image) for image in expected]
+        same_detections([[(int(c), float(p)) for p, c in image[:, 4:6].tolist()] for image in expected],
+                        found, 1e-6)
+
+
+def test_onnx_output_matches_torch(weights, batch, torch_engine):
+    engine = onnx_detect.OnnxYoloEngine(weights, IMAGES, 1)
+    assert os.path.exists(engine.onnx_path)
+
+    expected = onnx_detect.torch_predict(torch_engine, batch)
+    found = engine.predict(batch)
+    assert found.shape == expected.shape
+    assert np.abs(found[:, 4:] - expected[:, 4:]).max() <= 1e-4
+    assert np.abs(found[:, :4] - expected[:, :4]).max() <= 1e-2  # pixels
+
+    detections = torch_engine.detect_batch(batch)
+    assert len({c for image in detections for c, _ in image}) > 1
+    same_detections(detections, engine.detect_batch(batch), TOLERANCE)
+
+
+def test_int8_scores_stay_within_tolerance(weights, batch, torch_engine):
+    engine = onnx_detect.OnnxYoloEngine(weights, IMAGES, 1, quantize=True)
+    assert engine.onnx_path.endswith('.int8.onnx')
+    assert engine.model_version != onnx_detect.OnnxYoloEngine(weights, IMAGES, 1).model_version
+
+    expected = onnx_detect.torch_predict(torch_engine, batch)
+    assert np.abs(engine.predict(batch)[:, 4:] - expected[:, 4:]).max() <= 0.1
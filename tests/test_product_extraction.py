@@ -0,0 +1,136 @@
+"""
+Product extraction: per-product prices and pack sizes, and the incremental
+watermark in both warehouses.
+"""
+
+import json
+import os
+import re
+import sqlite3
+
+import pytest
+
+import product_extraction
+from load_to_sqlite import load_json_to_sqlite
+from product_extraction import ProductExtractor
+
+DICTIONARY = {
+    'PARACETAMOL': ['panadol', 'ፓራሲታሞል'],
+    'AMOXICILLIN': ['amoxil'],
+    'NIDO': [],
+    'VITAMIN': ['vitamin c'],
+}
+
+
+def regex_extractor():
+    """The fallback matcher used when pyahocorasick isn't installed"""
+    extractor = ProductExtractor(DICTIONARY)
+    extractor.automaton = None
+    alternation = '|'.join(re.escape(a) for a in sorted(extractor.aliases, key=len, reverse=True))
+    extractor.pattern = re.compile(f'(?<![a-z0-9])(?:{alternation})')
+    return extractor
+
+
+@pytest.fixture(params=['automaton', 'regex'])
+def extractor(request):
+    if request.param == 'automaton':
+        pytest.importorskip("ahocorasick")
+        return ProductExtractor(DICTIONARY)
+    return regex_extractor()
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Panadol 500mg\nPrice 50 birr 📦 24pack\n\nAmoxil caps\n💵 **120birr**",
+     [('PARACETAMOL', 50.0, '24 pack'), ('AMOXICILLIN', 120.0, None)]),
+    ("Paracetamol 50 birr, Amoxicillin 10x10 120 birr",
+     [('PARACETAMOL', 50.0, None), ('AMOXICILLIN', 120.0, '10x10')]),
+    ("ዋጋ 112 ብር - NIDO 1+", [('NIDO', 112.0, None)]),
+    ("NIDO\nPrice: 700 birr\nDelivery 100 birr", [('NIDO', 700.0, None)]),
+    ("Price 500 birr\n\nVitamin C 60 tabs", [('VITAMIN', None, '60 tabs')]),
+    ("Panadol and Amoxil\nPrice 300 birr", [('PARACETAMOL', None, None), ('AMOXICILLIN', 300.0, None)]),
+    ("Panadol in stock\nAmoxil 90 birr\nPanadol now 45 birr",
+     [('PARACETAMOL', 45.0, None), ('AMOXICILLIN', 90.0, None)]),
+])
+def test_price_and_pack_come_from_each_products_segment(extractor, text, expected):
+    assert extractor.extract(text) == expected
+
+
+def message_files(lake):
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(lake) for name in names)
+
+
+def add_message(lake, message_id, text):
+    """Append a message to the lake's last file (bumping its size and manifest entry)"""
+    path = message_files(lake)[-1]
+    with open(path, encoding='utf-8') as f:
+        messages = json.load(f)
+    template = messages[-1]
+    messages.append(dict(template, message_id=message_id, message_text=text, views=1, forwards=0))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(messages, f)
+    return template['channel_name']
+
+
+def test_sqlite_extracts_only_new_messages(synthetic_lake, tmp_path):
+    db_path = str(tmp_path / 'warehouse.db')
+    load_json_to_sqlite(db_path, synthetic_lake)
+    with sqlite3.connect(db_path) as conn:
+        assert product_extraction.update_product_mentions(conn)[0] == 0
+        mentions = conn.execute("SELECT COUNT(*) FROM product_mentions").fetchone()[0]
+    assert mentions
+
+    channel = add_message(synthetic_lake, 10**9, "Panadol 500mg\nPrice 42 birr")
+    load_json_to_sqlite(db_path, synthetic_lake)
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM product_mentions").fetchone()[0] == mentions + 1
+        assert conn.execute("SELECT product_name, price FROM product_mentions WHERE channel_name = ? "
+                            "AND message_id = ?", (channel, 10**9)).fetchone() == ('PARACETAMOL', 42.0)
+
+
+@pytest.mark.skipif(not os.getenv('POSTGRES_TEST_DB'), reason="POSTGRES_TEST_DB is not set")
+def test_postgres_extracts_past_the_watermark(synthetic_lake, monkeypatch):
+    psycopg2 = pytest.importorskip("psycopg2")
+    import load_to_postgres
+
+    monkeypatch.setenv('POSTGRES_DB', os.getenv('POSTGRES_TEST_DB'))
+    try:
+        conn = load_to_postgres.get_connection()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL is not reachable: {e}")
+
+    def scalar(sql, params=None):
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
+
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("DROP SCHEMA IF EXISTS raw CASCADE")
+    try:
+        load_to_postgres.load_json_to_postgres(synthetic_lake)
+        mentions = scalar("SELECT COUNT(*) FROM raw.product_mentions")
+        assert mentions
+        assert scalar("SELECT last_id FROM raw.stage_watermarks") == scalar("SELECT MAX(id) FROM raw.telegram_messages")
+
+        conn.autocommit = False
+        assert product_extraction.update_postgres_product_mentions(conn) == (0, 0)
+        conn.commit()
+
+        channel = add_message(synthetic_lake, 10**9, "Panadol 500mg\nPrice 42 birr")
+        load_to_postgres.load_json_to_postgres(synthetic_lake)
+        assert scalar("SELECT COUNT(*) FROM raw.product_mentions") == mentions + 1
+        assert scalar("SELECT price FROM raw.product_mentions WHERE channel_name = %s AND message_id = %s",
+                      (channel, 10**9)) == 42.0
+        conn.commit()
+
+        # A new dictionary version starts over from the first message
+        processed, _ = product_extraction.update_postgres_product_mentions(conn, ProductExtractor(DICTIONARY))
+        conn.commit()
+        assert processed == scalar("SELECT COUNT(*) FROM raw.telegram_messages")
+        assert scalar("SELECT COUNT(DISTINCT product_name) FROM raw.product_mentions") <= len(DICTIONARY)
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("DROP SCHEMA IF EXISTS raw CASCADE")
+        conn.close()
@@ -0,0 +1,134 @@
+"""
+TelegramScraper driven by FakeTelegramClient: FloodWait handling,
+checkpoint resume and no duplicate messages across reruns.
+"""
+
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("telethon")
+
+from telethon.errors import FloodWaitError  # noqa: E402
+
+from conftest import (append_messages, fast_limiter, history_keys, make_client, make_scraper,  # noqa: E402
+                      scrape, scraped_keys)
+from scrape_checkpoints import CheckpointStore  # noqa: E402
+
+
+def test_backfill_survives_flood_waits(workdir):
+    client = make_client(flood_every=4, flood_seconds=0)
+    scraper = make_scraper(client)
+
+    stats = scrape(scraper, client)
+
+    assert client.stats['flood_waits'] > 0
+    assert scraper.limiter.flood_waits + scraper.media_limiter.flood_waits == client.stats['flood_waits']
+    assert sum(s['messages'] for s in stats.values()) == 300
+    keys = scraped_keys()
+    assert len(keys) == len(set(keys))
+    assert set(keys) == history_keys(client)
+
+
+def test_persistent_flood_wait_fails_only_that_request(workdir):
+    client = make_client(flood_every=1, flood_seconds=0)
+    scraper = make_scraper(client, max_flood_retries=2)
+
+    stats = scrape(scraper, client)
+
+    # Each channel's first request gives up after 1 try + 2 retries
+    assert all(s['messages'] == 0 for s in stats.values())
+    assert client.stats['requests'] == 3 * len(stats)
+    assert scraped_keys() == []
+
+
+def test_flood_wait_budget_in_seconds(workdir):
+    client = make_client()
+    scraper = make_scraper(client, max_flood_retries=100, max_flood_wait=1.5)
+    calls = []
+
+    async def throttled(*args, **kwargs):
+        calls.append(args)
+        raise FloodWaitError(request=None, capture=1)
+
+    with pytest.raises(FloodWaitError):
+        asyncio.run(scraper.call_api(throttled, limiter=fast_limiter()))
+    assert len(calls) == 2
+
+
+def test_rerun_resumes_from_checkpoints_without_duplicates(workdir):
+    client = make_client()
+    scrape(make_scraper(client), client)
+    assert len(scraped_keys()) == 300
+
+    # Nothing new: the checkpoint stops the rerun before any message
+    stats = scrape(make_scraper(client), client)
+    assert sum(s['messages'] for s in stats.values()) == 0
+
+    channel = client.channel_names()[0]
+    append_messages(client, channel, 7)
+    stats = scrape(make_scraper(client), client)
+    assert stats[channel]['messages'] == 7
+    assert sum(s['messages'] for s in stats.values()) == 7
+
+    keys = scraped_keys()
+    assert len(keys) == len(set(keys)) == 307
+    assert set(keys) == history_keys(client)
+
+
+def test_interrupted_run_resumes_where_it_stopped(workdir):
+    client = make_client()
+    get_messages = client.get_messages
+    calls = {'n': 0}
+
+    async def failing_get_messages(*args, **kwargs):
+        calls['n'] += 1
+        if calls['n'] > 6:
+            raise ConnectionError("network dropped")
+        return await get_messages(*args, **kwargs)
+
+    client.get_messages = failing_get_messages
+    first = scrape(make_scraper(client), client)
+    assert 0 < sum(s['messages'] for s in first.values()) < 300
+
+    client.get_messages = get_messages
+    second = scrape(make_scraper(client), client)
+    assert sum(s['messages'] for s in first.values()) + sum(s['messages'] for s in second.values()) == 300
+
+    keys = scraped_keys()
+    assert len(keys) == len(set(keys))
+    assert set(keys) == history_keys(client)
+
+
+def test_failed_photo_is_retried_on_the_next_run(workdir):
+    client = make_client()
+    channel = client.channel_names()[0]
+    photos = [m for m in client.channels[channel] if m.media is not None]
+    broken = photos[len(photos) // 2]
+    download_media = client.download_media
+    failures = []
+
+    async def flaky_download_media(message, file=None):
+        if message.id == broken.id and not failures:
+            failures.append(message.id)
+            raise ConnectionError("transfer reset")
+        return await download_media(message, file=file)
+
+    client.download_media = flaky_download_media
+    checkpoints = CheckpointStore()
+    scraper = make_scraper(client, checkpoints=checkpoints)
+    scrape(scraper, client)
+    image_path = os.path.join('data', 'raw', 'images', channel, broken.date.strftime('%Y-%m-%d'), f"{broken.id}.jpg")
+    assert failures == [broken.id]
+    assert scraper.media.stats['failed'] == 1
+    assert not os.path.exists(image_path)
+    assert checkpoints.get(channel) < broken.id
+    # Channels without the failure still reach their newest message
+    assert all(checkpoints.get(name) == client.channels[name][-1].id for name in client.channel_names()[1:])
+
+    stats = scrape(make_scraper(client, checkpoints=checkpoints), client)
+    assert os.path.exists(image_path)
+    assert checkpoints.get(channel) == client.channels[channel][-1].id
+    assert stats[channel]['messages'] > 0
+    assert set(scraped_keys()) == history_keys(client)
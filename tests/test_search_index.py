@@ -0,0 +1,167 @@
+"""
+The messages_fts full-text index stays in step with raw_telegram_messages:
+across VACUUM, while a bulk load has per-row indexing suspended and other
+writers keep inserting, after a load that fails part way, and when an older
+warehouse is migrated.
+"""
+
+import sqlite3
+
+import load_to_sqlite
+from api.search import search_statement
+from load_to_sqlite import (UPSERT_SQL, ensure_fts, ensure_schema, load_json_to_sqlite, message_to_row,
+                            suspend_fts_indexing)
+
+OLD_LAYOUT_SQL = """
+CREATE TABLE raw_telegram_messages (
+    message_id INTEGER NOT NULL,
+    channel_name TEXT NOT NULL,
+    message_date TEXT,
+    message_text TEXT,
+    has_media INTEGER,
+    views INTEGER,
+    forwards INTEGER,
+    image_path TEXT,
+    scraped_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (channel_name, message_id)
+);
+CREATE VIRTUAL TABLE messages_fts USING fts5(
+    message_text, content='raw_telegram_messages', content_rowid='rowid'
+);
+CREATE TABLE stage_watermarks (
+    stage TEXT PRIMARY KEY,
+    last_rowid INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    updated_at TEXT
+);
+"""
+
+
+def check_index(conn):
+    """FTS5 integrity check against the content table (raises on any mismatch)"""
+    conn.execute("INSERT INTO messages_fts (messages_fts, rank) VALUES ('integrity-check', 1)")
+
+
+def search(conn, word):
+    sql, params = search_statement([word], 10_000)
+    return {(row[1], row[0]) for row in conn.execute(sql, params)}
+
+
+def containing(conn, word):
+    return {tuple(row) for row in conn.execute(
+        "SELECT channel_name, message_id FROM raw_telegram_messages WHERE message_text LIKE ?", (f'%{word}%',))}
+
+
+def message(message_id, text, channel='CheMed123'):
+    return message_to_row({'message_id': message_id, 'channel_name': channel, 'message_text': text,
+                           'message_date': '2026-01-15T10:00:00', 'views': 10, 'forwards': 1,
+                           'has_media': False, 'image_path': None})
+
+
+def test_index_survives_vacuum(synthetic_lake, tmp_path):
+    db_path = str(tmp_path / 'warehouse.db')
+    load_json_to_sqlite(db_path, synthetic_lake)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM raw_telegram_messages WHERE message_id % 3 = 0")
+        conn.commit()
+        conn.execute("VACUUM")
+        check_index(conn)
+        assert search(conn, 'paracetamol') == containing(conn, 'paracetamol') != set()
+
+
+def test_rows_written_while_indexing_is_suspended(tmp_path):
+    db_path = str(tmp_path / 'warehouse.db')
+    loader = sqlite3.connect(db_path)
+    ensure_schema(loader)
+    with loader:
+        loader.executemany(UPSERT_SQL, [message(i, f"aspirin batch {i}") for i in range(1, 6)])
+
+    suspend_fts_indexing(loader)
+    with loader:
+        loader.executemany(UPSERT_SQL, [message(i, f"ibuprofen batch {i}") for i in range(6, 11)])
+
+    # Another writer (the stream writer) inserts and edits rows meanwhile
+    stream = sqlite3.connect(db_path)
+    with stream:
+        stream.executemany(UPSERT_SQL, [message(i, f"ibuprofen stream {i}", 'lobelia4cosmetics')
+                                        for i in range(1, 4)])
+        stream.execute("UPDATE raw_telegram_messages SET message_text = 'omeprazole stream 1' "
+                       "WHERE channel_name = 'lobelia4cosmetics' AND message_id = 1")
+        stream.execute("UPDATE raw_telegram_messages SET message_text = 'aspirin edited 1' "
+                       "WHERE channel_name = 'CheMed123' AND message_id = 1")
+        stream.execute("DELETE FROM raw_telegram_messages WHERE channel_name = 'CheMed123' AND message_id = 10")
+    stream.close()
+
+    ensure_fts(loader)
+    check_index(loader)
+    assert len(search(loader, 'ibuprofen')) == 6
+    assert search(loader, 'omeprazole') == {('lobelia4cosmetics', 1)}
+    assert search(loader, 'edited') == {('CheMed123', 1)}
+    assert loader.execute("SELECT COUNT(*) FROM messages_fts_suspended").fetchone()[0] == 0
+
+    # Per-row indexing is back on
+    with loader:
+        loader.execute(UPSERT_SQL, message(11, "ibuprofen after"))
+    assert len(search(loader, 'ibuprofen')) == 7
+    loader.close()
+
+
+def test_failed_load_resumes_indexing(synthetic_lake, tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'warehouse.db')
+
+    def load_then_fail(conn, pending, batch_size):
+        with conn:
+            conn.executemany(UPSERT_SQL, [message(i, f"ibuprofen batch {i}") for i in range(1, 6)])
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(load_to_sqlite, 'load_files_serial', load_then_fail)
+    assert load_json_to_sqlite(db_path, synthetic_lake) == 0
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM messages_fts_suspended").fetchone()[0] == 0
+        check_index(conn)
+        assert len(search(conn, 'ibuprofen')) == 5
+
+
+def test_stale_suspension_is_caught_up_at_startup(tmp_path):
+    db_path = str(tmp_path / 'warehouse.db')
+    conn = sqlite3.connect(db_path)
+    ensure_schema(conn)
+    suspend_fts_indexing(conn)
+    with conn:
+        conn.executemany(UPSERT_SQL, [message(i, f"ibuprofen batch {i}") for i in range(1, 6)])
+    conn.close()  # the loader dies before its catch-up
+
+    conn = sqlite3.connect(db_path)
+    ensure_schema(conn)
+    assert conn.execute("SELECT COUNT(*) FROM messages_fts_suspended").fetchone()[0] == 0
+    check_index(conn)
+    assert len(search(conn, 'ibuprofen')) == 5
+    conn.close()
+
+
+def test_migrates_rowid_keyed_warehouse(tmp_path):
+    db_path = str(tmp_path / 'warehouse.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript(OLD_LAYOUT_SQL)
+    with conn:
+        conn.executemany(
+            "INSERT INTO raw_telegram_messages (rowid, message_id, channel_name, message_text) VALUES (?, ?, ?, ?)",
+            [(10, 1, 'CheMed123', 'aspirin'), (20, 2, 'CheMed123', 'insulin'), (35, 1, 'tikvahpharma', 'aspirin')])
+        conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO stage_watermarks VALUES ('product_mentions', 20, 'v', NULL)")
+
+    ensure_schema(conn)
+    assert conn.execute("SELECT id, channel_name, message_id FROM raw_telegram_messages ORDER BY id").fetchall() == [
+        (10, 'CheMed123', 1), (20, 'CheMed123', 2), (35, 'tikvahpharma', 1)]
+    assert "content_rowid='id'" in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'messages_fts'").fetchone()[0]
+    assert conn.execute("SELECT last_id FROM stage_watermarks").fetchone()[0] == 20
+    check_index(conn)
+    assert search(conn, 'aspirin') == {('CheMed123', 1), ('tikvahpharma', 1)}
+
+    # New rows never reuse a migrated id
+    with conn:
+        conn.execute(UPSERT_SQL, message(3, 'insulin pens'))
+    assert conn.execute("SELECT MAX(id) FROM raw_telegram_messages").fetchone()[0] == 36
+    assert len(search(conn, 'insulin')) == 2
+    conn.close()
@@ -0,0 +1,108 @@
+"""
+Streaming mode against FakeTelegramClient: polls append to one data lake
+file per channel, malformed rows are skipped, and a dead writer stops the
+scraper instead of blocking it.
+"""
+
+import asyncio
+import glob
+import os
+import sqlite3
+
+import pytest
+
+pytest.importorskip("telethon")
+
+from fake_telegram import FakeTelegramClient  # noqa: E402
+from conftest import append_messages  # noqa: E402
+
+
+def make_client():
+    return FakeTelegramClient.from_synthetic(messages=120, channels=2, days=2, seed=5, latency=0,
+                                             image_ratio=0)
+
+
+async def stream_polls(client, db_path, polls, between=None):
+    """Run stream() for a number of polls, calling between(poll) after each"""
+    import stream_to_warehouse
+
+    cycles = {'n': 0}
+    scrape_all = stream_to_warehouse.TelegramScraper.scrape_all
+
+    async def counted(scraper, *args, **kwargs):
+        result = await scrape_all(scraper, *args, **kwargs)
+        cycles['n'] += 1
+        if between:
+            between(cycles['n'])
+        return result
+
+    stream_to_warehouse.TelegramScraper.scrape_all = counted
+    try:
+        task = asyncio.ensure_future(stream_to_warehouse.stream(client.channel_names(), db_path,
+                                                                poll_interval=0, limit=1000, client=client))
+        while cycles['n'] < polls and not task.done():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        return await asyncio.gather(task, return_exceptions=True)
+    finally:
+        stream_to_warehouse.TelegramScraper.scrape_all = scrape_all
+
+
+def test_polls_append_to_one_file_per_channel(workdir):
+    client = make_client()
+    channel = client.channel_names()[0]
+    asyncio.run(asyncio.wait_for(
+        stream_polls(client, 'warehouse.db', 5, lambda n: append_messages(client, channel, 3)), timeout=60))
+
+    files = glob.glob(os.path.join('data', 'raw', 'telegram_messages', '*', '*'))
+    assert sorted(os.path.basename(f) for f in files) == sorted(f"{name}.jsonl" for name in client.channel_names())
+    with sqlite3.connect('warehouse.db') as conn:
+        # Posts appended after the last poll are not scraped yet
+        assert conn.execute("SELECT COUNT(*) FROM raw_telegram_messages").fetchone()[0] == 120 + 4 * 3
+
+
+def test_malformed_rows_are_skipped(workdir):
+    import stream_to_warehouse
+
+    async def write_chunks():
+        writer = stream_to_warehouse.WarehouseWriter('warehouse.db')
+        writer.start()
+        good = {'message_id': 1, 'channel_name': 'c', 'message_date': '2026-01-01T00:00:00+00:00',
+                'message_text': 'x', 'has_media': False, 'views': 1, 'forwards': 0, 'image_path': None}
+        await writer.put([good, dict(good, message_id=2, channel_name=None), {'message_id': 3}])
+        await writer.put([dict(good, message_id=4, message_date='not a date')])
+        await writer.close()
+        return writer.stats
+
+    stats = asyncio.run(asyncio.wait_for(write_chunks(), timeout=30))
+    assert stats['skipped_rows'] == 2
+    assert stats['failed_batches'] == 0
+    with sqlite3.connect('warehouse.db') as conn:
+        assert [r[0] for r in conn.execute("SELECT message_id FROM raw_telegram_messages ORDER BY 1")] == [1, 4]
+
+
+def test_dead_writer_stops_the_scraper(workdir):
+    import stream_to_warehouse
+
+    os.makedirs('not_a_database')
+    client = make_client()
+    with pytest.raises(sqlite3.Error):
+        asyncio.run(asyncio.wait_for(
+            stream_to_warehouse.stream(client.channel_names(), 'not_a_database', poll_interval=0,
+                                       limit=1000, client=client),
+            timeout=30))
+
+
+def test_jsonl_sink_rotates_by_size(workdir):
+    from raw_sink import JsonlSink
+
+    sink = JsonlSink('chan', date_str='2026-01-01', rotate_bytes=300)
+    for i in range(10):
+        sink.write({'message_id': i, 'message_text': 'x' * 50})
+        sink.flush()
+    sink.close()
+
+    files = sorted(os.listdir(os.path.join('data', 'raw', 'telegram_messages', '2026-01-01')))
+    assert files == sorted(os.path.basename(f) for f in sink.published)
+    # ~80 bytes per line: rotated after records 4 and 8, the last two published on close
+    assert files == ['chan.1.jsonl', 'chan.2.jsonl', 'chan.jsonl']